@@ -5,7 +5,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
-from api.routes import chat_router, channels_router, webhooks_router
+from api.routes import chat_router, channels_router, webhooks_router, catalog_router, inventory_router
+from api.routes.chat import workflow_engine
 
 # Create FastAPI app
 app = FastAPI(
@@ -27,6 +28,13 @@ app.add_middleware(
 app.include_router(chat_router, prefix="/api/chat", tags=["chat"])
 app.include_router(channels_router, prefix="/api/channels", tags=["channels"])
 app.include_router(webhooks_router, prefix="/api/webhooks", tags=["webhooks"])
+app.include_router(catalog_router, prefix="/api/catalog", tags=["catalog"])
+app.include_router(inventory_router, prefix="/api/inventory", tags=["inventory"])
+
+@app.on_event("shutdown")
+def archive_points_ledger():
+    """Archive the points ledger's live entries so the next start restores them"""
+    workflow_engine.loyalty_service.ledger.stop_compactor()
 
 # Determine base directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
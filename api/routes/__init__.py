@@ -3,9 +3,13 @@
 from .chat import router as chat_router
 from .channels import router as channels_router
 from .webhooks import router as webhooks_router
+from .catalog import router as catalog_router
+from .inventory import router as inventory_router
 
 __all__ = [
     "chat_router",
     "channels_router",
     "webhooks_router",
+    "catalog_router",
+    "inventory_router",
 ]
@@ -0,0 +1,53 @@
+"""Product catalog API routes"""
+
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+
+from api.routes.chat import workflow_engine
+
+router = APIRouter()
+
+# Share the chat workflow's catalog so the process holds one set of indexes and one reloader
+product_catalog = workflow_engine.product_catalog
+
+
+@router.get("/search")
+async def search_catalog(
+    q: Optional[str] = None,
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    brand: Optional[str] = None,
+    color: Optional[str] = None,
+    size: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    tags: Optional[List[str]] = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0)
+):
+    """Search the catalog and return facet counts for the full result set"""
+    try:
+        result = product_catalog.search_with_facets(
+            query=q,
+            category=category,
+            min_price=min_price,
+            max_price=max_price,
+            tags=tags,
+            subcategory=subcategory,
+            brand=brand,
+            color=color,
+            size=size,
+            limit=limit,
+            offset=offset
+        )
+        
+        return {
+            "total": result["total"],
+            "limit": limit,
+            "offset": offset,
+            "products": [product.model_dump() for product in result["products"]],
+            "facets": result["facets"]
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
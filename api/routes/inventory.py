@@ -0,0 +1,39 @@
+"""Inventory API routes"""
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from api.routes.chat import workflow_engine
+
+router = APIRouter()
+
+# Share the chat workflow's inventory so checks see its holds, sales and stock updates
+inventory_service = workflow_engine.inventory_service
+
+
+class AvailabilityLine(BaseModel):
+    """One line of an availability check"""
+    sku: str
+    color: Optional[str] = None
+    size: Optional[str] = None
+    quantity: int = Field(default=1, ge=1)
+    location: str = "online"
+
+
+class AvailabilityRequest(BaseModel):
+    """Batch availability request model"""
+    items: List[AvailabilityLine]
+
+
+@router.post("/availability")
+async def check_availability(request: AvailabilityRequest):
+    """Check every line of a cart in one call and report per-line shortfalls"""
+    try:
+        return inventory_service.check_availability_batch([
+            (item.sku, item.color, item.size, item.quantity, item.location)
+            for item in request.items
+        ])
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,3 @@
+"""Benchmark package initialization"""
+
+__version__ = "1.0.0"
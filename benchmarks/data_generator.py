@@ -0,0 +1,280 @@
+"""
+Synthetic Data Generator
+Writes catalogs, inventory and promotions at benchmark scale in the data/ JSON schema
+"""
+
+import argparse
+import json
+import random
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils.helpers import get_data_path
+
+
+# Named catalog sizes
+SCALES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000
+}
+
+# Product families: (category, subcategory, sku prefix, size run, fabrics, tags)
+PRODUCT_FAMILIES = [
+    ("Dresses", "Maxi Dresses", "DRESS", ["XS", "S", "M", "L", "XL"], ["Georgette", "Rayon", "Chiffon"], ["summer", "casual", "floral", "party"]),
+    ("Dresses", "Midi Dresses", "MIDI", ["XS", "S", "M", "L", "XL"], ["Crepe", "Cotton", "Linen"], ["office", "casual", "brunch", "summer"]),
+    ("Suits", "Formal Suits", "SUIT", ["38", "40", "42", "44", "46"], ["Wool Blend", "Poly Viscose"], ["formal", "business", "wedding", "premium"]),
+    ("Ethnic Wear", "Kurtis", "KURTI", ["XS", "S", "M", "L", "XL", "XXL"], ["Pure Cotton", "Rayon", "Chanderi"], ["ethnic", "casual", "office", "cotton"]),
+    ("Ethnic Wear", "Sarees", "SAREE", ["Free Size"], ["Pure Silk", "Georgette", "Cotton Silk"], ["wedding", "festive", "luxury", "traditional"]),
+    ("Ethnic Wear", "Lehengas", "LEHENGA", ["S", "M", "L", "XL"], ["Raw Silk", "Velvet", "Net"], ["bridal", "wedding", "festive", "designer"]),
+    ("Bottomwear", "Jeans", "JEANS", ["24", "26", "28", "30", "32", "34"], ["Cotton Stretch Denim", "Rigid Denim"], ["casual", "everyday", "denim", "bestseller"]),
+    ("Bottomwear", "Chinos", "CHINO", ["28", "30", "32", "34", "36"], ["Cotton Twill", "Cotton Stretch"], ["smart casual", "office", "weekend", "classic"]),
+    ("Topwear", "Polos", "POLO", ["S", "M", "L", "XL", "XXL"], ["100% Cotton Pique", "Cotton Blend"], ["casual", "smart casual", "weekend", "golf"]),
+    ("Topwear", "Formal Shirts", "SHIRT", ["S", "M", "L", "XL", "XXL"], ["Cotton Blend", "Linen", "Giza Cotton"], ["formal", "office", "interview", "classic"]),
+    ("Topwear", "T-Shirts", "TEE", ["S", "M", "L", "XL", "XXL"], ["Organic Cotton", "Cotton Jersey"], ["casual", "everyday", "summer", "basics"]),
+    ("Outerwear", "Blazers", "BLAZER", ["36", "38", "40", "42", "44"], ["Polyester Blend", "Wool Blend"], ["formal", "office", "party", "versatile"]),
+    ("Outerwear", "Jackets", "JACKET", ["S", "M", "L", "XL", "XXL"], ["100% Cotton Denim", "Nylon", "Suede"], ["casual", "layering", "denim", "winter"]),
+    ("Footwear", "Sneakers", "SNEAKERS", ["UK 6", "UK 7", "UK 8", "UK 9", "UK 10", "UK 11"], ["Leather Upper, Rubber Sole", "Mesh"], ["casual", "everyday", "sporty", "versatile"]),
+    ("Footwear", "Sandals", "SANDALS", ["UK 4", "UK 5", "UK 6", "UK 7", "UK 8"], ["Synthetic", "Leather"], ["summer", "casual", "party", "comfort"]),
+    ("Accessories", "Bags", "BAG", ["One Size"], ["Genuine Leather", "Canvas", "Vegan Leather"], ["work", "travel", "premium", "leather"]),
+    ("Accessories", "Jewelry", "JEWELRY", ["One Size"], ["Brass", "Sterling Silver", "Kundan"], ["festive", "party", "gifting", "traditional"])
+]
+
+BRANDS = [
+    "AND", "BIBA", "Fabindia", "Levi's", "Allen Solly", "Van Heusen", "Manyavar", "Puma",
+    "Wrangler", "Arrow", "Hidesign", "Louis Philippe", "W", "Peter England", "Raymond", "Nike"
+]
+
+COLORS = [
+    "Black", "White", "Navy Blue", "Maroon", "Olive Green", "Beige", "Mustard", "Grey",
+    "Blue Floral", "Pink Floral", "Red", "Emerald", "Dark Blue", "Light Blue", "Brown", "Tan"
+]
+
+ADJECTIVES = [
+    "Classic", "Slim Fit", "Printed", "Embroidered", "Relaxed", "Festive", "Everyday", "Premium",
+    "Textured", "Striped", "Solid", "Handloom", "Vintage", "Modern", "Tailored", "Lightweight"
+]
+
+CARE_INSTRUCTIONS = ["Machine Wash", "Hand Wash", "Dry Clean Only", "Wipe Clean"]
+
+STORES = [
+    "Mumbai - Phoenix Mall", "Mumbai - Palladium", "Delhi - Select Citywalk", "Delhi - DLF Promenade",
+    "Bangalore - UB City", "Pune - Phoenix Marketcity", "Chennai - Express Avenue", "Hyderabad - Inorbit Mall"
+]
+
+
+def _write_json_stream(path: Path, head: Dict, list_key: str, items: Iterable[Dict], tail: Dict) -> None:
+    """Write {**head, list_key: [items...], **tail} one item at a time"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for key, value in head.items():
+            f.write(f"{json.dumps(key)}: {json.dumps(value)}, ")
+        f.write(f"{json.dumps(list_key)}: [\n")
+        for i, item in enumerate(items):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(item))
+        f.write("\n]")
+        for key, value in tail.items():
+            f.write(f", {json.dumps(key)}: {json.dumps(value)}")
+        f.write("}\n")
+
+
+def _write_json_map_stream(path: Path, map_key: str, entries: Iterable, tail: Dict) -> None:
+    """Write {map_key: {key: value...}, **tail} one entry at a time"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{{{json.dumps(map_key)}: {{\n")
+        for i, (key, value) in enumerate(entries):
+            if i:
+                f.write(",\n")
+            f.write(f"{json.dumps(key)}: {json.dumps(value)}")
+        f.write("\n}")
+        for key, value in tail.items():
+            f.write(f", {json.dumps(key)}: {json.dumps(value)}")
+        f.write("}\n")
+
+
+class SyntheticDataGenerator:
+    """Deterministic generator for products, inventory and promotions"""
+    
+    def __init__(self, product_count: int, seed: int = 42):
+        self.product_count = product_count
+        self.seed = seed
+    
+    def sku_for(self, index: int) -> str:
+        """SKU of the index-th generated product"""
+        family = PRODUCT_FAMILIES[index % len(PRODUCT_FAMILIES)]
+        return f"{family[2]}-{index // len(PRODUCT_FAMILIES) + 1:06d}"
+    
+    def colors_for(self, index: int) -> List[str]:
+        """Colors of the index-th product, shared by the catalog and its inventory"""
+        rng = random.Random(self.seed * 1_000_003 + index)
+        return rng.sample(COLORS, rng.randint(1, 4))
+    
+    def generate_products(self) -> Iterable[Dict]:
+        """Yield products in the products.json schema"""
+        rng = random.Random(self.seed)
+        for index in range(self.product_count):
+            category, subcategory, prefix, sizes, fabrics, tags = PRODUCT_FAMILIES[index % len(PRODUCT_FAMILIES)]
+            sku = self.sku_for(index)
+            adjective = rng.choice(ADJECTIVES)
+            colors = self.colors_for(index)
+            
+            original_price = rng.randrange(499, 25000, 100)
+            discount = rng.choice([0, 0, 10, 15, 20, 25, 30, 40, 50])
+            price = round(original_price * (100 - discount) / 100)
+            
+            family_name = subcategory[:-2] if subcategory.endswith("sses") else subcategory.rstrip("s")
+            product_tags = rng.sample(tags, rng.randint(2, len(tags)))
+            fabric = rng.choice(fabrics)
+            
+            yield {
+                "sku": sku,
+                "name": f"{adjective} {colors[0]} {family_name}",
+                "category": category,
+                "subcategory": subcategory,
+                "brand": rng.choice(BRANDS),
+                "price": price,
+                "original_price": original_price,
+                "discount_percent": discount,
+                "description": f"{adjective} {family_name.lower()} in {fabric.lower()}, great for {' and '.join(product_tags[:2])} wear",
+                "fabric": fabric,
+                "care": rng.choice(CARE_INSTRUCTIONS),
+                "sizes": sizes,
+                "colors": colors,
+                "images": [f"{sku.lower()}-1.jpg"],
+                "tags": product_tags,
+                "ratings": {
+                    "average": round(rng.uniform(3.0, 5.0), 1),
+                    "count": rng.randint(0, 2000)
+                },
+                "complementary_products": [
+                    self.sku_for(rng.randrange(self.product_count))
+                    for _ in range(rng.randint(0, 3))
+                ]
+            }
+    
+    def generate_inventory(self) -> Iterable:
+        """Yield (sku, stock) entries in the inventory.json schema"""
+        rng = random.Random(self.seed + 1)
+        for index in range(self.product_count):
+            sizes = PRODUCT_FAMILIES[index % len(PRODUCT_FAMILIES)][3]
+            colors = self.colors_for(index)
+            
+            online = {color: {size: rng.randint(0, 20) for size in sizes} for color in colors}
+            stores = {}
+            for store in rng.sample(STORES, rng.randint(0, 3)):
+                stores[store] = {
+                    color: {size: rng.randint(1, 5) for size in rng.sample(sizes, min(len(sizes), 3))}
+                    for color in rng.sample(colors, min(len(colors), 2))
+                }
+            
+            yield self.sku_for(index), {"online": online, "stores": stores}
+    
+    def generate_promotions(self, count: int) -> List[Dict]:
+        """Promotions in the promotions.json schema"""
+        rng = random.Random(self.seed + 2)
+        categories = sorted({family[0] for family in PRODUCT_FAMILIES})
+        promotions = []
+        for i in range(count):
+            promo_type = rng.choice(["percentage_discount", "percentage_discount", "flat_discount", "bogo"])
+            promo = {
+                "id": f"PROMO{i + 1:06d}",
+                "name": f"Synthetic Promotion {i + 1}",
+                "type": promo_type,
+                "value": rng.choice([5, 10, 15, 20, 25, 30]) if promo_type == "percentage_discount" else rng.choice([100, 250, 500, 1000]),
+                "description": "Generated benchmark promotion",
+                "valid_from": "2024-01-01",
+                "valid_until": "2024-12-31",
+                "min_purchase_amount": rng.choice([0, 500, 1000, 2000, 3000, 5000, 10000]),
+                "active": rng.random() < 0.9,
+                "stackable": rng.random() < 0.3
+            }
+            if promo_type == "bogo":
+                promo["value"] = 1
+            if promo_type == "percentage_discount":
+                promo["max_discount"] = rng.choice([500, 1000, 2000, 3000, 5000])
+            if rng.random() < 0.6:
+                promo["applicable_categories"] = rng.sample(categories, rng.randint(1, 3))
+            if rng.random() < 0.1:
+                promo["applicable_to"] = "platinum_members"
+            promotions.append(promo)
+        return promotions
+    
+    def generate_coupons(self, count: int) -> Iterable[Dict]:
+        """Yield coupon codes in the promotions.json schema"""
+        rng = random.Random(self.seed + 3)
+        for i in range(count):
+            percentage = rng.random() < 0.5
+            coupon = {
+                "code": f"SYN{i:08d}",
+                "type": "percentage_discount" if percentage else "flat_discount",
+                "value": rng.choice([5, 10, 15, 20]) if percentage else rng.choice([100, 200, 500]),
+                "description": "Generated benchmark coupon",
+                "valid_from": "2024-01-01",
+                "valid_until": "2024-12-31",
+                "usage_limit": rng.choice([1, 1, 3, 5]),
+                "min_purchase_amount": rng.choice([0, 1000, 2000, 3000]),
+                "active": True
+            }
+            if percentage:
+                coupon["max_discount"] = rng.choice([500, 1000, 1500])
+            yield coupon
+    
+    def write(self, output_dir: Path) -> Path:
+        """Write products.json, inventory.json, promotions.json, loyalty_rules.json and cities.json"""
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        categories = []
+        for category in dict.fromkeys(family[0] for family in PRODUCT_FAMILIES):
+            categories.append({"id": category.lower().replace(" ", "-"), "name": category, "parent": None})
+        _write_json_stream(output_dir / "products.json", {}, "products", self.generate_products(), {"categories": categories})
+        
+        # Warehouses, stores and delivery estimates are reused from the bundled data
+        with open(get_data_path("inventory.json"), "r", encoding="utf-8") as f:
+            base_inventory = json.load(f)
+        _write_json_map_stream(
+            output_dir / "inventory.json",
+            "inventory",
+            self.generate_inventory(),
+            {
+                "warehouses": base_inventory.get("warehouses", []),
+                "stores": base_inventory.get("stores", []),
+                "delivery_estimates": base_inventory.get("delivery_estimates", {})
+            }
+        )
+        
+        # One promotion per 100 products and one coupon per 10 products
+        _write_json_stream(
+            output_dir / "promotions.json",
+            {"promotions": self.generate_promotions(max(10, self.product_count // 100))},
+            "coupon_codes",
+            self.generate_coupons(max(10, self.product_count // 10)),
+            {}
+        )
+        
+        shutil.copyfile(get_data_path("loyalty_rules.json"), output_dir / "loyalty_rules.json")
+        shutil.copyfile(get_data_path("cities.json"), output_dir / "cities.json")
+        return output_dir
+
+
+def main():
+    """Generate a synthetic data directory"""
+    parser = argparse.ArgumentParser(description="Generate synthetic retail data")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k", help="Catalog size")
+    parser.add_argument("--output", default="benchmarks/data", help="Output directory")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    args = parser.parse_args()
+    
+    output_dir = Path(args.output) / args.scale
+    SyntheticDataGenerator(SCALES[args.scale], seed=args.seed).write(output_dir)
+    print(f"✓ Wrote {SCALES[args.scale]:,} products to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Benchmark Runner
+Times catalog, inventory and loyalty operations on synthetic data at each scale
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from benchmarks.data_generator import SCALES, STORES, SyntheticDataGenerator
+from src.services.coupon_store import CouponStore
+from src.services.inventory_service import InventoryService
+from src.services.loyalty_service import LoyaltyService
+from src.services.product_catalog import ProductCatalogService
+from src.services.promotion_index import PromotionIndex
+from src.services.promotion_stacking import StackingOptimizer, is_line_rule, line_rule_discount
+
+
+SEARCH_QUERIES = [
+    "kurti", "floral dress", "denim jacket", "formal shirt", "silk saree",
+    "leather bag", "casual sneakers", "wedding lehenga", "slim fit chinos", "printed tee"
+]
+
+RECOMMENDATION_PREFERENCES = [
+    {},
+    {"budget_range": "budget"},
+    {"budget_range": "mid", "styles": ["casual"]},
+    {"budget_range": "premium", "styles": ["formal", "office"]},
+    {"budget_range": "luxury", "styles": ["wedding", "festive"]}
+]
+
+TIERS = ["Bronze", "Silver", "Gold", "Platinum"]
+
+# Synthetic promotions and coupons are valid through 2024, so loyalty is timed as of mid-2024
+CAMPAIGN_DATE = datetime(2024, 6, 1).timestamp()
+
+
+def time_calls(fn: Callable, calls: List[tuple]) -> Dict:
+    """Run fn once per argument tuple and summarize the latencies in microseconds"""
+    latencies = []
+    for args in calls:
+        start = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - start) * 1e6)
+    
+    latencies.sort()
+    return {
+        "calls": len(latencies),
+        "mean_us": round(statistics.fmean(latencies), 2),
+        "p50_us": round(latencies[len(latencies) // 2], 2),
+        "p95_us": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2),
+        "max_us": round(latencies[-1], 2)
+    }
+
+
+def campaign_codes(count: int, seed: int):
+    """Yield count pseudo-random 12 character campaign codes"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield f"{rng.getrandbits(48):012X}"
+
+
+def benchmark_coupons(count: int, iterations: int, seed: int) -> Dict:
+    """Stream count single-use codes into a CouponStore and time lookups and redemptions"""
+    store = CouponStore(count)
+    sample_every = max(1, count // iterations)
+    known = []
+    
+    def sampled():
+        for i, code in enumerate(campaign_codes(count, seed)):
+            if i % sample_every == 0 and len(known) < iterations:
+                known.append(code)
+            yield code
+    
+    start = time.perf_counter()
+    report = store.import_codes(sampled(), {"type": "flat_discount", "value": 100, "usage_limit": 1, "active": True})
+    import_s = time.perf_counter() - start
+    
+    unknown = list(campaign_codes(iterations * 10, seed + 1))
+    return {
+        "codes": count,
+        "import_s": round(import_s, 2),
+        "imported": report,
+        "memory": store.stats(),
+        "bloom_false_positive_rate": round(sum(map(store.might_contain, unknown)) / len(unknown), 5),
+        "operations": {
+            "lookup_hit": time_calls(store.lookup, [(code,) for code in known]),
+            "lookup_miss": time_calls(store.lookup, [(code,) for code in unknown[:iterations]]),
+            "redeem": time_calls(store.redeem, [(code,) for code in known])
+        }
+    }
+
+
+def benchmark_points(rows: int, seed: int) -> Dict:
+    """Accrue points and tiers for rows purchases one call at a time and as one batch"""
+    loyalty = LoyaltyService()
+    rng = random.Random(seed)
+    categories = ["Ethnic Wear", "Designer", "Accessories", "Dresses", "Topwear", None]
+    amounts = [round(rng.uniform(100, 50000), 2) for _ in range(rows)]
+    tiers = [rng.choice(TIERS) for _ in range(rows)]
+    categories = [rng.choice(categories) for _ in range(rows)]
+    balances = [rng.randrange(0, 20000) for _ in range(rows)]
+    
+    start = time.perf_counter()
+    for amount, tier, category, balance in zip(amounts, tiers, categories, balances):
+        points = loyalty.calculate_points_earned(amount, tier, category)
+        loyalty.get_tier_info(balance + points)
+    per_call_s = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    loyalty.calculate_points_batch(amounts, tiers, categories, balances)
+    batch_s = time.perf_counter() - start
+    return {
+        "rows": rows,
+        "per_call_s": round(per_call_s, 3),
+        "batch_s": round(batch_s, 3),
+        "rows_per_s": round(rows / batch_s) if batch_s else None
+    }
+
+
+def brute_force_line_discount(lines: List[Dict], index: PromotionIndex) -> float:
+    """Best line-level discount over every assignment of lines to stackable category/BOGO rules"""
+    subtotal = sum(line["price"] * line["quantity"] for line in lines)
+    categories = list(dict.fromkeys(line["category"] for line in lines))
+    rules = [rule for rule in index.applicable_rules(subtotal, "Bronze", categories) if rule.stackable and is_line_rule(rule)]
+    options = [
+        [-1] + [k for k, rule in enumerate(rules) if not rule.categories or line["category"] in rule.categories]
+        for line in lines
+    ]
+    
+    best = 0.0
+    for choice in itertools.product(*options):
+        total = 0.0
+        for k, rule in enumerate(rules):
+            assigned = [line for line, chosen in zip(lines, choice) if chosen == k]
+            total += line_rule_discount(
+                rule,
+                sum(line["price"] * line["quantity"] for line in assigned),
+                tuple(line["price"] for line in assigned for _ in range(line["quantity"])),
+                len(assigned)
+            )
+        best = max(best, total)
+    return best
+
+
+def benchmark_stacking(carts: int, seed: int, rule_counts=(6, 12, 40), line_counts=(6, 8, 20)) -> Dict:
+    """
+    Time the stacking search on random stackable category/BOGO rules; where the
+    cart is small enough, check its answer against brute force
+    """
+    rng = random.Random(seed)
+    categories = ["Dresses", "Topwear", "Bottomwear", "Ethnic Wear", "Footwear", "Accessories"]
+    report = {}
+    for rule_count, line_count in zip(rule_counts, line_counts):
+        latencies, brute_latencies = [], []
+        optimal = greedy = matches = 0
+        for _ in range(carts):
+            promotions = []
+            for i in range(rule_count):
+                kind = rng.choice(["percentage_discount", "percentage_discount", "flat_discount", "bogo"])
+                promotion = {
+                    "id": f"STACK{i}",
+                    "type": kind,
+                    "value": rng.choice([10, 20, 30]) if kind == "percentage_discount" else rng.choice([200, 500, 1000]),
+                    "applicable_categories": rng.sample(categories, rng.randint(1, 2)),
+                    "active": True,
+                    "stackable": True
+                }
+                if kind == "bogo":
+                    promotion["value"] = 1
+                if kind == "percentage_discount":
+                    promotion["max_discount"] = rng.choice([300, 600, 1000])
+                promotions.append(promotion)
+            lines = [
+                {"category": rng.choice(categories), "price": rng.choice([299, 499, 999, 1499, 2999]), "quantity": rng.randint(1, 3)}
+                for _ in range(line_count)
+            ]
+            
+            index = PromotionIndex(promotions)
+            start = time.perf_counter()
+            stack = StackingOptimizer(index).best_stack(lines)
+            latencies.append((time.perf_counter() - start) * 1e6)
+            optimal += stack["optimal"]
+            greedy += stack["strategy"] == "greedy"
+            
+            # Brute force tries (rules + 1) ** lines assignments
+            if (rule_count + 1) ** line_count <= 10 ** 7:
+                start = time.perf_counter()
+                expected = brute_force_line_discount(lines, index)
+                brute_latencies.append((time.perf_counter() - start) * 1e6)
+                matches += abs(stack["discount"] - round(expected, 2)) < 0.01
+        
+        latencies.sort()
+        entry = {
+            "carts": carts,
+            "p50_us": round(latencies[len(latencies) // 2], 2),
+            "max_us": round(latencies[-1], 2),
+            "proven_optimal": optimal,
+            "greedy_fallback": greedy
+        }
+        if brute_latencies:
+            brute_latencies.sort()
+            entry["brute_force_p50_us"] = round(brute_latencies[len(brute_latencies) // 2], 2)
+            entry["matches_brute_force"] = matches
+        report[f"{rule_count}_rules_{line_count}_lines"] = entry
+    return report
+
+
+def time_load(factory: Callable) -> tuple:
+    """Construct a service and return (service, seconds)"""
+    start = time.perf_counter()
+    service = factory()
+    return service, round(time.perf_counter() - start, 4)
+
+
+class BenchmarkRunner:
+    """Generates (or reuses) synthetic data and benchmarks each service at one scale"""
+    
+    def __init__(self, data_root: Path, iterations: int = 200, seed: int = 42, regenerate: bool = False):
+        self.data_root = Path(data_root)
+        self.iterations = iterations
+        self.seed = seed
+        self.regenerate = regenerate
+    
+    def prepare(self, scale: str) -> Dict:
+        """Write the scale's data directory unless it already exists"""
+        data_dir = self.data_root / scale
+        generated = False
+        generation_s = 0.0
+        if self.regenerate or not (data_dir / "products.json").exists():
+            start = time.perf_counter()
+            SyntheticDataGenerator(SCALES[scale], seed=self.seed).write(data_dir)
+            generation_s = round(time.perf_counter() - start, 4)
+            generated = True
+        return {"data_dir": data_dir, "generated": generated, "generation_s": generation_s}
+    
+    def run_scale(self, scale: str) -> Dict:
+        """Benchmark load time and per-call latency at one scale"""
+        prepared = self.prepare(scale)
+        data_dir = prepared["data_dir"]
+        rng = random.Random(self.seed)
+        
+        catalog, catalog_s = time_load(lambda: ProductCatalogService(data_dir))
+        inventory, inventory_s = time_load(lambda: InventoryService(data_dir))
+        loyalty, loyalty_s = time_load(lambda: LoyaltyService(data_dir, clock=lambda: CAMPAIGN_DATE))
+        
+        records = catalog.index.store.records
+        categories = sorted({record.category for record in records})
+        sampled = [records[rng.randrange(len(records))] for _ in range(self.iterations)]
+        
+        search_calls = [(rng.choice(SEARCH_QUERIES),) for _ in range(self.iterations)]
+        filtered_search_calls = [
+            (rng.choice(SEARCH_QUERIES), rng.choice(categories), 1000, 10000)
+            for _ in range(self.iterations)
+        ]
+        recommendation_calls = [
+            (RECOMMENDATION_PREFERENCES[i % len(RECOMMENDATION_PREFERENCES)], 5)
+            for i in range(self.iterations)
+        ]
+        availability_calls = [
+            (
+                record.sku,
+                rng.choice(record.colors),
+                rng.choice(record.sizes),
+                "online" if rng.random() < 0.5 else rng.choice(STORES)
+            )
+            for record in sampled
+        ]
+        coupon_calls = [
+            (f"SYN{rng.randrange(len(loyalty.coupon_store) * 2):08d}", rng.choice(TIERS))
+            for _ in range(self.iterations)
+        ]
+        promotion_calls = [
+            (rng.randrange(500, 30000), rng.choice(TIERS), rng.sample(categories, rng.randint(1, 3)))
+            for _ in range(self.iterations)
+        ]
+        stack_calls = []
+        for _ in range(self.iterations):
+            positions = [rng.randrange(len(records)) for _ in range(rng.randint(1, 6))]
+            lines = [
+                {"category": records[p].category, "price": float(catalog.index.store.price[p]), "quantity": rng.randint(1, 2)}
+                for p in positions
+            ]
+            stack_calls.append((lines, rng.choice(TIERS)))
+        
+        return {
+            "products": len(catalog.index),
+            "promotions": len(loyalty.promotions),
+            "coupons": len(loyalty.coupon_store),
+            "data": {
+                "generated": prepared["generated"],
+                "generation_s": prepared["generation_s"],
+                "products_json_bytes": (data_dir / "products.json").stat().st_size
+            },
+            "load": {
+                "catalog_s": catalog_s,
+                "inventory_s": inventory_s,
+                "loyalty_s": loyalty_s
+            },
+            "operations": {
+                "search_products": time_calls(catalog.search_products, search_calls),
+                "search_products_filtered": time_calls(catalog.search_products, filtered_search_calls),
+                "get_recommendations": time_calls(catalog.get_recommendations, recommendation_calls),
+                "check_availability": time_calls(inventory.check_availability, availability_calls),
+                "get_best_promotion": time_calls(loyalty.get_best_promotion, promotion_calls),
+                "get_best_stack": time_calls(loyalty.get_best_stack, stack_calls),
+                "validate_coupon": time_calls(loyalty.validate_coupon, coupon_calls)
+            }
+        }
+    
+    def run(self, scales: List[str], coupon_codes: int = 0, stacking_carts: int = 0, points_rows: int = 0) -> Dict:
+        """Benchmark every requested scale and build the report"""
+        report = {
+            "generated_at": datetime.now().isoformat(),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "numpy": np.__version__
+            },
+            "settings": {
+                "iterations": self.iterations,
+                "seed": self.seed
+            },
+            "scales": {}
+        }
+        
+        for scale in scales:
+            print(f"Running {scale} benchmark...")
+            report["scales"][scale] = self.run_scale(scale)
+            for name, stats in report["scales"][scale]["operations"].items():
+                print(f"  {name:<26} p50 {stats['p50_us']:>10.1f}µs   p95 {stats['p95_us']:>10.1f}µs")
+        
+        if coupon_codes:
+            print(f"Running coupon store benchmark with {coupon_codes:,} codes...")
+            report["coupon_store"] = benchmark_coupons(coupon_codes, self.iterations, self.seed)
+            memory = report["coupon_store"]["memory"]
+            print(f"  import {report['coupon_store']['import_s']}s, {memory['bytes_per_code']} bytes/code")
+            for name, stats in report["coupon_store"]["operations"].items():
+                print(f"  {name:<26} p50 {stats['p50_us']:>10.1f}µs   p95 {stats['p95_us']:>10.1f}µs")
+        
+        if points_rows:
+            print(f"Running points accrual benchmark on {points_rows:,} purchases...")
+            report["points_batch"] = benchmark_points(points_rows, self.seed)
+            print(f"  per call {report['points_batch']['per_call_s']}s   batch {report['points_batch']['batch_s']}s")
+        
+        if stacking_carts:
+            print(f"Running promotion stacking benchmark on {stacking_carts} carts per size...")
+            report["promotion_stacking"] = benchmark_stacking(stacking_carts, self.seed)
+            for name, stats in report["promotion_stacking"].items():
+                brute = f"   brute force p50 {stats['brute_force_p50_us']:>10.1f}µs" if "brute_force_p50_us" in stats else ""
+                print(f"  {name:<26} p50 {stats['p50_us']:>10.1f}µs   optimal {stats['proven_optimal']}/{stats['carts']}{brute}")
+        
+        return report
+
+
+def main():
+    """Run the benchmark suite and write a JSON report"""
+    parser = argparse.ArgumentParser(description="Benchmark retail services on synthetic data")
+    parser.add_argument("--scales", default="10k", help="Comma separated scales: " + ", ".join(SCALES))
+    parser.add_argument("--data-root", default="benchmarks/data", help="Where synthetic data is written")
+    parser.add_argument("--output", default="benchmarks/results/benchmark_report.json", help="Report path")
+    parser.add_argument("--iterations", type=int, default=200, help="Calls per operation")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerate existing data")
+    parser.add_argument("--coupon-codes", type=int, default=0, help="Also benchmark a coupon store of this many codes (e.g. 10000000)")
+    parser.add_argument("--points-rows", type=int, default=0, help="Also benchmark batch points accrual on this many purchases (e.g. 1000000)")
+    parser.add_argument("--stacking-carts", type=int, default=0, help="Also benchmark promotion stacking (against brute force) on this many carts per size")
+    args = parser.parse_args()
+    
+    scales = [scale.strip().lower() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scale(s): {', '.join(unknown)}")
+    
+    runner = BenchmarkRunner(args.data_root, iterations=args.iterations, seed=args.seed, regenerate=args.regenerate)
+    report = runner.run(scales, args.coupon_codes, args.stacking_carts, args.points_rows)
+    
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
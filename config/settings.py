@@ -33,6 +33,25 @@ class Settings(BaseSettings):
     session_ttl: int = Field(default=3600, env="SESSION_TTL")
     max_conversation_history: int = Field(default=50, env="MAX_CONVERSATION_HISTORY")
     
+    # Catalog Configuration
+    catalog_auto_reload: bool = Field(default=False, env="CATALOG_AUTO_RELOAD")
+    catalog_reload_interval: float = Field(default=5.0, env="CATALOG_RELOAD_INTERVAL")
+    
+    # Inventory Configuration
+    inventory_backend: str = Field(default="local", env="INVENTORY_BACKEND")  # local, redis
+    reservation_ttl: float = Field(default=900.0, env="RESERVATION_TTL")  # seconds a checkout hold lasts
+    reservation_sweep_interval: float = Field(default=30.0, env="RESERVATION_SWEEP_INTERVAL")
+    fulfillment_cache_size: int = Field(default=4096, env="FULFILLMENT_CACHE_SIZE")  # cached fulfillment lookups
+    delivery_slot_capacity: int = Field(default=50, env="DELIVERY_SLOT_CAPACITY")  # deliveries per zone, day and window
+    delivery_slot_horizon_days: int = Field(default=14, env="DELIVERY_SLOT_HORIZON_DAYS")
+    
+    # Promotion Configuration
+    promotion_stack_time_budget: float = Field(default=0.05, env="PROMOTION_STACK_TIME_BUDGET")  # seconds per stack search
+    
+    # Loyalty Configuration
+    ledger_compaction_interval: float = Field(default=300.0, env="LEDGER_COMPACTION_INTERVAL")  # seconds between compactions
+    ledger_archive_path: Optional[str] = Field(default=None, env="LEDGER_ARCHIVE_PATH")  # JSONL audit trail; in memory if unset
+    
     # Business Configuration
     store_name: str = Field(default="ABFRL Fashion Store", env="STORE_NAME")
     currency: str = Field(default="INR", env="CURRENCY")
@@ -46,10 +46,11 @@ class FulfillmentAgent(BaseAgent):
             return "No slots available"
         
         formatted = []
-        for slot in slots[:5]:  # Show first 5
+        open_slots = [slot for slot in slots if slot.get("available", True)]
+        for slot in open_slots[:5]:  # Show first 5 with room left
             formatted.append(f"{slot.get('date')} {slot.get('time_slot')}")
         
-        return "; ".join(formatted)
+        return "; ".join(formatted) or "No slots available"
     
     def _format_pickup_locations(self, locations: list) -> str:
         """Format pickup locations"""
@@ -20,7 +20,14 @@ class LoyaltyAgent(BaseAgent):
         # Customer loyalty info
         loyalty_tier = customer.get("loyalty_tier", "Bronze")
         points_balance = customer.get("loyalty_points", 0)
-        expiring_points = 0  # Mock
+        expiring_points = 0
+        
+        # Live balance and expiring points from the points ledger
+        workflow_engine = context.get("workflow_engine")
+        if workflow_engine and customer.get("id") in workflow_engine.loyalty_service.ledger:
+            points = workflow_engine.loyalty_service.get_points_summary(customer["id"])
+            points_balance = points["balance"]
+            expiring_points = points["expiring"]
         member_since = customer.get("member_since", "Recently")
         
         # Format promotions
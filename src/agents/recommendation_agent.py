@@ -1,10 +1,14 @@
 """Recommendation agent for product suggestions"""
 
+import re
 from typing import Dict, List
 from .base_agent import BaseAgent
 from config.prompts import PromptTemplates
 
 
+SKU_PATTERN = re.compile(r"\b[A-Z]+-\d+\b")
+
+
 class RecommendationAgent(BaseAgent):
     """AI agent for personalized product recommendations"""
     
@@ -14,7 +18,7 @@ class RecommendationAgent(BaseAgent):
     def get_system_prompt(self, context: Dict) -> str:
         """Get recommendation agent system prompt"""
         customer = context.get("customer") or {}
-        products = context.get("available_products") or []
+        products = context.get("available_products") or self._find_similar_products(context)
         
         # Format customer profile
         customer_profile = self._format_customer_profile(customer)
@@ -30,6 +34,20 @@ class RecommendationAgent(BaseAgent):
         
         return prompt
     
+    def _find_similar_products(self, context: Dict) -> List[Dict]:
+        """Rank catalog products similar to a SKU mentioned in the latest message"""
+        workflow_engine = context.get("workflow_engine")
+        session = context.get("session")
+        if not workflow_engine or not session or not session.messages:
+            return []
+        
+        match = SKU_PATTERN.search(session.messages[-1].content.upper())
+        if not match:
+            return []
+        
+        similar = workflow_engine.product_catalog.get_similar_products(match.group(0), limit=10)
+        return [product.model_dump() for product in similar]
+    
     def _format_customer_profile(self, customer: Dict) -> str:
         """Format customer profile for prompt"""
         if not customer:
@@ -1,9 +1,20 @@
 """Product catalog models"""
 
-from typing import List, Dict, Optional
+from functools import cached_property
+from typing import FrozenSet, List, Dict, Optional
 from pydantic import BaseModel, Field
 
 
+# Inclusive price bounds for each customer budget preference
+BUDGET_RANGES = {
+    "budget": (0, 2000),
+    "mid": (2000, 5000),
+    "mid-premium": (5000, 15000),
+    "premium": (15000, 30000),
+    "luxury": (30000, float('inf'))
+}
+
+
 class ProductRating(BaseModel):
     """Product rating information"""
     average: float = 0.0
@@ -40,6 +51,11 @@ class Product(BaseModel):
     ratings: ProductRating = Field(default_factory=ProductRating)
     complementary_products: List[str] = Field(default_factory=list)
     
+    @cached_property
+    def tag_set(self) -> FrozenSet[str]:
+        """Lowercased tags, computed once per product"""
+        return frozenset(tag.lower() for tag in self.tags)
+    
     def get_formatted_price(self) -> str:
         """Get formatted price with currency"""
         return f"₹{self.price:,.0f}"
@@ -56,16 +72,8 @@ class Product(BaseModel):
             return True
         
         # Check budget range
-        budget_ranges = {
-            "budget": (0, 2000),
-            "mid": (2000, 5000),
-            "mid-premium": (5000, 15000),
-            "premium": (15000, 30000),
-            "luxury": (30000, float('inf'))
-        }
-        
         budget_range = preferences.get("budget_range", "mid")
-        min_price, max_price = budget_ranges.get(budget_range, (0, float('inf')))
+        min_price, max_price = BUDGET_RANGES.get(budget_range, (0, float('inf')))
         
         if not (min_price <= self.price <= max_price):
             return False
@@ -73,8 +81,7 @@ class Product(BaseModel):
         # Check styles
         pref_styles = preferences.get("styles", [])
         if pref_styles:
-            product_tags_lower = [tag.lower() for tag in self.tags]
-            if not any(style.lower() in product_tags_lower for style in pref_styles):
+            if not any(style.lower() in self.tag_set for style in pref_styles):
                 return False
         
         return True
@@ -19,10 +19,12 @@ class WorkflowEngine:
         self.inventory_service = InventoryService()
         self.payment_service = PaymentGatewayService()
         self.loyalty_service = LoyaltyService()
-        self.fulfillment_service = FulfillmentService()
+        self.fulfillment_service = FulfillmentService(self.inventory_service)
         
         # Load customer data
         self.customers_data = load_json_data("customers.json")
+        for customer in self.customers_data.get("customers", []):
+            self.loyalty_service.open_points_account(customer["id"], customer.get("loyalty_points", 0))
     
     def get_customer_by_id(self, customer_id: str) -> Optional[Dict]:
         """Get customer data by ID"""
@@ -82,9 +84,10 @@ class WorkflowEngine:
         customer_id: str,
         shipping_address: Dict,
         payment_method: str,
-        fulfillment_type: str = "home_delivery"
+        fulfillment_type: str = "home_delivery",
+        coupon_codes: Optional[List[str]] = None
     ) -> Dict:
-        """Create order from cart"""
+        """Create order from cart; the best of the customer's valid coupon codes joins the promotion stack"""
         if cart.is_empty():
             return {"success": False, "message": "Cart is empty"}
         
@@ -93,19 +96,35 @@ class WorkflowEngine:
         if not customer:
             return {"success": False, "message": "Customer not found"}
         
+        # Validate the whole cart first so the customer hears which lines are short
+        availability = self.inventory_service.check_availability_batch([
+            (item.sku, item.color, item.size, item.quantity)
+            for item in cart.items
+        ])
+        if not availability["available"]:
+            short = [line for line in availability["lines"] if line["shortfall"] > 0]
+            return {
+                "success": False,
+                "message": "Some items in your cart are no longer in stock",
+                "unavailable_items": short
+            }
+        
         # Calculate totals
         subtotal = cart.get_subtotal()
         
-        # Apply best promotion
+        # Apply the best legal stack of promotions and coupons
         customer_tier = customer.get("loyalty_tier", "Bronze")
-        best_promo = self.loyalty_service.get_best_promotion(
-            subtotal,
-            customer_tier
-        )
-        
-        discount = 0.0
-        if best_promo:
-            discount = self.loyalty_service.apply_promotion(best_promo, subtotal)
+        lines = []
+        for item in cart.items:
+            product = self.product_catalog.get_product_by_sku(item.sku)
+            lines.append({
+                "category": product.category if product else None,
+                "price": item.price,
+                "quantity": item.quantity
+            })
+        stack = self.loyalty_service.get_best_stack(lines, customer_tier, coupon_codes, customer_id)
+        discount = stack["discount"]
+        coupon_code = stack["coupon"]["code"] if stack["coupon"] else None
         
         # Calculate shipping
         shipping_fee = self.fulfillment_service.calculate_shipping_fee(
@@ -140,16 +159,39 @@ class WorkflowEngine:
             payment_info=PaymentInfo(
                 method=payment_method,
                 amount=total
-            )
+            ),
+            applied_promotions=[promo["id"] for promo in stack["promotions"]] + ([coupon_code] if coupon_code else [])
         )
         
-        # Process payment
-        payment_result = self.payment_service.process_payment(
-            amount=total,
-            payment_method=payment_method,
-            customer_id=customer_id,
-            order_id=order_id
-        )
+        # Hold stock for every line before taking payment; the order is fully built, so only payment can fail now
+        hold_ids = self.inventory_service.reserve_items([
+            (item.sku, item.color, item.size, item.quantity)
+            for item in cart.items
+        ])
+        if hold_ids is None:
+            return {"success": False, "message": "Some items in your cart are no longer in stock"}
+        
+        # Take the coupon's use the same way; another order may have used it up since pricing
+        if coupon_code and not self.loyalty_service.redeem_coupon(coupon_code, customer_tier, customer_id):
+            for hold_id in hold_ids:
+                self.inventory_service.release_reservation(hold_id)
+            return {"success": False, "message": f"Coupon {coupon_code} is no longer available"}
+        
+        # Process payment, returning the holds and the coupon use if it fails or raises
+        payment_result = {}
+        try:
+            payment_result = self.payment_service.process_payment(
+                amount=total,
+                payment_method=payment_method,
+                customer_id=customer_id,
+                order_id=order_id
+            )
+        finally:
+            if not payment_result.get("success"):
+                for hold_id in hold_ids:
+                    self.inventory_service.release_reservation(hold_id)
+                if coupon_code:
+                    self.loyalty_service.release_coupon(coupon_code, customer_id)
         
         if not payment_result.get("success"):
             return {
@@ -161,6 +203,8 @@ class WorkflowEngine:
         order.payment_info.status = "completed"
         order.payment_info.transaction_id = payment_result.get("transaction_id")
         order.update_status(OrderStatus.CONFIRMED)
+        for hold_id in hold_ids:
+            self.inventory_service.commit_reservation(hold_id)
         
         # Schedule delivery
         if fulfillment_type == "home_delivery":
@@ -178,6 +222,7 @@ class WorkflowEngine:
             customer_tier
         )
         order.loyalty_points_earned = points_earned
+        self.loyalty_service.earn_points(customer_id, points_earned, reference=order_id)
         
         # Clear cart
         cart.clear()
@@ -0,0 +1,208 @@
+"""In-memory lookup indexes over the product catalog"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.models.product import Product
+from src.services.compact_store import CompactProduct, CompactProductStore
+from src.services.facet_index import FacetIndex
+from src.services.recommendation_pools import RecommendationPools
+from src.services.search_index import InvertedIndex
+from src.services.similarity_index import SimilarityIndex
+from src.services.trigram_index import TrigramIndex
+
+
+# Relevance weight of each indexed product field
+SEARCH_FIELD_WEIGHTS = {
+    "name": 2.0,
+    "tags": 2.0,
+    "description": 1.0
+}
+
+EMPTY_POSITIONS = np.empty(0, dtype=np.int64)
+
+
+def _encode(keys: List[str]) -> Tuple[Dict[str, int], np.ndarray]:
+    """Map string values to dense integer codes"""
+    vocab: Dict[str, int] = {}
+    codes = np.fromiter(
+        (vocab.setdefault(key, len(vocab)) for key in keys),
+        dtype=np.int32,
+        count=len(keys)
+    )
+    return vocab, codes
+
+
+def _build_postings(vocab: Dict[str, int], codes: np.ndarray) -> Dict[str, np.ndarray]:
+    """Group product positions by code, keeping catalog order inside each group"""
+    order = np.argsort(codes, kind="stable")
+    bounds = np.cumsum(np.bincount(codes, minlength=len(vocab)))[:-1]
+    groups = np.split(order, bounds)
+    return {key: groups[code] for key, code in vocab.items()}
+
+
+class CatalogIndex:
+    """Indexes built once per catalog load over a compact product store"""
+    
+    def __init__(self, products: Iterable[Product], categories: Optional[List[Dict]] = None, version: int = 1):
+        self.store = CompactProductStore(products)
+        self.categories = categories or []
+        self.version = version
+        records = self.store.records
+        
+        # O(1) SKU lookup (first occurrence wins, as with the old linear scan)
+        self.sku_positions: Dict[str, int] = {}
+        for position, record in enumerate(records):
+            self.sku_positions.setdefault(record.sku, position)
+        
+        # Content fingerprints, compared on reload to report changed SKUs
+        self.fingerprints = {
+            sku: int(self.store.fingerprints[position])
+            for sku, position in self.sku_positions.items()
+        }
+        
+        # Numeric columns, one entry per product position
+        self.price = self.store.price
+        self.original_price = self.store.original_price
+        self.discount_percent = self.store.discount_percent
+        self.rating_average = self.store.rating_average
+        self.rating_count = self.store.rating_count
+        
+        # Categorical columns as integer codes over lowercased values
+        self.category_vocab, self.category_codes = _encode([p.category.lower() for p in records])
+        self.subcategory_vocab, self.subcategory_codes = _encode([p.subcategory.lower() for p in records])
+        self.brand_vocab, self.brand_codes = _encode([p.brand.lower() for p in records])
+        
+        # Attribute posting lists (positions in catalog order)
+        self.by_category = _build_postings(self.category_vocab, self.category_codes)
+        self.by_subcategory = _build_postings(self.subcategory_vocab, self.subcategory_codes)
+        self.by_brand = _build_postings(self.brand_vocab, self.brand_codes)
+        self.by_tag = self._build_tag_postings(records)
+        
+        self.facets = FacetIndex(records, self.price)
+        self.recommendation_pools = RecommendationPools(
+            records, self.price, self.rating_average, self.discount_percent
+        )
+        self.search_index = self._build_search_index(records)
+        self.fuzzy_index = self._build_fuzzy_index(records)
+        
+        # Built on first "similar products" request to keep catalog loads fast
+        self._similarity_index: Optional[SimilarityIndex] = None
+        self._similarity_lock = threading.Lock()
+    
+    def _build_tag_postings(self, records: List[CompactProduct]) -> Dict[str, np.ndarray]:
+        """Group product positions by lowercased tag"""
+        postings: Dict[str, List[int]] = {}
+        for position, record in enumerate(records):
+            for tag in {tag.lower() for tag in record.tags}:
+                postings.setdefault(tag, []).append(position)
+        return {tag: np.array(positions, dtype=np.int64) for tag, positions in postings.items()}
+    
+    def _build_search_index(self, records: List[CompactProduct]) -> InvertedIndex:
+        """Build the full-text index over name, description and tags"""
+        index = InvertedIndex(SEARCH_FIELD_WEIGHTS)
+        for record in records:
+            index.add_document({
+                "name": record.name,
+                "tags": " ".join(record.tags),
+                "description": record.description
+            })
+        index.finalize()
+        return index
+    
+    def _build_fuzzy_index(self, records: List[CompactProduct]) -> TrigramIndex:
+        """Build the typo-tolerant trigram index over name, brand and tags"""
+        index = TrigramIndex()
+        for position, record in enumerate(records):
+            index.add_document(position, " ".join([record.name, record.brand, *record.tags]))
+        index.finalize()
+        return index
+    
+    @property
+    def similarity_index(self) -> SimilarityIndex:
+        """Vector index for nearest-neighbour product similarity"""
+        if self._similarity_index is None:
+            with self._similarity_lock:
+                if self._similarity_index is None:
+                    self._similarity_index = SimilarityIndex(self.store.records, self.price)
+        return self._similarity_index
+    
+    def __len__(self) -> int:
+        return len(self.store)
+    
+    def get(self, sku: str) -> Optional[Product]:
+        """Get product by SKU"""
+        position = self.sku_positions.get(sku)
+        return self.store.materialize(position) if position is not None else None
+    
+    def diff(self, previous: "CatalogIndex") -> Dict[str, List[str]]:
+        """SKUs added, removed or changed relative to a previous snapshot"""
+        return {
+            "added": [sku for sku in self.fingerprints if sku not in previous.fingerprints],
+            "removed": [sku for sku in previous.fingerprints if sku not in self.fingerprints],
+            "changed": [
+                sku for sku, fingerprint in self.fingerprints.items()
+                if sku in previous.fingerprints and previous.fingerprints[sku] != fingerprint
+            ]
+        }
+    
+    def materialize(self, positions: Iterable[int]) -> List[Product]:
+        """Build the product objects for a final page of positions"""
+        return [self.store.materialize(position) for position in positions]
+    
+    def tag_positions(self, tags: Iterable[str]) -> np.ndarray:
+        """Sorted positions of products carrying any of the given tags"""
+        postings = [self.by_tag[tag.lower()] for tag in tags if tag.lower() in self.by_tag]
+        if not postings:
+            return EMPTY_POSITIONS
+        if len(postings) == 1:
+            return postings[0]
+        return np.unique(np.concatenate(postings))
+    
+    def narrowest_postings(
+        self,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        brand: Optional[str] = None
+    ) -> np.ndarray:
+        """Return the shortest posting list among the given attribute filters"""
+        postings = [
+            index.get(value.lower(), EMPTY_POSITIONS)
+            for index, value in (
+                (self.by_category, category),
+                (self.by_subcategory, subcategory),
+                (self.by_brand, brand)
+            )
+            if value
+        ]
+        if not postings:
+            return np.arange(len(self.store), dtype=np.int64)
+        return min(postings, key=len)
+    
+    def filter_mask(
+        self,
+        positions: np.ndarray,
+        category: Optional[str] = None,
+        subcategory: Optional[str] = None,
+        brand: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None
+    ) -> np.ndarray:
+        """Vectorized attribute and price-range mask over candidate positions"""
+        mask = np.ones(len(positions), dtype=bool)
+        
+        for vocab, codes, value in (
+            (self.category_vocab, self.category_codes, category),
+            (self.subcategory_vocab, self.subcategory_codes, subcategory),
+            (self.brand_vocab, self.brand_codes, brand)
+        ):
+            if value:
+                code = vocab.get(value.lower(), -1)
+                mask &= codes[positions] == code
+        
+        if min_price is not None:
+            mask &= self.price[positions] >= min_price
+        if max_price is not None:
+            mask &= self.price[positions] <= max_price
+        
+        return mask
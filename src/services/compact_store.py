@@ -0,0 +1,132 @@
+"""Compact in-memory storage for large product catalogs"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.models.product import Product, ProductRating
+
+
+# Array-backed numeric product fields and their storage types
+NUMERIC_COLUMNS = {
+    "price": np.float64,
+    "original_price": np.float64,
+    "discount_percent": np.int32,
+    "rating_average": np.float64,
+    "rating_count": np.int64
+}
+
+
+class CompactProduct:
+    """Slotted product record; numeric fields live in the store's NumPy columns"""
+    
+    __slots__ = (
+        "sku", "name", "category", "subcategory", "brand", "description",
+        "fabric", "care", "sizes", "colors", "images", "tags", "complementary_products"
+    )
+    
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields[name])
+
+
+class CompactProductStore:
+    """
+    Product records with interned strings and shared variant tuples
+    
+    Repeated values (categories, brands, tags, colors, sizes and whole
+    size/color/tag tuples) are stored once per catalog; prices, discounts
+    and ratings are array-backed. Full Product models are only built by
+    materialize().
+    """
+    
+    def __init__(self, products: Iterable[Product]):
+        self._strings: Dict[str, str] = {}
+        self._tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        
+        self.records: List[CompactProduct] = []
+        columns: Dict[str, list] = {name: [] for name in NUMERIC_COLUMNS}
+        fingerprints = []
+        
+        # Products are compacted one at a time, so full models never pile up
+        for product in products:
+            self.records.append(self._compact(product))
+            columns["price"].append(product.price)
+            columns["original_price"].append(product.original_price)
+            columns["discount_percent"].append(product.discount_percent)
+            columns["rating_average"].append(product.ratings.average)
+            columns["rating_count"].append(product.ratings.count)
+            fingerprints.append(hash(product.model_dump_json()))
+        
+        # Numeric columns, one entry per product position
+        for name, dtype in NUMERIC_COLUMNS.items():
+            setattr(self, name, np.array(columns[name], dtype=dtype))
+        
+        # Content fingerprints, compared on reload to report changed SKUs
+        self.fingerprints = np.array(fingerprints, dtype=np.int64)
+        
+        # Interning tables are only needed while loading
+        self._strings = {}
+        self._tuples = {}
+    
+    def _intern(self, value: Optional[str]) -> Optional[str]:
+        """Return the shared copy of a string"""
+        if value is None:
+            return None
+        return self._strings.setdefault(value, value)
+    
+    def _intern_tuple(self, values: Iterable[str]) -> Tuple[str, ...]:
+        """Return the shared copy of a tuple of interned strings"""
+        key = tuple(self._intern(value) for value in values)
+        return self._tuples.setdefault(key, key)
+    
+    def _compact(self, product: Product) -> CompactProduct:
+        """Convert a validated product into a compact record"""
+        return CompactProduct(
+            sku=product.sku,
+            name=product.name,
+            category=self._intern(product.category),
+            subcategory=self._intern(product.subcategory),
+            brand=self._intern(product.brand),
+            description=product.description,
+            fabric=self._intern(product.fabric),
+            care=self._intern(product.care),
+            sizes=self._intern_tuple(product.sizes),
+            colors=self._intern_tuple(product.colors),
+            images=tuple(product.images),
+            tags=self._intern_tuple(product.tags),
+            complementary_products=tuple(product.complementary_products)
+        )
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __getitem__(self, position: int) -> CompactProduct:
+        return self.records[position]
+    
+    def __iter__(self):
+        return iter(self.records)
+    
+    def materialize(self, position: int) -> Product:
+        """Build the full Product model for one position (fields were validated at load)"""
+        record = self.records[position]
+        return Product.model_construct(
+            sku=record.sku,
+            name=record.name,
+            category=record.category,
+            subcategory=record.subcategory,
+            brand=record.brand,
+            price=float(self.price[position]),
+            original_price=float(self.original_price[position]),
+            discount_percent=int(self.discount_percent[position]),
+            description=record.description,
+            fabric=record.fabric,
+            care=record.care,
+            sizes=list(record.sizes),
+            colors=list(record.colors),
+            images=list(record.images),
+            tags=list(record.tags),
+            ratings=ProductRating.model_construct(
+                average=float(self.rating_average[position]),
+                count=int(self.rating_count[position])
+            ),
+            complementary_products=list(record.complementary_products)
+        )
@@ -0,0 +1,363 @@
+"""Hashed coupon store with a Bloom-filter pre-check and atomic redemption"""
+
+import itertools
+import json
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+
+
+# 64-bit FNV-1a over the code's UTF-8 bytes, then the murmur3 finalizer to spread the bits
+FNV_OFFSET = 0xCBF29CE484222325
+FNV_PRIME = 0x100000001B3
+MASK64 = 0xFFFFFFFFFFFFFFFF
+
+# Slot table grows once it is this full
+MAX_LOAD = 0.7
+
+# Bloom filter: one byte (8 bits) per table slot, probed by this many hashes
+BLOOM_HASHES = 6
+
+# Uses left for codes without a usage limit
+UNLIMITED = -1
+
+# Uses slot of shared codes, whose usage_limit counts per customer instead
+PER_CUSTOMER = -2
+
+# Codes fingerprinted and inserted per vectorized batch during imports
+IMPORT_BATCH = 100_000
+
+
+def fingerprint(code: str) -> int:
+    """64-bit fingerprint of a coupon code (never 0, which marks an empty slot)"""
+    h = FNV_OFFSET
+    for byte in code.encode("utf-8"):
+        h = ((h ^ byte) * FNV_PRIME) & MASK64
+    h ^= h >> 33
+    h = (h * 0xFF51AFD7ED558CCD) & MASK64
+    h ^= h >> 33
+    h = (h * 0xC4CEB9FE1A85EC53) & MASK64
+    h ^= h >> 33
+    return h or 1
+
+
+def fingerprints(codes: List[str]) -> np.ndarray:
+    """Vectorized fingerprint() for a batch of codes"""
+    if not codes:
+        return np.zeros(0, dtype=np.uint64)
+    raw = [code.encode("utf-8") for code in codes]
+    lengths = np.fromiter(map(len, raw), dtype=np.int64, count=len(raw))
+    width = max(1, int(lengths.max()))
+    matrix = np.array(raw, dtype=f"S{width}").view(np.uint8).reshape(len(raw), width)
+    
+    h = np.full(len(raw), FNV_OFFSET, dtype=np.uint64)
+    prime = np.uint64(FNV_PRIME)
+    for column in range(width):
+        mixed = (h ^ matrix[:, column].astype(np.uint64)) * prime
+        h = np.where(lengths > column, mixed, h)
+    
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xFF51AFD7ED558CCD)
+    h ^= h >> np.uint64(33)
+    h *= np.uint64(0xC4CEB9FE1A85EC53)
+    h ^= h >> np.uint64(33)
+    h[h == 0] = 1
+    return h
+
+
+def bloom_positions(keys: np.ndarray, bloom_bytes: int) -> np.ndarray:
+    """Bit positions of each key; double hashing, position i is (low + i * high) mod bits"""
+    bits = np.uint64(bloom_bytes * 8 - 1)
+    low = keys & np.uint64(0xFFFFFFFF)
+    high = (keys >> np.uint64(32)) | np.uint64(1)
+    return np.concatenate([(low + np.uint64(i) * high) & bits for i in range(BLOOM_HASHES)])
+
+
+def bloom_check(bloom: np.ndarray, key: int) -> bool:
+    """Scalar bloom_positions() lookup; False means the key was never added"""
+    bits = len(bloom) * 8 - 1
+    low, high = key & 0xFFFFFFFF, (key >> 32) | 1
+    for i in range(BLOOM_HASHES):
+        position = (low + i * high) & bits
+        if not bloom.item(position >> 3) & (1 << (position & 7)):
+            return False
+    return True
+
+
+class CouponStore:
+    """
+    Coupon codes in an open-addressing hash table of 64-bit fingerprints
+    
+    Codes are not kept as strings: each slot holds a fingerprint, the index
+    of a shared coupon template (type, value, limits, ...) and the uses left.
+    A Bloom filter over the fingerprints rejects most unknown codes before
+    the table is probed. Redemption decrements uses under a lock, so a
+    single-use code can only be redeemed once.
+    
+    Shared codes (promotions.json coupons such as SAVE500) keep usage_limit
+    as a per-customer limit, counted by (code, customer); imported campaign
+    codes each go to one recipient, so their limit counts globally.
+    
+    Lookups take no lock: the arrays live in one tuple that a resize builds
+    aside and swaps in, and a slot's key is written after its payload.
+    
+    on_template is called with every new template, in template index order,
+    however its codes arrive (e.g. to schedule its validity window).
+    """
+    
+    def __init__(self, capacity: int = 1024, on_template: Optional[Callable[[Dict], object]] = None):
+        self.on_template = on_template
+        self.templates: List[Dict] = []
+        self._template_ids: Dict[str, int] = {}
+        self.count = 0
+        # (fingerprint, customer id) -> redemptions of a shared code
+        self.customer_uses: Dict[Tuple[int, Optional[str]], int] = {}
+        self._lock = threading.Lock()
+        self.table = self._allocate(capacity)
+    
+    @staticmethod
+    def _allocate(capacity: int) -> Tuple[np.ndarray, ...]:
+        """(keys, template index, uses, bloom) sized for capacity entries below MAX_LOAD"""
+        size = 1 << (int(capacity / MAX_LOAD) | 15).bit_length()
+        return (
+            np.zeros(size, dtype=np.uint64),
+            np.zeros(size, dtype=np.int32),
+            np.zeros(size, dtype=np.int32),
+            np.zeros(size, dtype=np.uint8)
+        )
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def __contains__(self, code: str) -> bool:
+        return self._find(fingerprint(code))[0] is not None
+    
+    def template_id(self, template: Dict) -> int:
+        """Index of a coupon template (everything but the code), added if new"""
+        key = json.dumps(template, sort_keys=True, default=str)
+        with self._lock:
+            template_id = self._template_ids.get(key)
+            if template_id is None:
+                template_id = len(self.templates)
+                self.templates.append(template)
+                self._template_ids[key] = template_id
+                if self.on_template:
+                    self.on_template(template)
+            return template_id
+    
+    def add_coupons(self, coupons: Iterable[Dict], batch_size: int = IMPORT_BATCH, per_customer: bool = True) -> Dict:
+        """
+        Stream coupon dicts (promotions.json schema) into the store
+        per_customer: usage_limit applies to each customer (shared codes) rather than to the code overall
+        Returns: {"added", "duplicates"}
+        """
+        report = {"added": 0, "duplicates": 0}
+        iterator = iter(coupons)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                return report
+            
+            codes, template_ids, uses = [], [], []
+            for coupon in batch:
+                codes.append(coupon["code"])
+                template_ids.append(self.template_id({k: v for k, v in coupon.items() if k != "code"}))
+                uses.append(PER_CUSTOMER if per_customer else coupon.get("usage_limit") or UNLIMITED)
+            self._merge(report, self.insert(codes, template_ids, uses))
+    
+    def import_codes(
+        self,
+        source: Union[str, Path, Iterable[str]],
+        template: Dict,
+        batch_size: int = IMPORT_BATCH
+    ) -> Dict:
+        """
+        Stream campaign codes sharing one template, from a file (one code per line) or an iterable
+        Each code's usage_limit counts across all customers
+        Returns: {"added", "duplicates"}
+        """
+        if isinstance(source, (str, Path)):
+            with open(source, "r", encoding="utf-8") as f:
+                return self.import_codes(f, template, batch_size)
+        
+        template_id = self.template_id(template)
+        limit = template.get("usage_limit") or UNLIMITED
+        report = {"added": 0, "duplicates": 0}
+        codes = (line.strip() for line in source)
+        iterator = (code for code in codes if code)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                return report
+            self._merge(report, self.insert(batch, [template_id] * len(batch), [limit] * len(batch)))
+    
+    @staticmethod
+    def _merge(report: Dict, batch_report: Dict) -> None:
+        for key in report:
+            report[key] += batch_report[key]
+    
+    def insert(self, codes: List[str], template_ids: List[int], uses: List[int]) -> Dict:
+        """
+        Insert a batch of codes; codes already present keep their existing entry
+        Returns: {"added", "duplicates"}
+        """
+        keys = fingerprints(codes)
+        # First occurrence wins within the batch, like a linear scan would
+        keys, first = np.unique(keys, return_index=True)
+        order = np.argsort(first)
+        keys, first = keys[order], first[order]
+        template_ids = np.asarray(template_ids, dtype=np.int32)[first]
+        uses = np.asarray(uses, dtype=np.int32)[first]
+        
+        with self._lock:
+            if self.count + len(keys) > MAX_LOAD * len(self.table[0]):
+                self._resize(self.count + len(keys))
+            added = self._place(self.table, keys, template_ids, uses)
+            self.count += added
+        return {"added": added, "duplicates": len(codes) - added}
+    
+    @staticmethod
+    def _place(table: Tuple[np.ndarray, ...], keys: np.ndarray, template_ids: np.ndarray, uses: np.ndarray) -> int:
+        """Vectorized linear probing: every round, each pending key claims its slot or moves on"""
+        table_keys, table_templates, table_uses, bloom = table
+        mask = np.uint64(len(table_keys) - 1)
+        slots = keys & mask
+        pending = np.arange(len(keys))
+        placed = []
+        while len(pending):
+            current = table_keys[slots]
+            # Keys already stored stop probing without being placed
+            advance = current != keys[pending]
+            
+            # Several keys may probe the same empty slot this round; the first one takes it
+            candidates = np.flatnonzero(current == 0)
+            _, first = np.unique(slots[candidates], return_index=True)
+            winners = candidates[first]
+            taken = pending[winners]
+            table_templates[slots[winners]] = template_ids[taken]
+            table_uses[slots[winners]] = uses[taken]
+            table_keys[slots[winners]] = keys[taken]
+            placed.append(keys[taken])
+            
+            advance[winners] = False
+            pending = pending[advance]
+            slots = (slots[advance] + np.uint64(1)) & mask
+        
+        added = np.concatenate(placed) if placed else keys[:0]
+        positions = bloom_positions(added, len(bloom))
+        np.bitwise_or.at(
+            bloom,
+            (positions >> np.uint64(3)).astype(np.int64),
+            np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8)
+        )
+        return len(added)
+    
+    def _resize(self, needed: int) -> None:
+        """Build a larger table (and Bloom filter) aside, then swap it in"""
+        keys, template_index, uses, _ = self.table
+        live = keys != 0
+        table = self._allocate(max(needed, int(2 * len(keys) * MAX_LOAD)))
+        self._place(table, keys[live], template_index[live], uses[live])
+        self.table = table
+    
+    def might_contain(self, code: str) -> bool:
+        """Bloom filter check: False means the code is certainly unknown"""
+        return bloom_check(self.table[3], fingerprint(code))
+    
+    def _find(self, key: int) -> Tuple[Optional[int], Tuple[np.ndarray, ...]]:
+        """(slot holding the fingerprint or None, the table it was looked up in)"""
+        table = self.table
+        keys, _, _, bloom = table
+        if not bloom_check(bloom, key):
+            return None, table
+        
+        mask = len(keys) - 1
+        slot = key & mask
+        while True:
+            current = keys.item(slot)
+            if current == key:
+                return slot, table
+            if current == 0:
+                return None, table
+            slot = (slot + 1) & mask
+    
+    def _coupon(self, code: str, slot: int, table: Tuple[np.ndarray, ...]) -> Dict:
+        return {"code": code, **self.templates[table[1].item(slot)]}
+    
+    def lookup(self, code: str, customer_id: Optional[str] = None) -> Optional[Dict]:
+        """Coupon for a code with uses left (for the customer, on shared codes), or None"""
+        found = self.find(code, customer_id)
+        return found[0] if found else None
+    
+    def find(self, code: str, customer_id: Optional[str] = None) -> Optional[Tuple[Dict, int]]:
+        """(coupon, template index) for a code with uses left, or None"""
+        key = fingerprint(code)
+        slot, table = self._find(key)
+        if slot is None or self._uses_left(key, slot, table, customer_id) == 0:
+            return None
+        return self._coupon(code, slot, table), table[1].item(slot)
+    
+    def uses_left(self, code: str, customer_id: Optional[str] = None) -> Optional[int]:
+        """Remaining uses (-1 for unlimited), or None for unknown codes; shared codes count per customer"""
+        key = fingerprint(code)
+        slot, table = self._find(key)
+        return None if slot is None else self._uses_left(key, slot, table, customer_id)
+    
+    def _uses_left(self, key: int, slot: int, table: Tuple[np.ndarray, ...], customer_id: Optional[str]) -> int:
+        remaining = table[2].item(slot)
+        if remaining != PER_CUSTOMER:
+            return remaining
+        limit = self.templates[table[1].item(slot)].get("usage_limit")
+        if not limit:
+            return UNLIMITED
+        return max(0, limit - self.customer_uses.get((key, customer_id), 0))
+    
+    def redeem(self, code: str, customer_id: Optional[str] = None) -> Optional[Dict]:
+        """Use a code once (for the customer, on shared codes); returns the coupon, or None if unknown or used up"""
+        key = fingerprint(code)
+        with self._lock:
+            slot, table = self._find(key)
+            if slot is None:
+                return None
+            remaining = self._uses_left(key, slot, table, customer_id)
+            if remaining == 0:
+                return None
+            if table[2].item(slot) == PER_CUSTOMER:
+                if remaining > 0:
+                    self.customer_uses[(key, customer_id)] = self.customer_uses.get((key, customer_id), 0) + 1
+            elif remaining > 0:
+                table[2][slot] = remaining - 1
+            return self._coupon(code, slot, table)
+    
+    def release(self, code: str, customer_id: Optional[str] = None) -> bool:
+        """Give back one use taken by redeem() (e.g. when payment fails); False for unknown codes"""
+        key = fingerprint(code)
+        with self._lock:
+            slot, table = self._find(key)
+            if slot is None:
+                return False
+            remaining = table[2].item(slot)
+            if remaining == PER_CUSTOMER:
+                used = self.customer_uses.get((key, customer_id), 0)
+                if used > 1:
+                    self.customer_uses[(key, customer_id)] = used - 1
+                else:
+                    self.customer_uses.pop((key, customer_id), None)
+            elif remaining != UNLIMITED:
+                table[2][slot] = remaining + 1
+            return True
+    
+    def stats(self) -> Dict:
+        """Size and memory footprint"""
+        keys, template_index, uses, bloom = self.table
+        table_bytes = keys.nbytes + template_index.nbytes + uses.nbytes
+        return {
+            "codes": self.count,
+            "capacity": len(keys),
+            "load_factor": round(self.count / len(keys), 4),
+            "templates": len(self.templates),
+            "table_bytes": table_bytes,
+            "bloom_bytes": bloom.nbytes,
+            "bytes_per_code": round((table_bytes + bloom.nbytes) / self.count, 2) if self.count else 0.0
+        }
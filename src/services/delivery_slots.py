@@ -0,0 +1,182 @@
+"""Delivery slot capacity by zone, day and time window"""
+
+import threading
+import uuid
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+# (window name, customer-facing label)
+WINDOWS = [
+    ("morning", "9:00 AM - 12:00 PM"),
+    ("afternoon", "2:00 PM - 5:00 PM"),
+    ("evening", "5:00 PM - 8:00 PM")
+]
+
+# Delivery zones from InventoryService.get_delivery_zone
+ZONES = ["same_city", "metro_to_metro", "other"]
+
+
+class SlotInventory:
+    """
+    Bookable delivery slots for a rolling horizon of days
+    
+    Each zone has one remaining-capacity counter per (day, window) and a
+    parallel list of ready-made slot dicts, both ordered by day then window.
+    A query for the next N days is a slice of that list. Booking and
+    releasing change a counter under a lock and swap in a new dict for just
+    that slot, so a slot can never be booked past its capacity and readers
+    never see a half-updated slot. When the date changes, past days are
+    dropped and new days are added with full capacity.
+    """
+    
+    def __init__(
+        self,
+        capacity: int = 50,
+        horizon_days: int = 14,
+        zones: Optional[List[str]] = None,
+        windows: Optional[List[Tuple[str, str]]] = None,
+        today: Callable[[], date] = date.today
+    ):
+        self.capacity = capacity
+        self.horizon_days = horizon_days
+        self.zones = zones or ZONES
+        self.windows = windows or WINDOWS
+        self.window_index = {}
+        for i, (name, label) in enumerate(self.windows):
+            self.window_index[name] = i
+            self.window_index[label] = i
+        self.today = today
+        
+        # booking id -> (zone, day ordinal, window index)
+        self.bookings: Dict[str, Tuple[str, int, int]] = {}
+        self._lock = threading.Lock()
+        
+        # (first day ordinal, zone -> remaining counters, zone -> slot dicts); replaced whole on roll
+        self.state: Tuple[int, Dict[str, List[int]], Dict[str, List[Dict]]] = (0, {}, {})
+        self._roll()
+    
+    def _slot(self, zone: str, ordinal: int, window: int, remaining: int) -> Dict:
+        name, label = self.windows[window]
+        return {
+            "date": date.fromordinal(ordinal).isoformat(),
+            "window": name,
+            "time_slot": label,
+            "zone": zone,
+            "remaining": remaining,
+            "available": remaining > 0
+        }
+    
+    def _roll(self) -> int:
+        """Move the horizon to start today; returns today's ordinal"""
+        today = self.today().toordinal()
+        if today == self.state[0]:
+            return today
+        
+        with self._lock:
+            first_day, remaining, views = self.state
+            if today == first_day:
+                return today
+            
+            per_day = len(self.windows)
+            new_remaining: Dict[str, List[int]] = {}
+            new_views: Dict[str, List[Dict]] = {}
+            for zone in self.zones:
+                counts, slots = [], []
+                for ordinal in range(today, today + self.horizon_days):
+                    # Days still in the old horizon keep their counters; new days start full
+                    if first_day <= ordinal < first_day + self.horizon_days:
+                        start = (ordinal - first_day) * per_day
+                        counts.extend(remaining[zone][start:start + per_day])
+                        slots.extend(views[zone][start:start + per_day])
+                        continue
+                    for window in range(per_day):
+                        counts.append(self.capacity)
+                        slots.append(self._slot(zone, ordinal, window, self.capacity))
+                new_remaining[zone] = counts
+                new_views[zone] = slots
+            self.state = (today, new_remaining, new_views)
+            return today
+    
+    def _position(self, day: Union[date, str], window: Union[int, str]) -> Tuple[int, Optional[int]]:
+        """(day ordinal, index into the zone's lists or None when outside the horizon)"""
+        try:
+            ordinal = (date.fromisoformat(day) if isinstance(day, str) else day).toordinal()
+        except ValueError:
+            return 0, None
+        window = self.window_index.get(window) if isinstance(window, str) else window
+        offset = ordinal - self.state[0]
+        if window is None or not 0 <= window < len(self.windows) or not 0 <= offset < self.horizon_days:
+            return ordinal, None
+        return ordinal, offset * len(self.windows) + window
+    
+    def available(self, zone: str, start: Optional[date] = None, days: int = 7) -> List[Dict]:
+        """Slots (booked out or not) for days starting at start (default tomorrow)"""
+        today = self._roll()
+        first_day, _, views = self.state
+        slots = views.get(zone)
+        if slots is None:
+            return []
+        offset = max(0, (start.toordinal() if start else today + 1) - first_day)
+        per_day = len(self.windows)
+        return slots[offset * per_day:(offset + days) * per_day]
+    
+    def first_available(self, zone: str, start: Optional[date] = None) -> Optional[Dict]:
+        """Earliest slot with capacity left from start (default tomorrow)"""
+        today = self._roll()
+        first_day, remaining, views = self.state
+        if zone not in remaining:
+            return None
+        offset = max(0, (start.toordinal() if start else today + 1) - first_day) * len(self.windows)
+        for index in range(offset, len(remaining[zone])):
+            if remaining[zone][index] > 0:
+                return views[zone][index]
+        return None
+    
+    def book(self, zone: str, day: Union[date, str], window: Union[int, str]) -> Optional[str]:
+        """
+        Take one unit of a slot's capacity
+        Returns: booking id, or None if the slot is full, unknown or outside the horizon
+        """
+        self._roll()
+        with self._lock:
+            _, remaining, views = self.state
+            ordinal, index = self._position(day, window)
+            if zone not in remaining or index is None or remaining[zone][index] <= 0:
+                return None
+            
+            remaining[zone][index] -= 1
+            window_id = index % len(self.windows)
+            views[zone][index] = self._slot(zone, ordinal, window_id, remaining[zone][index])
+            booking_id = uuid.uuid4().hex
+            self.bookings[booking_id] = (zone, ordinal, window_id)
+            return booking_id
+    
+    def release(self, booking_id: str) -> bool:
+        """Give a booking's capacity back (delivery cancelled or rescheduled)"""
+        with self._lock:
+            booking = self.bookings.pop(booking_id, None)
+            if booking is None:
+                return False
+            
+            zone, ordinal, window = booking
+            _, remaining, views = self.state
+            _, index = self._position(date.fromordinal(ordinal), window)
+            if index is not None:
+                remaining[zone][index] = min(self.capacity, remaining[zone][index] + 1)
+                views[zone][index] = self._slot(zone, ordinal, window, remaining[zone][index])
+            return True
+    
+    def get_booking(self, booking_id: str) -> Optional[Dict]:
+        """Zone, date and window of a booking"""
+        booking = self.bookings.get(booking_id)
+        if booking is None:
+            return None
+        zone, ordinal, window = booking
+        return {
+            "booking_id": booking_id,
+            "zone": zone,
+            "date": date.fromordinal(ordinal).isoformat(),
+            "window": self.windows[window][0],
+            "time_slot": self.windows[window][1]
+        }
@@ -0,0 +1,131 @@
+"""Precomputed facet counters for catalog search results"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.services.compact_store import CompactProduct
+
+
+# Price bucket boundaries shown next to search results
+PRICE_BUCKETS = [0, 1000, 2000, 5000, 10000, 20000, float('inf')]
+
+
+def _price_bucket_label(low: float, high: float) -> str:
+    """Human readable label for a price bucket"""
+    if high == float('inf'):
+        return f"{low:.0f}+"
+    return f"{low:.0f}-{high:.0f}"
+
+
+class Facet:
+    """Integer-coded facet values per product, stored CSR-style for multi-valued facets"""
+    
+    def __init__(self, name: str, values_per_product: List[List[str]]):
+        self.name = name
+        self.labels: List[str] = []
+        vocab: Dict[str, int] = {}
+        
+        offsets = [0]
+        codes: List[int] = []
+        for values in values_per_product:
+            seen = set()
+            for value in values:
+                key = value.lower()
+                if key in seen:
+                    continue
+                seen.add(key)
+                if key not in vocab:
+                    vocab[key] = len(self.labels)
+                    self.labels.append(value)
+                codes.append(vocab[key])
+            offsets.append(len(codes))
+        
+        self.vocab = vocab
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.codes = np.array(codes, dtype=np.int32)
+        self.single_valued = bool(np.all(np.diff(self.offsets) == 1))
+        
+        # Per-value posting arrays, used when a facet value is selected as a filter
+        owners = np.repeat(np.arange(len(values_per_product), dtype=np.int64), np.diff(self.offsets))
+        order = np.argsort(self.codes, kind="stable")
+        bounds = np.cumsum(np.bincount(self.codes, minlength=len(self.labels)))[:-1]
+        self.postings = np.split(owners[order], bounds) if len(self.labels) else []
+        
+        # Counts over the whole catalog, served when no filter narrows the results
+        self.total_counts = np.bincount(self.codes, minlength=len(self.labels))
+    
+    def positions_with(self, value: str) -> np.ndarray:
+        """Sorted positions of products carrying the given facet value"""
+        code = self.vocab.get(value.lower())
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self.postings[code]
+    
+    def counts(self, positions: Optional[np.ndarray]) -> np.ndarray:
+        """Count facet values over a result set in one pass"""
+        if positions is None:
+            return self.total_counts
+        if self.single_valued:
+            return np.bincount(self.codes[positions], minlength=len(self.labels))
+        
+        # Gather the value ranges of every result position without a Python loop
+        starts = self.offsets[positions]
+        lengths = self.offsets[positions + 1] - starts
+        if not lengths.sum():
+            return np.zeros(len(self.labels), dtype=np.int64)
+        run_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        gathered = run_starts + np.arange(lengths.sum())
+        return np.bincount(self.codes[gathered], minlength=len(self.labels))
+
+
+class FacetIndex:
+    """Category, brand, color, size and price-bucket facets over a catalog"""
+    
+    def __init__(self, products: List[CompactProduct], prices: np.ndarray):
+        self.facets = {
+            "category": Facet("category", [[p.category] for p in products]),
+            "brand": Facet("brand", [[p.brand] for p in products]),
+            "color": Facet("color", [p.colors for p in products]),
+            "size": Facet("size", [p.sizes for p in products])
+        }
+        
+        self.price_bounds: List[Tuple[float, float]] = list(zip(PRICE_BUCKETS[:-1], PRICE_BUCKETS[1:]))
+        buckets = np.searchsorted(PRICE_BUCKETS, prices, side="right") - 1
+        self.price_buckets = np.clip(buckets, 0, len(self.price_bounds) - 1).astype(np.int32)
+        self.price_bucket_totals = np.bincount(self.price_buckets, minlength=len(self.price_bounds))
+    
+    def positions_with(self, facet: str, value: str) -> np.ndarray:
+        """Sorted positions of products carrying a facet value"""
+        return self.facets[facet].positions_with(value)
+    
+    def count(self, positions: Optional[np.ndarray] = None) -> Dict[str, List[Dict]]:
+        """
+        Facet counts for a result set (None means the whole catalog)
+        Returns: {facet: [{"value", "count"}]} sorted by descending count
+        """
+        result = {}
+        for name, facet in self.facets.items():
+            counts = facet.counts(positions)
+            order = np.argsort(-counts, kind="stable")
+            result[name] = [
+                {"value": facet.labels[code], "count": int(counts[code])}
+                for code in order
+                if counts[code] > 0
+            ]
+        
+        if positions is None:
+            bucket_counts = self.price_bucket_totals
+        else:
+            bucket_counts = np.bincount(self.price_buckets[positions], minlength=len(self.price_bounds))
+        
+        result["price"] = [
+            {
+                "value": _price_bucket_label(low, high),
+                "min": low,
+                "max": None if high == float('inf') else high,
+                "count": int(bucket_counts[bucket])
+            }
+            for bucket, (low, high) in enumerate(self.price_bounds)
+            if bucket_counts[bucket] > 0
+        ]
+        
+        return result
@@ -2,13 +2,18 @@
 
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
+from config.settings import settings
+from src.services.delivery_slots import SlotInventory
+from src.services.inventory_service import InventoryService
 from src.utils.helpers import generate_id
 
 
 class FulfillmentService:
     """Service for managing order fulfillment and delivery"""
     
-    def __init__(self):
+    def __init__(self, inventory_service: Optional[InventoryService] = None, slots: Optional[SlotInventory] = None):
+        self.inventory_service = inventory_service or InventoryService()
+        self.slots = slots or SlotInventory(settings.delivery_slot_capacity, settings.delivery_slot_horizon_days)
         self.deliveries = {}
     
     def schedule_delivery(
@@ -16,17 +21,35 @@ class FulfillmentService:
         order_id: str,
         address: str,
         fulfillment_type: str = "home_delivery",
-        preferred_date: Optional[datetime] = None
+        preferred_date: Optional[datetime] = None,
+        time_slot: Optional[str] = None
     ) -> Dict:
-        """Schedule delivery for an order"""
+        """
+        Schedule delivery for an order, booking a slot in the address's delivery zone
+        With preferred_date and time_slot that slot is booked (if it has room);
+        otherwise the first open slot from the preferred date (default: 3 days out)
+        """
         delivery_id = generate_id("DEL")
+        zone = self.inventory_service.get_delivery_zone(address)
+        start = preferred_date.date() if preferred_date else self.slots.today() + timedelta(days=3)
+        
+        booking_id = self.slots.book(zone, start, time_slot) if time_slot else None
+        while booking_id is None:
+            slot = self.slots.first_available(zone, start)
+            if slot is None:
+                break
+            # Another order may take the last place first; then try the next open slot
+            booking_id = self.slots.book(zone, slot["date"], slot["window"])
+        slot = self.slots.get_booking(booking_id) if booking_id else None
         
         # Calculate delivery date
-        if preferred_date:
+        if slot:
+            delivery_date = datetime.fromisoformat(slot["date"])
+        elif preferred_date:
             delivery_date = preferred_date
         else:
-            # Default: 3 days from now
-            delivery_date = datetime.now() + timedelta(days=3)
+            # Default: 3 days from today on the slot clock
+            delivery_date = datetime.combine(start, datetime.min.time())
         
         delivery = {
             "delivery_id": delivery_id,
@@ -34,6 +57,8 @@ class FulfillmentService:
             "fulfillment_type": fulfillment_type,
             "address": address,
             "scheduled_date": delivery_date,
+            "time_slot": slot["time_slot"] if slot else None,
+            "slot_booking_id": booking_id,
             "status": "scheduled",
             "tracking_number": generate_id("TRK"),
             "created_at": datetime.now()
@@ -43,63 +68,47 @@ class FulfillmentService:
         
         return delivery
     
-    def get_delivery_slots(self, location: str, date: Optional[datetime] = None) -> List[Dict]:
-        """Get available delivery slots"""
-        # Mock delivery slots
-        base_date = date or datetime.now() + timedelta(days=1)
-        
-        slots = []
-        for day_offset in range(7):  # Next 7 days
-            slot_date = base_date + timedelta(days=day_offset)
-            
-            # Morning slot
-            slots.append({
-                "date": slot_date.strftime("%Y-%m-%d"),
-                "time_slot": "9:00 AM - 12:00 PM",
-                "available": True
-            })
-            
-            # Afternoon slot
-            slots.append({
-                "date": slot_date.strftime("%Y-%m-%d"),
-                "time_slot": "2:00 PM - 5:00 PM",
-                "available": True
-            })
-            
-            # Evening slot
-            slots.append({
-                "date": slot_date.strftime("%Y-%m-%d"),
-                "time_slot": "5:00 PM - 8:00 PM",
-                "available": True
-            })
-        
-        return slots[:10]  # Return first 10 slots
+    def get_delivery_slots(self, location: str, date: Optional[datetime] = None, days: int = 7) -> List[Dict]:
+        """
+        Delivery slots in the location's zone for the given number of days from date (default tomorrow)
+        Every window of every day is listed (3 per day, so 21 for a week), booked-out ones with
+        "available" False; slots are shared read-only views
+        """
+        zone = self.inventory_service.get_delivery_zone(location)
+        start = date.date() if isinstance(date, datetime) else date
+        return self.slots.available(zone, start, days)
     
-    def get_pickup_locations(self, customer_location: str) -> List[Dict]:
-        """Get available pickup locations"""
-        # Mock pickup locations
-        locations = [
-            {
-                "store_name": "Mumbai - Phoenix Mall",
-                "address": "High Street Phoenix, Lower Parel, Mumbai",
-                "distance": "2.5 km",
-                "available": True
-            },
-            {
-                "store_name": "Mumbai - Palladium",
-                "address": "Palladium Mall, Lower Parel, Mumbai",
-                "distance": "3.1 km",
-                "available": True
-            },
+    def book_delivery_slot(self, location: str, slot_date: str, time_slot: str) -> Optional[str]:
+        """
+        Book one delivery in a slot ("YYYY-MM-DD" and a window name or label)
+        Returns: booking id, or None if the slot is full or unknown
+        """
+        return self.slots.book(self.inventory_service.get_delivery_zone(location), slot_date, time_slot)
+    
+    def release_delivery_slot(self, booking_id: str) -> bool:
+        """Free a booked slot"""
+        return self.slots.release(booking_id)
+    
+    def get_pickup_locations(
+        self,
+        customer_location: str,
+        sku: Optional[str] = None,
+        color: Optional[str] = None,
+        size: Optional[str] = None,
+        limit: int = 3
+    ) -> List[Dict]:
+        """Get nearest pickup locations, only stores stocking the item when a SKU is given"""
+        stores = self.inventory_service.get_nearest_stores(customer_location, sku, color, size, limit)
+        return [
             {
-                "store_name": "Delhi - Select Citywalk",
-                "address": "Select Citywalk, Saket, New Delhi",
-                "distance": "5.2 km",
+                "store_name": store["name"],
+                "address": store.get("address", ""),
+                "distance": f"{store['distance_km']} km" if store["distance_km"] is not None else None,
+                "distance_km": store["distance_km"],
                 "available": True
             }
+            for store in stores
         ]
-        
-        return locations[:3]
     
     def track_delivery(self, tracking_number: str) -> Dict:
         """Track delivery status"""
@@ -122,6 +131,8 @@ class FulfillmentService:
     def update_delivery_status(self, delivery_id: str, status: str) -> bool:
         """Update delivery status"""
         if delivery_id in self.deliveries:
+            if status == "cancelled" and self.deliveries[delivery_id].get("slot_booking_id"):
+                self.slots.release(self.deliveries[delivery_id]["slot_booking_id"])
             self.deliveries[delivery_id]["status"] = status
             self.deliveries[delivery_id]["updated_at"] = datetime.now()
             return True
@@ -0,0 +1,170 @@
+"""Spatial index of stores and warehouses for nearest-location fulfillment"""
+
+import heapq
+import math
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Customers this close to a warehouse get same-city delivery
+SAME_CITY_RADIUS_KM = 60.0
+
+COORDINATE_PATTERN = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def to_unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    """Point on the unit sphere; chord length there orders points like great-circle distance"""
+    phi, lam = math.radians(lat), math.radians(lon)
+    return math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi)
+
+
+class KDTree:
+    """3-d tree over unit-sphere points with filtered k-nearest queries"""
+    
+    def __init__(self, points: List[Tuple[float, float, float]]):
+        self.points = points
+        # Node arrays: point index, split axis, left child, right child (-1 for none)
+        self.index: List[int] = []
+        self.axis: List[int] = []
+        self.left: List[int] = []
+        self.right: List[int] = []
+        self.root = self._build(list(range(len(points))), 0)
+    
+    def _build(self, ids: List[int], depth: int) -> int:
+        if not ids:
+            return -1
+        axis = depth % 3
+        ids.sort(key=lambda i: self.points[i][axis])
+        middle = len(ids) // 2
+        
+        node = len(self.index)
+        self.index.append(ids[middle])
+        self.axis.append(axis)
+        self.left.append(-1)
+        self.right.append(-1)
+        self.left[node] = self._build(ids[:middle], depth + 1)
+        self.right[node] = self._build(ids[middle + 1:], depth + 1)
+        return node
+    
+    def nearest(
+        self,
+        target: Tuple[float, float, float],
+        k: int,
+        accept: Optional[Callable[[int], bool]] = None
+    ) -> List[Tuple[float, int]]:
+        """(squared chord distance, point index) of the k nearest accepted points, closest first"""
+        best: List[Tuple[float, int]] = []  # max-heap via negated distances
+        
+        def visit(node: int) -> None:
+            if node < 0:
+                return
+            point_id = self.index[node]
+            point = self.points[point_id]
+            distance = sum((a - b) ** 2 for a, b in zip(point, target))
+            if accept is None or accept(point_id):
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, point_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, point_id))
+            
+            axis = self.axis[node]
+            offset = target[axis] - point[axis]
+            near, far = (self.left[node], self.right[node]) if offset < 0 else (self.right[node], self.left[node])
+            visit(near)
+            if len(best) < k or offset * offset < -best[0][0]:
+                visit(far)
+        
+        if k > 0:
+            visit(self.root)
+        return sorted((-distance, point_id) for distance, point_id in best)
+
+
+class Gazetteer:
+    """City names and aliases resolved to coordinates"""
+    
+    def __init__(self, cities: List[Dict]):
+        self.cities: Dict[str, Dict] = {}
+        for city in cities:
+            for name in [city["name"]] + city.get("aliases", []):
+                self.cities[name.lower()] = city
+        
+        # One alternation, longest names first so "Navi Mumbai" wins over "Mumbai"
+        names = sorted(self.cities, key=len, reverse=True)
+        self.pattern = re.compile(r"\b(" + "|".join(re.escape(n) for n in names) + r")\b", re.IGNORECASE) if names else None
+    
+    def locate(self, text: str) -> Optional[Dict]:
+        """
+        Resolve "lat,lon" or free text mentioning a known city
+        Returns: {"name", "lat", "lon", "metro"} or None
+        """
+        if not text:
+            return None
+        
+        match = COORDINATE_PATTERN.match(text)
+        if match:
+            return {"name": None, "lat": float(match.group(1)), "lon": float(match.group(2)), "metro": False}
+        
+        match = self.pattern.search(text) if self.pattern else None
+        if not match:
+            return None
+        city = self.cities[match.group(1).lower()]
+        return {"name": city["name"], "lat": city["lat"], "lon": city["lon"], "metro": city.get("metro", False)}
+
+
+class GeoIndex:
+    """Geocoded stores and warehouses with nearest-location and delivery-zone queries"""
+    
+    def __init__(self, stores: List[Dict], warehouses: List[Dict], cities: List[Dict]):
+        self.gazetteer = Gazetteer(cities)
+        self.stores = [s for s in stores if "lat" in s and "lon" in s]
+        self.warehouses = [w for w in warehouses if "lat" in w and "lon" in w]
+        self.store_ids = {store["name"]: i for i, store in enumerate(self.stores)}
+        
+        self.store_tree = KDTree([to_unit_vector(s["lat"], s["lon"]) for s in self.stores])
+        self.warehouse_tree = KDTree([to_unit_vector(w["lat"], w["lon"]) for w in self.warehouses])
+    
+    def nearest_stores(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 3,
+        accept: Optional[Callable[[str], bool]] = None
+    ) -> List[Dict]:
+        """Closest k stores (optionally only those passing accept(store_name)), with distances"""
+        predicate = (lambda i: accept(self.stores[i]["name"])) if accept else None
+        return [
+            {**self.stores[i], "distance_km": round(haversine_km(lat, lon, self.stores[i]["lat"], self.stores[i]["lon"]), 1)}
+            for _, i in self.store_tree.nearest(to_unit_vector(lat, lon), k, predicate)
+        ]
+    
+    def nearest_warehouse(self, lat: float, lon: float) -> Optional[Dict]:
+        """Closest warehouse with its distance"""
+        found = self.warehouse_tree.nearest(to_unit_vector(lat, lon), 1)
+        if not found:
+            return None
+        warehouse = self.warehouses[found[0][1]]
+        return {**warehouse, "distance_km": round(haversine_km(lat, lon, warehouse["lat"], warehouse["lon"]), 1)}
+    
+    def delivery_zone(self, customer_location: str) -> str:
+        """same_city near a warehouse, metro_to_metro for other metros, else other"""
+        place = self.gazetteer.locate(customer_location)
+        if place is None:
+            return "other"
+        
+        warehouse = self.nearest_warehouse(place["lat"], place["lon"])
+        if warehouse and warehouse["distance_km"] <= SAME_CITY_RADIUS_KM:
+            return "same_city"
+        if place["metro"]:
+            return "metro_to_metro"
+        return "other"
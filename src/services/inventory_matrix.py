@@ -0,0 +1,426 @@
+"""Array-backed inventory matrix with precomputed stock aggregates"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+# Location code 0 is always online stock; stores follow in load order
+ONLINE = "online"
+
+# Availability bitmaps hold one bit per SKU location row; rows past this are scanned
+BITMAP_WIDTH = 64
+
+
+class SkuLayout:
+    """Where one SKU's stock block lives and its per-dimension integer codes"""
+    
+    __slots__ = (
+        "locations", "colors", "sizes", "shape",
+        "stock_offset", "color_offset", "size_offset", "total_offset", "mask_offset"
+    )
+    
+    def __init__(self, locations: Dict[int, int], colors: Dict[str, int], sizes: Dict[str, int]):
+        self.locations = locations
+        self.colors = colors
+        self.sizes = sizes
+        self.shape: Tuple[int, int, int] = (len(locations), len(colors), len(sizes))
+        self.stock_offset = 0
+        self.color_offset = 0
+        self.size_offset = 0
+        self.total_offset = 0
+        self.mask_offset = 0
+    
+    def combo(self, c: Optional[int], s: Optional[int]) -> int:
+        """Bitmap slot of a (color code, size code) pair; None stands for any"""
+        _, colors, sizes = self.shape
+        return self.mask_offset + (colors if c is None else c) * (sizes + 1) + (sizes if s is None else s)
+
+
+class InventoryMatrix:
+    """
+    Stock counts indexed by (sku, location, color, size)
+    
+    Each SKU owns a dense location x color x size block inside one flat
+    array, with color, size and location totals kept in parallel flat
+    arrays. Every availability question is a single array lookup, and
+    stock changes update the matching aggregates incrementally. Writers
+    serialize per SKU; only growing the arrays takes a shared lock.
+    """
+    
+    def __init__(self, inventory: Dict[str, Dict]):
+        self.locations: List[str] = [ONLINE]
+        self.location_codes: Dict[str, int] = {ONLINE: 0}
+        self.layouts: Dict[str, SkuLayout] = {}
+        self._shared: Dict[tuple, dict] = {}
+        self._sku_locks: Dict[str, threading.Lock] = {}
+        self._resize_lock = threading.Lock()
+        self._generation = 0
+        
+        # Every stock change bumps the global version and stamps its SKU
+        self.version = 0
+        self.sku_versions: Dict[str, int] = {}
+        self._version_lock = threading.Lock()
+        
+        stock_cells: List[int] = []
+        quantities: List[int] = []
+        used = [0, 0, 0, 0, 0]
+        
+        for sku, entry in inventory.items():
+            sources = [(ONLINE, entry.get("online", {}))] + list(entry.get("stores", {}).items())
+            color_names = dict.fromkeys(color for _, stock in sources for color in stock)
+            size_names = dict.fromkeys(size for _, stock in sources for sizes in stock.values() for size in sizes)
+            
+            layout = SkuLayout(
+                self._share_codes(self.location_code(name, create=True) for name, _ in sources),
+                self._share_codes(color_names),
+                self._share_codes(size_names)
+            )
+            used = self._place(layout, used)
+            self.layouts[sku] = layout
+            
+            _, colors, sizes = layout.shape
+            size_codes = layout.sizes
+            for row, (_, stock) in enumerate(sources):
+                for color, by_size in stock.items():
+                    base = layout.stock_offset + (row * colors + layout.colors[color]) * sizes
+                    stock_cells.extend(base + size_codes[size] for size in by_size)
+                    quantities.extend(by_size.values())
+        
+        self.stock = np.zeros(used[0], dtype=np.int64)
+        self.stock[np.array(stock_cells, dtype=np.int64)] = np.array(quantities, dtype=np.int64)
+        self._summarize(list(self.layouts.values()), used)
+        self._used = used
+        self._shared = {}
+    
+    def _summarize(self, layouts: List[SkuLayout], used: List[int]) -> None:
+        """Build totals and availability bitmaps for freshly packed blocks in vectorized passes"""
+        shapes = np.array([layout.shape for layout in layouts], dtype=np.int64).reshape(-1, 3)
+        offsets = np.array(
+            [(l.stock_offset, l.color_offset, l.size_offset, l.total_offset, l.mask_offset) for l in layouts],
+            dtype=np.int64
+        ).reshape(-1, 5)
+        locations, colors, sizes = shapes[:, 0], shapes[:, 1], shapes[:, 2]
+        
+        def decompose(column: int, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            """Owning SKU and block-local index of every entry in a packed flat array"""
+            owner = np.repeat(np.arange(len(layouts)), lengths)
+            return owner, np.arange(used[column], dtype=np.int64) - offsets[owner, column]
+        
+        def total(cells: np.ndarray, length: int) -> np.ndarray:
+            return np.rint(np.bincount(cells, weights=self.stock, minlength=length)).astype(np.int64)
+        
+        # Every stock cell is (owning SKU, row, color, size)
+        owner, local = decompose(0, locations * colors * sizes)
+        cell_sizes = sizes[owner]
+        cell_colors = colors[owner]
+        size_codes = local % cell_sizes
+        color_codes = (local // cell_sizes) % cell_colors
+        rows = local // (cell_sizes * cell_colors)
+        
+        self.color_totals = total(offsets[owner, 1] + rows * cell_colors + color_codes, used[1])
+        self.size_totals = total(offsets[owner, 2] + rows * cell_sizes + size_codes, used[2])
+        self.location_totals = total(offsets[owner, 3] + rows, used[3])
+        self.masks = np.zeros(used[4], dtype=np.uint64)
+        
+        def mark(owner: np.ndarray, rows: np.ndarray, combos: np.ndarray, quantities: np.ndarray) -> None:
+            keep = (quantities > 0) & (rows < BITMAP_WIDTH)
+            bits = np.left_shift(np.uint64(1), rows[keep].astype(np.uint64))
+            np.add.at(self.masks, offsets[owner[keep], 4] + combos[keep], bits)
+        
+        # Bitmaps per (color, size), (color, any), (any, size) and (any, any)
+        mark(owner, rows, color_codes * (cell_sizes + 1) + size_codes, self.stock)
+        
+        owner, local = decompose(1, locations * colors)
+        mark(owner, local // colors[owner], (local % colors[owner]) * (sizes[owner] + 1) + sizes[owner], self.color_totals)
+        
+        owner, local = decompose(2, locations * sizes)
+        mark(owner, local // sizes[owner], colors[owner] * (sizes[owner] + 1) + local % sizes[owner], self.size_totals)
+        
+        owner, local = decompose(3, locations)
+        mark(owner, local, colors[owner] * (sizes[owner] + 1) + sizes[owner], self.location_totals)
+    
+    def _share_codes(self, names: Iterable) -> Dict:
+        """Code table for a sequence of names, shared between SKUs with the same sequence"""
+        key = tuple(names)
+        codes = self._shared.get(key)
+        if codes is None:
+            codes = {name: code for code, name in enumerate(key)}
+            self._shared[key] = codes
+        return codes
+    
+    @staticmethod
+    def _place(layout: SkuLayout, used: List[int]) -> List[int]:
+        """Assign a layout's offsets at the end of the flat arrays"""
+        locations, colors, sizes = layout.shape
+        layout.stock_offset, layout.color_offset, layout.size_offset, layout.total_offset, layout.mask_offset = used
+        return [
+            used[0] + locations * colors * sizes,
+            used[1] + locations * colors,
+            used[2] + locations * sizes,
+            used[3] + locations,
+            used[4] + (colors + 1) * (sizes + 1)
+        ]
+    
+    def location_code(self, location: str, create: bool = False) -> Optional[int]:
+        """Integer code of a location name"""
+        code = self.location_codes.get(location)
+        if code is None and create:
+            code = len(self.locations)
+            self.location_codes[location] = code
+            self.locations.append(location)
+        return code
+    
+    def __contains__(self, sku: str) -> bool:
+        return sku in self.layouts
+    
+    def __len__(self) -> int:
+        return len(self.layouts)
+    
+    def locations_for(self, sku: str) -> List[str]:
+        """Location names holding a stock block row for the SKU, online first"""
+        layout = self.layouts.get(sku)
+        if layout is None:
+            return []
+        return [self.locations[code] for code in layout.locations]
+    
+    def colors_for(self, sku: str) -> List[str]:
+        """Colors stocked anywhere for the SKU"""
+        layout = self.layouts.get(sku)
+        return list(layout.colors) if layout else []
+    
+    def sizes_for(self, sku: str) -> List[str]:
+        """Sizes stocked anywhere for the SKU"""
+        layout = self.layouts.get(sku)
+        return list(layout.sizes) if layout else []
+    
+    def quantity(
+        self,
+        sku: str,
+        location: str = ONLINE,
+        color: Optional[str] = None,
+        size: Optional[str] = None
+    ) -> int:
+        """Units in stock; a missing color or size means summed over that dimension"""
+        layout = self.layouts.get(sku)
+        if layout is None:
+            return 0
+        
+        row = layout.locations.get(self.location_codes.get(location, -1))
+        if row is None:
+            return 0
+        
+        c = layout.colors.get(color) if color else None
+        s = layout.sizes.get(size) if size else None
+        if (color and c is None) or (size and s is None):
+            return 0
+        
+        _, colors, sizes = layout.shape
+        if color and size:
+            return self.stock.item(layout.stock_offset + (row * colors + c) * sizes + s)
+        if color:
+            return self.color_totals.item(layout.color_offset + row * colors + c)
+        if size:
+            return self.size_totals.item(layout.size_offset + row * sizes + s)
+        return self.location_totals.item(layout.total_offset + row)
+    
+    def quantities(self, cells: List[Tuple[str, str, Optional[str], Optional[str]]]) -> List[int]:
+        """Units in stock for each (sku, location, color, size) cell"""
+        return [self.quantity(sku, location, color, size) for sku, location, color, size in cells]
+    
+    def availability_mask(self, sku: str, color: Optional[str] = None, size: Optional[str] = None) -> int:
+        """Bitmap of the SKU's location rows with stock; bit 0 is online"""
+        layout = self.layouts.get(sku)
+        if layout is None:
+            return 0
+        
+        c = layout.colors.get(color) if color else None
+        s = layout.sizes.get(size) if size else None
+        if (color and c is None) or (size and s is None):
+            return 0
+        
+        mask = self.masks.item(layout.combo(c, s))
+        if layout.shape[0] > BITMAP_WIDTH:
+            for row, code in enumerate(layout.locations):
+                if row >= BITMAP_WIDTH and self.quantity(sku, self.locations[code], color, size) > 0:
+                    mask |= 1 << row
+        return mask
+    
+    def available_locations(self, sku: str, color: Optional[str] = None, size: Optional[str] = None) -> List[str]:
+        """Location names with stock for the SKU, online first, then stores in load order"""
+        mask = self.availability_mask(sku, color, size)
+        if not mask:
+            return []
+        layout = self.layouts[sku]
+        return [self.locations[code] for row, code in enumerate(layout.locations) if mask >> row & 1]
+    
+    def sku_lock(self, sku: str) -> threading.Lock:
+        """Lock serializing stock changes of one SKU"""
+        lock = self._sku_locks.get(sku)
+        if lock is None:
+            lock = self._sku_locks.setdefault(sku, threading.Lock())
+        return lock
+    
+    def adjust(self, sku: str, location: str, color: str, size: str, delta: int) -> Optional[int]:
+        """
+        Add delta units to one cell, keeping aggregates in step
+        Returns: new quantity, or None if stock would go negative
+        """
+        with self.sku_lock(sku):
+            return self._adjust_locked(sku, location, color, size, delta)
+    
+    def set_quantity(self, sku: str, location: str, color: str, size: str, quantity: int) -> int:
+        """Set one cell to an absolute quantity; returns the applied delta"""
+        with self.sku_lock(sku):
+            delta = quantity - self.quantity(sku, location, color, size)
+            self._adjust_locked(sku, location, color, size, delta)
+            return delta
+    
+    def _adjust_locked(self, sku: str, location: str, color: str, size: str, delta: int) -> Optional[int]:
+        """adjust() for callers already holding the SKU's lock"""
+        layout = self.layouts.get(sku)
+        code = self.location_codes.get(location)
+        if layout is None or code not in layout.locations or color not in layout.colors or size not in layout.sizes:
+            # A new cell starts at zero, so a decrement is rejected before anything is allocated
+            if delta < 0:
+                return None
+            with self._resize_lock:
+                layout = self._layout_with(sku, location, color, size)
+        
+        # Writes go to the arrays seen here; a concurrent resize is repaired below
+        generation = self._generation
+        stock, color_totals, size_totals, location_totals, masks = arrays = self._arrays()
+        
+        row = layout.locations[self.location_codes[location]]
+        c = layout.colors[color]
+        s = layout.sizes[size]
+        _, colors, sizes = layout.shape
+        
+        cell = layout.stock_offset + (row * colors + c) * sizes + s
+        updated = stock.item(cell) + delta
+        if updated < 0:
+            return None
+        
+        color_cell = layout.color_offset + row * colors + c
+        size_cell = layout.size_offset + row * sizes + s
+        total_cell = layout.total_offset + row
+        stock[cell] = updated
+        color_totals[color_cell] += delta
+        size_totals[size_cell] += delta
+        location_totals[total_cell] += delta
+        
+        if row < BITMAP_WIDTH:
+            self._set_bit(masks, layout.combo(c, s), row, updated > 0)
+            self._set_bit(masks, layout.combo(c, None), row, color_totals[color_cell] > 0)
+            self._set_bit(masks, layout.combo(None, s), row, size_totals[size_cell] > 0)
+            self._set_bit(masks, layout.combo(None, None), row, location_totals[total_cell] > 0)
+        
+        if generation % 2 or generation != self._generation:
+            with self._resize_lock:
+                self._copy_block(layout, arrays)
+        
+        # Bumped after the write, so a reader never sees new versions over old stock
+        with self._version_lock:
+            self.version += 1
+            self.sku_versions[sku] = self.version
+        return updated
+    
+    def sku_version(self, sku: str) -> int:
+        """Inventory version at the SKU's last stock change (0 if never changed)"""
+        return self.sku_versions.get(sku, 0)
+    
+    def apply_batch(self, deltas: List[Tuple[str, str, str, str, int]]) -> List[Optional[int]]:
+        """Apply (sku, location, color, size, delta) changes; None marks a rejected change"""
+        return [self.adjust(*delta) for delta in deltas]
+    
+    def _arrays(self) -> Tuple[np.ndarray, ...]:
+        return self.stock, self.color_totals, self.size_totals, self.location_totals, self.masks
+    
+    @staticmethod
+    def _set_bit(masks: np.ndarray, slot: int, row: int, available: bool) -> None:
+        """Set or clear one location bit of a bitmap"""
+        bit = 1 << row
+        mask = masks.item(slot)
+        masks[slot] = (mask | bit) if available else (mask & ~bit)
+    
+    def _copy_block(self, layout: SkuLayout, source: Tuple[np.ndarray, ...]) -> None:
+        """Copy one SKU's block from arrays that were replaced while it was being written"""
+        locations, colors, sizes = layout.shape
+        spans = [
+            (layout.stock_offset, locations * colors * sizes),
+            (layout.color_offset, locations * colors),
+            (layout.size_offset, locations * sizes),
+            (layout.total_offset, locations),
+            (layout.mask_offset, (colors + 1) * (sizes + 1))
+        ]
+        for old, new, (offset, length) in zip(source, self._arrays(), spans):
+            if old is not new:
+                new[offset:offset + length] = old[offset:offset + length]
+    
+    def _layout_with(self, sku: str, location: str, color: str, size: str) -> SkuLayout:
+        """Layout of a SKU, relocated into a larger block if a dimension value is new"""
+        layout = self.layouts.get(sku)
+        code = self.location_code(location, create=True)
+        if layout is not None and code in layout.locations and color in layout.colors and size in layout.sizes:
+            return layout
+        
+        old = layout or SkuLayout({0: 0}, {}, {})
+        grown = SkuLayout(
+            self._extend(old.locations, code),
+            self._extend(old.colors, color),
+            self._extend(old.sizes, size)
+        )
+        self._used = self._place(grown, self._used)
+        self._reserve(self._used)
+        
+        # Copy the old block into its new position, then rebuild its aggregates
+        locations, colors, sizes = grown.shape
+        block = self.stock[grown.stock_offset:grown.stock_offset + locations * colors * sizes].reshape(grown.shape)
+        block[:] = 0
+        if layout is not None:
+            old_locations, old_colors, old_sizes = old.shape
+            block[:old_locations, :old_colors, :old_sizes] = self.stock[
+                old.stock_offset:old.stock_offset + old_locations * old_colors * old_sizes
+            ].reshape(old.shape)
+        
+        self.color_totals[grown.color_offset:grown.color_offset + locations * colors] = block.sum(axis=2).ravel()
+        self.size_totals[grown.size_offset:grown.size_offset + locations * sizes] = block.sum(axis=1).ravel()
+        self.location_totals[grown.total_offset:grown.total_offset + locations] = block.sum(axis=(1, 2))
+        
+        # Rebuild the block's bitmaps from its stock and totals
+        combos = {(c, s): 0 for c in [*range(colors), None] for s in [*range(sizes), None]}
+        for row in range(min(locations, BITMAP_WIDTH)):
+            bit = 1 << row
+            for (c, s) in combos:
+                if block[row, slice(None) if c is None else c, slice(None) if s is None else s].sum() > 0:
+                    combos[(c, s)] |= bit
+        for (c, s), mask in combos.items():
+            self.masks[grown.combo(c, s)] = mask
+        
+        self.layouts[sku] = grown
+        return grown
+    
+    @staticmethod
+    def _extend(codes: Dict, name) -> Dict:
+        """Copy of a code table with one more entry (tables may be shared, so never mutate)"""
+        if name in codes:
+            return codes
+        extended = dict(codes)
+        extended[name] = len(extended)
+        return extended
+    
+    def _reserve(self, used: List[int]) -> None:
+        """Grow the flat arrays (doubling) so every used prefix fits"""
+        names = ("stock", "color_totals", "size_totals", "location_totals", "masks")
+        if all(length <= len(getattr(self, name)) for name, length in zip(names, used)):
+            return
+        
+        # Odd generation while copying, so writers racing the copy repair their block
+        self._generation += 1
+        for name, length in zip(names, used):
+            array = getattr(self, name)
+            if length > len(array):
+                grown = np.zeros(max(length, 2 * len(array)), dtype=array.dtype)
+                grown[:len(array)] = array
+                setattr(self, name, grown)
+        self._generation += 1
@@ -1,17 +1,29 @@
 """Inventory management service"""
 
-from typing import Dict, List, Optional, Tuple
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from config.settings import settings
+from src.services.geo_index import GeoIndex
+from src.services.inventory_matrix import ONLINE
+from src.services.inventory_store import create_inventory_store
+from src.services.reservations import ReservationEngine
+from src.utils.cache import VersionedLRUCache
 from src.utils.helpers import load_json_data
 
 
 class InventoryService:
     """Service for checking inventory and availability"""
     
-    def __init__(self):
-        self.inventory_data = load_json_data("inventory.json")
-        self.inventory = self.inventory_data.get("inventory", {})
-        self.warehouses = self.inventory_data.get("warehouses", [])
-        self.delivery_estimates = self.inventory_data.get("delivery_estimates", {})
+    def __init__(self, data_dir: Optional[Path] = None):
+        inventory_data = load_json_data("inventory.json", data_dir)
+        self.store = create_inventory_store(inventory_data.get("inventory", {}))
+        self.reservations = ReservationEngine(self.store, ttl=settings.reservation_ttl)
+        self.warehouses = inventory_data.get("warehouses", [])
+        self.stores = inventory_data.get("stores", [])
+        self.delivery_estimates = inventory_data.get("delivery_estimates", {})
+        self.geo = GeoIndex(self.stores, self.warehouses, load_json_data("cities.json", data_dir).get("cities", []))
+        self.fulfillment_cache = VersionedLRUCache(settings.fulfillment_cache_size)
     
     def check_availability(
         self,
@@ -24,82 +36,156 @@ class InventoryService:
         Check if product is available
         Returns: (is_available, quantity)
         """
-        if sku not in self.inventory:
-            return False, 0
+        quantity = self.store.quantity(sku, location, color, size)
+        return quantity > 0, quantity
+    
+    def check_availability_batch(self, lines: Iterable[Tuple]) -> Dict:
+        """
+        Check a whole cart in one pass
+        Each line: (sku, color, size, quantity) or (sku, color, size, quantity, location)
+        Returns: {"available", "lines"} where each line reports requested, in_stock and shortfall
+        """
+        lines = [tuple(line) + (ONLINE,) * (5 - len(line)) for line in lines]
+        cells = list(dict.fromkeys((sku, location, color, size) for sku, color, size, _, location in lines))
+        in_stock = dict(zip(cells, self.store.quantities(cells)))
         
-        product_inventory = self.inventory[sku]
+        # Lines asking for the same cell share its stock, so later lines carry the shortfall
+        demanded: Dict[Tuple, int] = {}
+        results = []
+        for sku, color, size, quantity, location in lines:
+            cell = (sku, location, color, size)
+            already = demanded.get(cell, 0)
+            demanded[cell] = already + quantity
+            remaining = max(0, in_stock[cell] - already)
+            results.append({
+                "sku": sku,
+                "color": color,
+                "size": size,
+                "location": location,
+                "requested": quantity,
+                "in_stock": in_stock[cell],
+                "shortfall": max(0, quantity - remaining)
+            })
         
-        # Check online inventory
-        if location == "online":
-            online_inv = product_inventory.get("online", {})
-            
-            if color and size:
-                quantity = online_inv.get(color, {}).get(size, 0)
-            elif color:
-                quantity = sum(online_inv.get(color, {}).values())
-            elif size:
-                quantity = sum(
-                    sizes.get(size, 0)
-                    for sizes in online_inv.values()
-                )
-            else:
-                quantity = sum(
-                    sum(sizes.values())
-                    for sizes in online_inv.values()
-                )
-            
-            return quantity > 0, quantity
+        return {
+            "available": all(result["shortfall"] == 0 for result in results),
+            "lines": results
+        }
+    
+    def update_stock(
+        self,
+        sku: str,
+        color: str,
+        size: str,
+        quantity_change: int,
+        location: str = "online"
+    ) -> Optional[int]:
+        """
+        Add or remove stock for one variant at one location
+        Returns: new quantity, or None if there is not enough stock to remove
+        """
+        return self.store.adjust(sku, location, color, size, quantity_change)
+    
+    def apply_deltas(self, source: Union[str, Path, Iterable[str]], batch_size: int = 1000) -> Dict:
+        """
+        Apply a JSONL stream of stock deltas to live inventory in batches
+        Each line: {"sku", "location", "color", "size", "qty"} with a signed qty
+        Returns: {"applied", "rejected", "errors", "version"}
+        """
+        if isinstance(source, (str, Path)):
+            with open(source, "r", encoding="utf-8") as f:
+                return self.apply_deltas(f, batch_size)
         
-        # Check store inventory
-        else:
-            stores_inv = product_inventory.get("stores", {})
-            store_inv = stores_inv.get(location, {})
-            
-            if color and size:
-                quantity = store_inv.get(color, {}).get(size, 0)
-            elif color:
-                quantity = sum(store_inv.get(color, {}).values())
-            elif size:
-                quantity = sum(
-                    sizes.get(size, 0)
-                    for sizes in store_inv.values()
-                )
-            else:
-                quantity = sum(
-                    sum(sizes.values())
-                    for sizes in store_inv.values()
-                )
+        report = {"applied": 0, "rejected": 0, "errors": [], "version": 0}
+        
+        def flush(batch: List[Tuple], line_numbers: List[int]) -> None:
+            for line_number, result in zip(line_numbers, self.store.apply_batch(batch)):
+                if result is None:
+                    report["rejected"] += 1
+                    report["errors"].append({"line": line_number, "error": "insufficient stock"})
+                else:
+                    report["applied"] += 1
+        
+        batch: List[Tuple] = []
+        line_numbers: List[int] = []
+        for line_number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                qty = record["qty"]
+                if isinstance(qty, bool) or not isinstance(qty, int):
+                    raise ValueError(f"qty must be an integer, got {qty!r}")
+                batch.append((
+                    record["sku"],
+                    record.get("location", ONLINE),
+                    record["color"],
+                    record["size"],
+                    qty
+                ))
+                line_numbers.append(line_number)
+            except (ValueError, KeyError, TypeError) as e:
+                report["rejected"] += 1
+                report["errors"].append({"line": line_number, "error": f"malformed delta: {e}"})
+                continue
             
-            return quantity > 0, quantity
+            if len(batch) >= batch_size:
+                flush(batch, line_numbers)
+                batch, line_numbers = [], []
+        
+        if batch:
+            flush(batch, line_numbers)
+        
+        report["errors"].sort(key=lambda error: error["line"])
+        report["version"] = self.store.version
+        return report
+    
+    def get_inventory_version(self, sku: Optional[str] = None) -> int:
+        """Current inventory version, or the version of a SKU's last stock change"""
+        if sku is None:
+            return self.store.version
+        return self.store.sku_version(sku)
     
     def get_available_stores(self, sku: str, color: Optional[str] = None, size: Optional[str] = None) -> List[str]:
         """Get list of stores where product is available"""
-        if sku not in self.inventory:
-            return []
-        
-        stores_inv = self.inventory[sku].get("stores", {})
-        available_stores = []
-        
-        for store_name, store_inv in stores_inv.items():
-            is_available, _ = self.check_availability(sku, color, size, store_name)
-            if is_available:
-                available_stores.append(store_name)
-        
-        return available_stores
+        return [
+            location for location in self.store.available_locations(sku, color, size)
+            if location != ONLINE
+        ]
+    
+    def get_delivery_zone(self, customer_location: str) -> str:
+        """Delivery zone for a city name or "lat,lon": same_city, metro_to_metro or other"""
+        return self.geo.delivery_zone(customer_location)
     
     def get_delivery_estimate(self, customer_location: str, fulfillment_type: str = "standard") -> str:
         """Get delivery time estimate"""
-        # Simplified logic - in production, this would use actual location data
-        if "Mumbai" in customer_location or "Delhi" in customer_location:
-            location_type = "same_city"
-        elif any(city in customer_location for city in ["Bangalore", "Chennai", "Hyderabad", "Pune"]):
-            location_type = "metro_to_metro"
-        else:
-            location_type = "other"
-        
-        estimates = self.delivery_estimates.get(location_type, {})
+        estimates = self.delivery_estimates.get(self.get_delivery_zone(customer_location), {})
         return estimates.get(fulfillment_type, "4-6 days")
     
+    def get_nearest_stores(
+        self,
+        customer_location: str,
+        sku: Optional[str] = None,
+        color: Optional[str] = None,
+        size: Optional[str] = None,
+        limit: int = 3
+    ) -> List[Dict]:
+        """
+        Closest stores to the customer, only those stocking the variant when a SKU is given
+        Returns: store dicts with distance_km (None if the location is unknown)
+        """
+        in_stock = set(self.get_available_stores(sku, color, size)) if sku else None
+        return self._nearest_stores(customer_location, in_stock, limit)
+    
+    def _nearest_stores(self, customer_location: str, names: Optional[set], limit: int) -> List[Dict]:
+        """Closest stores, restricted to names if given; unknown locations keep data order"""
+        accept = names.__contains__ if names is not None else None
+        place = self.geo.gazetteer.locate(customer_location)
+        if place is None:
+            stores = [store for store in self.geo.stores if accept is None or accept(store["name"])]
+            return [{**store, "distance_km": None} for store in stores[:limit]]
+        return self.geo.nearest_stores(place["lat"], place["lon"], limit, accept)
+    
     def get_fulfillment_options(
         self,
         sku: str,
@@ -107,7 +193,34 @@ class InventoryService:
         size: Optional[str],
         customer_location: str
     ) -> Dict:
-        """Get all fulfillment options for a product"""
+        """Get all fulfillment options for a product, cached until the SKU's stock changes"""
+        # Customers in the same place share a zone and a store ranking
+        place = self.geo.gazetteer.locate(customer_location)
+        key = (sku, color, size, (place["name"] or (place["lat"], place["lon"])) if place else None)
+        version = self.store.sku_version(sku)
+        
+        options = self.fulfillment_cache.get(key, version)
+        if options is None:
+            options = self._build_fulfillment_options(sku, color, size, customer_location)
+            self.fulfillment_cache.put(key, version, options)
+        # Hand out a copy so callers cannot edit the cached entry
+        return {
+            name: {**option, "stores": list(option["stores"])} if "stores" in option else dict(option)
+            for name, option in options.items()
+        }
+    
+    def get_fulfillment_cache_stats(self) -> Dict:
+        """Hit and miss counters of the fulfillment options cache"""
+        return self.fulfillment_cache.stats()
+    
+    def _build_fulfillment_options(
+        self,
+        sku: str,
+        color: Optional[str],
+        size: Optional[str],
+        customer_location: str
+    ) -> Dict:
+        """Compute fulfillment options from live stock"""
         options = {
             "home_delivery": {
                 "available": False,
@@ -123,15 +236,22 @@ class InventoryService:
             }
         }
         
-        # Check online availability for home delivery
-        is_available, quantity = self.check_availability(sku, color, size, "online")
-        if is_available:
+        # One bitmap answers both online and store availability
+        locations = self.store.available_locations(sku, color, size)
+        if ONLINE in locations:
             options["home_delivery"]["available"] = True
             options["home_delivery"]["estimate"] = self.get_delivery_estimate(customer_location)
         
-        # Check store availability
-        available_stores = self.get_available_stores(sku, color, size)
+        available_stores = [location for location in locations if location != ONLINE]
         if available_stores:
+            # Nearest first when the customer can be placed on the map
+            nearest = [
+                store["name"]
+                for store in self._nearest_stores(customer_location, set(available_stores), len(available_stores))
+                if store["distance_km"] is not None
+            ]
+            available_stores = nearest + [name for name in available_stores if name not in nearest]
+            
             options["store_pickup"]["available"] = True
             options["store_pickup"]["stores"] = available_stores
             options["click_collect"]["available"] = True
@@ -139,7 +259,33 @@ class InventoryService:
         
         return options
     
-    def reserve_inventory(self, sku: str, color: str, size: str, quantity: int = 1) -> bool:
-        """Reserve inventory for checkout (mock implementation)"""
-        is_available, available_qty = self.check_availability(sku, color, size)
-        return is_available and available_qty >= quantity
+    def reserve_inventory(
+        self,
+        sku: str,
+        color: Optional[str],
+        size: Optional[str],
+        quantity: int = 1,
+        location: str = "online"
+    ) -> Optional[str]:
+        """
+        Hold stock for checkout until committed, released or expired
+        Returns: hold id, or None if not enough stock
+        """
+        self.reservations.start_sweeper(settings.reservation_sweep_interval)
+        return self.reservations.reserve(sku, color, size, quantity, location)
+    
+    def reserve_items(self, items: List[Tuple], location: str = "online") -> Optional[List[str]]:
+        """
+        Hold every (sku, color, size, quantity) line, or none of them
+        Returns: hold ids, or None if any line is short
+        """
+        self.reservations.start_sweeper(settings.reservation_sweep_interval)
+        return self.reservations.reserve_all(items, location)
+    
+    def release_reservation(self, hold_id: str) -> bool:
+        """Return held stock (payment failed or checkout abandoned)"""
+        return self.reservations.release(hold_id)
+    
+    def commit_reservation(self, hold_id: str) -> bool:
+        """Keep held stock sold once the order is confirmed"""
+        return self.reservations.commit(hold_id)
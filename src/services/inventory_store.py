@@ -0,0 +1,243 @@
+"""Pluggable inventory storage backends (in-process or shared Redis)"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+import redis
+from config.settings import settings
+from src.services.inventory_matrix import InventoryMatrix, ONLINE
+
+
+# Wildcard used in Redis field names for aggregate counters
+ANY = "*"
+
+# SKUs written per pipeline round trip during bulk loads
+BULK_LOAD_BATCH = 1000
+
+# Decrement-if-available (or absolute set) of one cell plus its aggregates, atomically;
+# a successful change bumps the global version and stamps it on the SKU
+ADJUST_SCRIPT = """
+local location, color, size = ARGV[1], ARGV[2], ARGV[3]
+local cell = location .. '|' .. color .. '|' .. size
+local current = tonumber(redis.call('HGET', KEYS[1], cell) or '0')
+local delta = tonumber(ARGV[4])
+if ARGV[5] == 'set' then
+    delta = delta - current
+end
+
+local updated = current + delta
+if updated < 0 then
+    return {-1, 0}
+end
+
+if redis.call('HEXISTS', KEYS[1], cell) == 0 then
+    local names = {location, color, size}
+    for i, dimension in ipairs({'locations', 'colors', 'sizes'}) do
+        local values = cjson.decode(redis.call('HGET', KEYS[2], dimension) or '[]')
+        local present = false
+        for _, value in ipairs(values) do
+            if value == names[i] then
+                present = true
+            end
+        end
+        if not present then
+            table.insert(values, names[i])
+            redis.call('HSET', KEYS[2], dimension, cjson.encode(values))
+        end
+    end
+end
+
+redis.call('HSET', KEYS[1], cell, updated)
+redis.call('HINCRBY', KEYS[1], location .. '|' .. color .. '|*', delta)
+redis.call('HINCRBY', KEYS[1], location .. '|*|' .. size, delta)
+redis.call('HINCRBY', KEYS[1], location .. '|*|*', delta)
+
+local version = redis.call('INCR', KEYS[3])
+redis.call('HSET', KEYS[2], 'version', version)
+return {updated, delta}
+"""
+
+
+class LocalInventoryStore(InventoryMatrix):
+    """In-process inventory store; each worker process has its own copy"""
+    
+    backend = "local"
+
+
+class RedisInventoryStore:
+    """
+    Inventory counters shared by every worker through Redis
+    
+    Each SKU is one hash of "location|color|size" counters, with "*" fields
+    holding the color, size and location totals, plus a small hash listing
+    its locations, colors and sizes in load order. Stock changes run as a
+    Lua script, so check-and-decrement is atomic across processes.
+    """
+    
+    backend = "redis"
+    
+    def __init__(self, client: redis.Redis, prefix: str = "inventory"):
+        self.client = client
+        self.prefix = prefix
+        self._adjust = client.register_script(ADJUST_SCRIPT)
+    
+    def _stock_key(self, sku: str) -> str:
+        return f"{self.prefix}:stock:{sku}"
+    
+    def _dims_key(self, sku: str) -> str:
+        return f"{self.prefix}:dims:{sku}"
+    
+    @property
+    def _version_key(self) -> str:
+        return f"{self.prefix}:version"
+    
+    @property
+    def version(self) -> int:
+        """Global inventory version, bumped by every stock change"""
+        return int(self.client.get(self._version_key) or 0)
+    
+    def sku_version(self, sku: str) -> int:
+        """Inventory version at the SKU's last stock change (0 if never changed)"""
+        return int(self.client.hget(self._dims_key(sku), "version") or 0)
+    
+    def load(self, inventory: Dict[str, Dict], replace: bool = False) -> bool:
+        """
+        Seed Redis from inventory.json data with pipelined writes
+        Returns: False if another worker already seeded it (and replace is off)
+        """
+        loaded_key = f"{self.prefix}:loaded"
+        if not replace and not self.client.set(loaded_key, "1", nx=True):
+            return False
+        
+        pipe = self.client.pipeline(transaction=False)
+        for count, (sku, entry) in enumerate(inventory.items(), 1):
+            sources = [(ONLINE, entry.get("online", {}))] + list(entry.get("stores", {}).items())
+            counters: Dict[str, int] = {}
+            for location, stock in sources:
+                counters[f"{location}|*|*"] = 0
+                for color, by_size in stock.items():
+                    counters.setdefault(f"{location}|{color}|*", 0)
+                    for size, quantity in by_size.items():
+                        counters[f"{location}|{color}|{size}"] = quantity
+                        counters[f"{location}|{color}|*"] += quantity
+                        counters[f"{location}|*|{size}"] = counters.get(f"{location}|*|{size}", 0) + quantity
+                        counters[f"{location}|*|*"] += quantity
+            
+            pipe.delete(self._stock_key(sku), self._dims_key(sku))
+            pipe.hset(self._stock_key(sku), mapping=counters)
+            pipe.hset(self._dims_key(sku), mapping={
+                "locations": json.dumps([location for location, _ in sources]),
+                "colors": json.dumps(list(dict.fromkeys(c for _, stock in sources for c in stock))),
+                "sizes": json.dumps(list(dict.fromkeys(
+                    s for _, stock in sources for by_size in stock.values() for s in by_size
+                )))
+            })
+            if count % BULK_LOAD_BATCH == 0:
+                pipe.execute()
+        pipe.execute()
+        return True
+    
+    def __contains__(self, sku: str) -> bool:
+        return bool(self.client.exists(self._dims_key(sku)))
+    
+    def _dimension(self, sku: str, name: str) -> List[str]:
+        raw = self.client.hget(self._dims_key(sku), name)
+        # An empty Lua table encodes as {}, so normalize through list()
+        return list(json.loads(raw)) if raw else []
+    
+    def locations_for(self, sku: str) -> List[str]:
+        """Location names stocking the SKU, online first"""
+        return self._dimension(sku, "locations")
+    
+    def colors_for(self, sku: str) -> List[str]:
+        """Colors stocked anywhere for the SKU"""
+        return self._dimension(sku, "colors")
+    
+    def sizes_for(self, sku: str) -> List[str]:
+        """Sizes stocked anywhere for the SKU"""
+        return self._dimension(sku, "sizes")
+    
+    def quantity(
+        self,
+        sku: str,
+        location: str = ONLINE,
+        color: Optional[str] = None,
+        size: Optional[str] = None
+    ) -> int:
+        """Units in stock; a missing color or size means summed over that dimension"""
+        value = self.client.hget(self._stock_key(sku), f"{location}|{color or ANY}|{size or ANY}")
+        return int(value) if value else 0
+    
+    def quantities(self, cells: List[Tuple[str, str, Optional[str], Optional[str]]]) -> List[int]:
+        """Units in stock for each (sku, location, color, size) cell, read in one pipeline"""
+        pipe = self.client.pipeline(transaction=False)
+        for sku, location, color, size in cells:
+            pipe.hget(self._stock_key(sku), f"{location}|{color or ANY}|{size or ANY}")
+        return [int(value) if value else 0 for value in pipe.execute()]
+    
+    def available_locations(self, sku: str, color: Optional[str] = None, size: Optional[str] = None) -> List[str]:
+        """Location names with stock for the SKU, online first, then stores in load order"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hget(self._dims_key(sku), "locations")
+        pipe.hgetall(self._stock_key(sku))
+        raw_locations, counters = pipe.execute()
+        if not raw_locations:
+            return []
+        
+        suffix = f"|{color or ANY}|{size or ANY}"
+        return [
+            location for location in json.loads(raw_locations)
+            if int(counters.get(f"{location}{suffix}", 0)) > 0
+        ]
+    
+    def adjust(self, sku: str, location: str, color: str, size: str, delta: int) -> Optional[int]:
+        """
+        Add delta units to one cell, keeping aggregates in step
+        Returns: new quantity, or None if stock would go negative
+        """
+        updated, _ = self._run(sku, location, color, size, delta, "add")
+        return None if updated < 0 else updated
+    
+    def set_quantity(self, sku: str, location: str, color: str, size: str, quantity: int) -> int:
+        """Set one cell to an absolute quantity; returns the applied delta"""
+        _, delta = self._run(sku, location, color, size, quantity, "set")
+        return delta
+    
+    def _run(self, sku: str, location: str, color: str, size: str, value: int, mode: str) -> tuple:
+        """Run the adjust script; returns (new quantity or -1, applied delta)"""
+        updated, delta = self._adjust(
+            keys=[self._stock_key(sku), self._dims_key(sku), self._version_key],
+            args=[location, color, size, value, mode]
+        )
+        return int(updated), int(delta)
+    
+    def apply_batch(self, deltas: List[Tuple[str, str, str, str, int]]) -> List[Optional[int]]:
+        """Apply (sku, location, color, size, delta) changes in one pipeline; None marks a rejected change"""
+        pipe = self.client.pipeline(transaction=False)
+        for sku, location, color, size, delta in deltas:
+            self._adjust(
+                keys=[self._stock_key(sku), self._dims_key(sku), self._version_key],
+                args=[location, color, size, delta, "add"],
+                client=pipe
+            )
+        return [None if int(updated) < 0 else int(updated) for updated, _ in pipe.execute()]
+
+
+def create_inventory_store(inventory: Dict[str, Dict], backend: Optional[str] = None):
+    """Build the configured inventory store, falling back to in-process storage"""
+    backend = backend or settings.inventory_backend
+    if backend == "redis":
+        try:
+            client = redis.Redis(
+                host=settings.redis_host,
+                port=settings.redis_port,
+                db=settings.redis_db,
+                decode_responses=True
+            )
+            client.ping()
+            store = RedisInventoryStore(client)
+            store.load(inventory)
+            return store
+        except (redis.ConnectionError, redis.RedisError):
+            print("Warning: Redis not available, using in-process inventory")
+    
+    return LocalInventoryStore(inventory)
@@ -1,37 +1,72 @@
 """Loyalty and promotions service"""
 
-from typing import Dict, List, Optional
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Union
 from datetime import datetime
+from src.services.coupon_store import CouponStore
+from src.services.points_engine import PointsEngine
+from src.services.points_ledger import PointsLedger
+from src.services.promotion_index import PromotionIndex
+from src.services.promotion_schedule import ActivationSchedule, runs_on
+from src.services.promotion_stacking import StackingOptimizer
+from config.settings import settings
 from src.utils.helpers import load_json_data
 
 
 class LoyaltyService:
     """Service for loyalty points and promotions"""
     
-    def __init__(self):
-        loyalty_data = load_json_data("loyalty_rules.json")
-        promotions_data = load_json_data("promotions.json")
+    def __init__(self, data_dir: Optional[Path] = None, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        loyalty_data = load_json_data("loyalty_rules.json", data_dir)
+        promotions_data = load_json_data("promotions.json", data_dir)
         
         self.tiers = loyalty_data.get("loyalty_tiers", [])
         self.earning_rules = loyalty_data.get("points_earning_rules", {})
         self.redemption_rules = loyalty_data.get("points_redemption_rules", {})
+        self.points_engine = PointsEngine(self.tiers, self.earning_rules)
+        
+        expiry_rules = self.redemption_rules.get("expiry_rules", {})
+        self.expiry_notification_days = expiry_rules.get("expiry_notification_days", 30)
+        self.ledger = PointsLedger(
+            expiry_rules.get("points_validity_days", 365),
+            clock=clock,
+            archive_path=settings.ledger_archive_path
+        )
         
         self.promotions = promotions_data.get("promotions", [])
-        self.coupons = promotions_data.get("coupon_codes", [])
+        
+        # Promotions and coupon templates only apply inside their valid_from / valid_until window;
+        # the store schedules each template as it first sees it, so its keys are template indexes
+        self.promotion_schedule = ActivationSchedule(self.promotions, clock)
+        self.coupon_schedule = ActivationSchedule([], clock)
+        coupons = promotions_data.get("coupon_codes", [])
+        self.coupon_store = CouponStore(len(coupons), on_template=self.coupon_schedule.add)
+        self.coupon_store.add_coupons(coupons)
+        self._refresh_promotions()
+    
+    def _weekday(self) -> str:
+        return datetime.fromtimestamp(self.clock()).strftime("%A")
+    
+    def _refresh_promotions(self) -> None:
+        """Recompile the promotion index for the promotions valid now, dropping weekday-only ones that don't run today"""
+        self.promotion_day = self._weekday()
+        self.promotion_index = PromotionIndex([
+            promotion for promotion in self.promotion_schedule.active_items()
+            if runs_on(promotion, self.promotion_day)
+        ])
+        self.stacking = StackingOptimizer(self.promotion_index, settings.promotion_stack_time_budget)
+    
+    def _current_index(self) -> PromotionIndex:
+        """Promotion index, recompiled only when the clock has passed a validity boundary or midnight"""
+        if self.promotion_schedule.advance() or self._weekday() != self.promotion_day:
+            self._refresh_promotions()
+        return self.promotion_index
     
     def get_tier_info(self, points: int) -> Dict:
         """Get loyalty tier information based on points"""
-        for tier in self.tiers:
-            min_points = tier.get("min_points", 0)
-            max_points = tier.get("max_points")
-            
-            if max_points is None:
-                if points >= min_points:
-                    return tier
-            elif min_points <= points <= max_points:
-                return tier
-        
-        return self.tiers[0] if self.tiers else {}
+        return self.points_engine.tier_for(points)
     
     def calculate_points_earned(
         self,
@@ -40,25 +75,43 @@ class LoyaltyService:
         category: Optional[str] = None
     ) -> int:
         """Calculate loyalty points earned from purchase"""
-        base_rule = self.earning_rules.get("base_rule", {})
-        points_per_100 = base_rule.get("points_per_100", 1)
-        
-        # Base points
-        base_points = int((amount / 100) * points_per_100)
-        
-        # Apply tier multiplier
-        tier_info = next((t for t in self.tiers if t["tier"] == customer_tier), None)
-        if tier_info:
-            multiplier = tier_info.get("benefits", {}).get("points_multiplier", 1.0)
-            base_points = int(base_points * multiplier)
-        
-        # Apply category multiplier
-        if category:
-            category_multipliers = self.earning_rules.get("category_multipliers", {})
-            category_mult = category_multipliers.get(category, 1.0)
-            base_points = int(base_points * category_mult)
-        
-        return base_points
+        return self.points_engine.points(amount, customer_tier, category)
+    
+    def calculate_points_batch(
+        self,
+        amounts: Sequence[float],
+        customer_tiers: Sequence[str],
+        categories: Optional[Sequence[Optional[str]]] = None,
+        balances: Optional[Sequence[int]] = None
+    ) -> Dict:
+        """
+        Points and resulting tiers for many purchases at once (e.g. a nightly accrual run)
+        balances: points each customer held before the purchase, if the new tiers should include them
+        Returns: {"points", "balances", "tiers"} as NumPy arrays aligned with the inputs
+        """
+        return self.points_engine.accrue(amounts, customer_tiers, categories, balances)
+    
+    def open_points_account(self, customer_id: str, points: int) -> None:
+        """Seed a customer's ledger with their current balance, if they have no account yet"""
+        if customer_id not in self.ledger:
+            self.ledger.earn(customer_id, points, reference="opening_balance")
+    
+    def earn_points(self, customer_id: str, points: int, reference: Optional[str] = None) -> Optional[Dict]:
+        """Record points earned (e.g. for an order) in the ledger"""
+        self.ledger.start_compactor(settings.ledger_compaction_interval)
+        return self.ledger.earn(customer_id, points, reference)
+    
+    def redeem_points(self, customer_id: str, points: int, reference: Optional[str] = None) -> Optional[Dict]:
+        """Spend points, soonest-expiring first; None if the balance is too low"""
+        self.ledger.start_compactor(settings.ledger_compaction_interval)
+        return self.ledger.redeem(customer_id, points, reference)
+    
+    def get_points_summary(self, customer_id: str, days: Optional[int] = None) -> Dict:
+        """
+        Current balance and points expiring within days (default: the expiry notification window)
+        Returns: {"balance", "expiring"}
+        """
+        return self.ledger.summary(customer_id, self.expiry_notification_days if days is None else days)
     
     def get_points_value(self, points: int) -> float:
         """Convert points to currency value"""
@@ -73,31 +126,7 @@ class LoyaltyService:
         categories: Optional[List[str]] = None
     ) -> List[Dict]:
         """Get applicable promotions for current purchase"""
-        applicable = []
-        
-        for promo in self.promotions:
-            if not promo.get("active", False):
-                continue
-            
-            # Check minimum purchase amount
-            min_amount = promo.get("min_purchase_amount", 0)
-            if cart_total < min_amount:
-                continue
-            
-            # Check categories
-            promo_categories = promo.get("applicable_categories", [])
-            if promo_categories and categories:
-                if not any(cat in promo_categories for cat in categories):
-                    continue
-            
-            # Check customer type
-            applicable_to = promo.get("applicable_to")
-            if applicable_to and applicable_to == "platinum_members" and customer_tier != "Platinum":
-                continue
-            
-            applicable.append(promo)
-        
-        return applicable
+        return self._current_index().applicable(cart_total, customer_tier, categories)
     
     def apply_promotion(self, promotion: Dict, cart_total: float) -> float:
         """Calculate discount from promotion"""
@@ -116,22 +145,53 @@ class LoyaltyService:
         
         return 0.0
     
-    def validate_coupon(self, code: str, customer_tier: str = "Bronze") -> Optional[Dict]:
-        """Validate coupon code"""
-        for coupon in self.coupons:
-            if coupon.get("code") == code and coupon.get("active", False):
-                # Check customer eligibility
-                applicable_to = coupon.get("applicable_to")
-                if applicable_to:
-                    if applicable_to == "new_customers":
-                        # Would check if customer is new
-                        pass
-                    elif applicable_to == "platinum_members" and customer_tier != "Platinum":
-                        continue
-                
-                return coupon
-        
-        return None
+    def validate_coupon(self, code: str, customer_tier: str = "Bronze", customer_id: Optional[str] = None) -> Optional[Dict]:
+        """Validate coupon code; shared codes' usage limits count per customer"""
+        found = self.coupon_store.find(code, customer_id)
+        if not found:
+            return None
+        coupon, template_id = found
+        if not self.coupon_schedule.is_active(template_id) or not self._coupon_eligible(coupon, customer_tier):
+            return None
+        return coupon
+    
+    def redeem_coupon(self, code: str, customer_tier: str = "Bronze", customer_id: Optional[str] = None) -> Optional[Dict]:
+        """Use up one redemption of a coupon; None if invalid, ineligible or already used up"""
+        if not self.validate_coupon(code, customer_tier, customer_id):
+            return None
+        return self.coupon_store.redeem(code, customer_id)
+    
+    def release_coupon(self, code: str, customer_id: Optional[str] = None) -> bool:
+        """Return a redemption taken by redeem_coupon (e.g. when payment fails)"""
+        return self.coupon_store.release(code, customer_id)
+    
+    def import_coupon_codes(
+        self,
+        source: Union[str, Path, Iterable[str]],
+        template: Dict,
+        batch_size: int = 100_000
+    ) -> Dict:
+        """
+        Stream a campaign's codes (file with one code per line, or an iterable) into the coupon store
+        template: the coupon fields shared by every code (type, value, usage_limit, ...)
+        Returns: {"added", "duplicates"}
+        """
+        return self.coupon_store.import_codes(source, template, batch_size)
+    
+    @staticmethod
+    def _coupon_eligible(coupon: Dict, customer_tier: str) -> bool:
+        """Active and open to the customer's tier"""
+        if not coupon.get("active", False):
+            return False
+        
+        # Check customer eligibility
+        applicable_to = coupon.get("applicable_to")
+        if applicable_to == "new_customers":
+            # Would check if customer is new
+            pass
+        elif applicable_to == "platinum_members" and customer_tier != "Platinum":
+            return False
+        return True
     
     def get_best_promotion(
         self,
@@ -140,19 +200,23 @@ class LoyaltyService:
         categories: Optional[List[str]] = None
     ) -> Optional[Dict]:
         """Get the best applicable promotion"""
-        applicable = self.get_applicable_promotions(cart_total, customer_tier, categories)
-        
-        if not applicable:
-            return None
-        
-        # Find promotion with maximum discount
-        best_promo = None
-        max_discount = 0.0
-        
-        for promo in applicable:
-            discount = self.apply_promotion(promo, cart_total)
-            if discount > max_discount:
-                max_discount = discount
-                best_promo = promo
-        
-        return best_promo
+        return self._current_index().best(cart_total, customer_tier, categories)
+    
+    def get_best_stack(
+        self,
+        lines: List[Dict],
+        customer_tier: str = "Bronze",
+        coupon_codes: Optional[List[str]] = None,
+        customer_id: Optional[str] = None
+    ) -> Dict:
+        """
+        Best legal combination of promotions and at most one coupon for a cart
+        lines: [{"category", "price", "quantity"}]; invalid, ineligible or used-up coupon codes are ignored
+        Returns: {"discount", "promotions", "coupon", "optimal", "strategy"}
+        """
+        coupons = [
+            coupon for coupon in (self.validate_coupon(code, customer_tier, customer_id) for code in coupon_codes or [])
+            if coupon
+        ]
+        self._current_index()
+        return self.stacking.best_stack(lines, customer_tier, coupons)
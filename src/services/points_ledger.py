@@ -0,0 +1,352 @@
+"""Append-only loyalty points ledger with balance snapshots and expiring points"""
+
+import json
+import threading
+import time
+from bisect import bisect_right
+from itertools import accumulate
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+DAY_SECONDS = 86400.0
+
+EARN = "earn"
+REDEEM = "redeem"
+EXPIRE = "expire"
+
+
+class LedgerEntry:
+    """One earn, redeem or expire event; points are always positive"""
+    
+    __slots__ = ("seq", "customer_id", "kind", "points", "at", "expires_at", "reference")
+    
+    def __init__(
+        self,
+        seq: int,
+        customer_id: str,
+        kind: str,
+        points: int,
+        at: float,
+        expires_at: Optional[float] = None,
+        reference: Optional[str] = None
+    ):
+        self.seq = seq
+        self.customer_id = customer_id
+        self.kind = kind
+        self.points = points
+        self.at = at
+        self.expires_at = expires_at
+        self.reference = reference
+    
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Snapshot:
+    """
+    A customer's unspent earn lots as of one log position
+    
+    Lots are sorted by expiry and stored as their expiry times plus running
+    totals, so "points expiring by t" is one bisect.
+    """
+    
+    __slots__ = ("seq", "expiries", "cumulative")
+    
+    def __init__(self, seq: int = 0, expiries: Optional[List[float]] = None, cumulative: Optional[List[int]] = None):
+        self.seq = seq
+        self.expiries = expiries or []
+        self.cumulative = cumulative or []
+    
+    def points_by(self, t: float) -> int:
+        """Points in lots expiring at or before t"""
+        position = bisect_right(self.expiries, t)
+        return self.cumulative[position - 1] if position else 0
+    
+    @property
+    def total(self) -> int:
+        return self.cumulative[-1] if self.cumulative else 0
+
+
+class PointsLedger:
+    """
+    Points as an append-only log of earn, redeem and expire entries
+    
+    Every earn is a lot that expires validity_days later. Redemptions and
+    expiries always use up the points closest to expiry first, so a
+    customer's state is their lots sorted by expiry with some amount used
+    from the front. Each account keeps a snapshot of its lots plus the log
+    entries written since (the tail); balance and expiring-points queries
+    read the snapshot with a bisect and walk only the tail. The tail is
+    folded into a new snapshot once it reaches snapshot_every entries.
+    
+    compact() records expiries that are due, snapshots every account and
+    moves the folded entries from the live log to the archive, which keeps
+    the full audit trail: a JSONL file when archive_path is set, otherwise
+    a list in memory. start_compactor() runs it in a background thread so
+    the live log and account tails stay bounded, and stop_compactor()
+    compacts once more so nothing is left only in memory.
+    
+    An existing archive file is replayed at startup to rebuild the accounts
+    and the sequence counter, so a restarted ledger carries on from the
+    last compaction. Archived entries are indexed by customer (positions in
+    the archive list, or byte offsets in the file), so history() reads only
+    the customer's own entries.
+    """
+    
+    def __init__(
+        self,
+        validity_days: int = 365,
+        snapshot_every: int = 32,
+        clock: Callable[[], float] = time.time,
+        archive_path: Optional[Union[str, Path]] = None
+    ):
+        self.validity = validity_days * DAY_SECONDS
+        self.snapshot_every = snapshot_every
+        self.clock = clock
+        self.archive_path = Path(archive_path) if archive_path else None
+        
+        self.log: List[LedgerEntry] = []
+        # Entries moved out of the log by compaction (unused when archiving to a file)
+        self.archive: List[LedgerEntry] = []
+        # customer id -> positions of their archived entries (byte offsets when archiving to a file)
+        self.archive_index: Dict[str, List[int]] = {}
+        self.archived = 0
+        self.next_seq = 1
+        # customer id -> (snapshot, entries since it); replaced whole so readers see a consistent pair
+        self.accounts: Dict[str, Tuple[Snapshot, Tuple[LedgerEntry, ...]]] = {}
+        self._lock = threading.Lock()
+        if self.archive_path and self.archive_path.exists():
+            self._restore()
+        
+        self._compactor: Optional[threading.Thread] = None
+        self._stop_compacting = threading.Event()
+        self._compactor_lock = threading.Lock()
+    
+    def __contains__(self, customer_id: str) -> bool:
+        return customer_id in self.accounts
+    
+    def earn(self, customer_id: str, points: int, reference: Optional[str] = None, at: Optional[float] = None) -> Optional[Dict]:
+        """Add a lot of points that expires validity_days after it is earned"""
+        if points <= 0:
+            return None
+        at = self.clock() if at is None else at
+        with self._lock:
+            return self._append(customer_id, EARN, points, at, at + self.validity, reference).to_dict()
+    
+    def redeem(self, customer_id: str, points: int, reference: Optional[str] = None) -> Optional[Dict]:
+        """Spend points, soonest-expiring first; None if the balance is too low"""
+        if points <= 0:
+            return None
+        with self._lock:
+            now = self.clock()
+            self._record_expiry(customer_id, now)
+            if self._state(customer_id, now)["balance"] < points:
+                return None
+            return self._append(customer_id, REDEEM, points, now, None, reference).to_dict()
+    
+    def balance(self, customer_id: str) -> int:
+        """Points available now"""
+        return self._state(customer_id, self.clock())["balance"]
+    
+    def expiring_points(self, customer_id: str, days: float = 30) -> int:
+        """Available points that expire within the next days"""
+        now = self.clock()
+        return self._state(customer_id, now, now + days * DAY_SECONDS)["expiring"]
+    
+    def summary(self, customer_id: str, days: float = 30) -> Dict:
+        """
+        Balance and points expiring within days, read together
+        Returns: {"balance", "expiring"}
+        """
+        now = self.clock()
+        state = self._state(customer_id, now, now + days * DAY_SECONDS)
+        return {"balance": state["balance"], "expiring": state["expiring"]}
+    
+    def _state(self, customer_id: str, now: float, horizon: Optional[float] = None) -> Dict:
+        """Balance, expiring points and lapsed (expired but unrecorded) points from the snapshot plus the log tail"""
+        snapshot, tail = self.accounts.get(customer_id, (Snapshot(), ()))
+        used = sum(entry.points for entry in tail if entry.kind != EARN)
+        earned = [entry for entry in tail if entry.kind == EARN]
+        
+        def points_by(t: float) -> int:
+            return snapshot.points_by(t) + sum(entry.points for entry in earned if entry.expires_at <= t)
+        
+        total = snapshot.total + sum(entry.points for entry in earned)
+        # Lots already past expiry that no expire entry covers yet
+        lapsed = max(0, points_by(now) - used)
+        expiring = max(0, points_by(horizon) - used) - lapsed if horizon is not None else 0
+        return {"balance": total - used - lapsed, "expiring": expiring, "lapsed": lapsed}
+    
+    def _record_expiry(self, customer_id: str, now: float) -> int:
+        """Write an expire entry for lots past expiry; returns the points expired"""
+        lapsed = self._state(customer_id, now)["lapsed"]
+        if lapsed:
+            self._append(customer_id, EXPIRE, lapsed, now)
+        return lapsed
+    
+    def _restore(self) -> None:
+        """Rebuild accounts, the archive index and next_seq by replaying the archive file"""
+        offset = 0
+        with open(self.archive_path, "rb") as f:
+            for line in f:
+                position, offset = offset, offset + len(line)
+                if not line.strip():
+                    continue
+                try:
+                    entry = LedgerEntry(**json.loads(line))
+                except (TypeError, ValueError):
+                    print(f"Warning: skipping unreadable ledger archive line at byte {position}")
+                    continue
+                self.archive_index.setdefault(entry.customer_id, []).append(position)
+                self.archived += 1
+                self.next_seq = max(self.next_seq, entry.seq + 1)
+                self._add_to_tail(entry)
+        for customer_id in self.accounts:
+            self._snapshot(customer_id)
+    
+    def _append(
+        self,
+        customer_id: str,
+        kind: str,
+        points: int,
+        at: float,
+        expires_at: Optional[float] = None,
+        reference: Optional[str] = None
+    ) -> LedgerEntry:
+        """Log an entry and add it to the account's tail (caller holds the lock)"""
+        entry = LedgerEntry(self.next_seq, customer_id, kind, points, at, expires_at, reference)
+        self.next_seq += 1
+        self.log.append(entry)
+        self._add_to_tail(entry)
+        return entry
+    
+    def _add_to_tail(self, entry: LedgerEntry) -> None:
+        """Add an entry to its account's tail, snapshotting when the tail is full (caller holds the lock)"""
+        snapshot, tail = self.accounts.get(entry.customer_id, (Snapshot(), ()))
+        self.accounts[entry.customer_id] = (snapshot, tail + (entry,))
+        if len(tail) + 1 >= self.snapshot_every:
+            self._snapshot(entry.customer_id)
+    
+    def _snapshot(self, customer_id: str) -> None:
+        """Fold the account's tail into a new snapshot (caller holds the lock)"""
+        snapshot, tail = self.accounts[customer_id]
+        if not tail:
+            return
+        
+        sizes = [b - a for a, b in zip([0] + snapshot.cumulative, snapshot.cumulative)]
+        lots = list(zip(snapshot.expiries, sizes))
+        lots.extend((entry.expires_at, entry.points) for entry in tail if entry.kind == EARN)
+        lots.sort(key=lambda lot: lot[0])
+        
+        # Use up points from the soonest-expiring lots
+        used = sum(entry.points for entry in tail if entry.kind != EARN)
+        remaining = []
+        for expires_at, points in lots:
+            taken = min(used, points)
+            used -= taken
+            if points > taken:
+                remaining.append((expires_at, points - taken))
+        
+        self.accounts[customer_id] = (
+            Snapshot(
+                tail[-1].seq,
+                [expires_at for expires_at, _ in remaining],
+                list(accumulate(points for _, points in remaining))
+            ),
+            ()
+        )
+    
+    def history(self, customer_id: str) -> List[Dict]:
+        """Every entry logged for the customer, archived ones included, oldest first"""
+        with self._lock:
+            entries = self._archived_entries(self.archive_index.get(customer_id, []))
+            entries.extend(entry for entry in self.log if entry.customer_id == customer_id)
+        return [entry.to_dict() for entry in entries]
+    
+    def _archived_entries(self, positions: List[int]) -> List[LedgerEntry]:
+        """Archived entries at the given index positions (caller holds the lock)"""
+        if self.archive_path is None:
+            return [self.archive[position] for position in positions]
+        if not positions:
+            return []
+        entries = []
+        with open(self.archive_path, "rb") as f:
+            for position in positions:
+                f.seek(position)
+                entries.append(LedgerEntry(**json.loads(f.readline())))
+        return entries
+    
+    def _archive(self, entries: List[LedgerEntry]) -> None:
+        """Append folded entries to the archive and index them by customer (caller holds the lock)"""
+        if self.archive_path is None:
+            for position, entry in enumerate(entries, len(self.archive)):
+                self.archive_index.setdefault(entry.customer_id, []).append(position)
+            self.archive.extend(entries)
+        else:
+            with open(self.archive_path, "ab") as f:
+                position = f.seek(0, 2)
+                for entry in entries:
+                    line = (json.dumps(entry.to_dict()) + "\n").encode("utf-8")
+                    self.archive_index.setdefault(entry.customer_id, []).append(position)
+                    f.write(line)
+                    position += len(line)
+        self.archived += len(entries)
+    
+    def compact(self) -> Dict:
+        """
+        Expire lapsed points, snapshot every account and archive the folded log entries
+        Returns: {"accounts", "expired_points", "entries_archived"}
+        """
+        with self._lock:
+            now = self.clock()
+            expired = sum(self._record_expiry(customer_id, now) for customer_id in list(self.accounts))
+            for customer_id in list(self.accounts):
+                self._snapshot(customer_id)
+            
+            # Every account is snapshotted now, so the whole log is behind the watermark
+            folded = self.log
+            self._archive(folded)
+            self.log = []
+        return {"accounts": len(self.accounts), "expired_points": expired, "entries_archived": len(folded)}
+    
+    def stats(self) -> Dict:
+        """Log, archive and account sizes"""
+        return {
+            "accounts": len(self.accounts),
+            "log_entries": len(self.log),
+            "archived_entries": self.archived,
+            "tail_entries": sum(len(tail) for _, tail in self.accounts.values())
+        }
+    
+    def start_compactor(self, interval: float = 300.0) -> None:
+        """Compact the ledger in a background thread"""
+        with self._compactor_lock:
+            if self._compactor and self._compactor.is_alive():
+                return
+            
+            self._stop_compacting.clear()
+            self._compactor = threading.Thread(
+                target=self._compact_loop,
+                args=(interval,),
+                name="points-ledger-compactor",
+                daemon=True
+            )
+            self._compactor.start()
+    
+    def stop_compactor(self) -> None:
+        """Stop the background compactor, archiving whatever is still in the live log"""
+        self._stop_compacting.set()
+        if self._compactor:
+            self._compactor.join()
+            self._compactor = None
+        if self.log:
+            self.compact()
+    
+    def _compact_loop(self, interval: float) -> None:
+        """Compactor loop"""
+        while not self._stop_compacting.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"Error compacting points ledger: {e}")
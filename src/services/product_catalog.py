@@ -1,33 +1,134 @@
 """Product catalog service"""
 
-from typing import List, Dict, Optional
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Iterator, List, Dict, Optional
+import numpy as np
 from src.models.product import Product
-from src.utils.helpers import load_json_data
+from src.services.catalog_index import CatalogIndex
+from src.utils.helpers import get_data_path, load_json_file
+from config.settings import settings
 
 
 class ProductCatalogService:
     """Service for product search and filtering"""
     
-    def __init__(self):
-        self.products_data = load_json_data("products.json")
-        self.products = self._load_products()
+    def __init__(self, data_dir: Optional[Path] = None):
+        self.products_path = get_data_path("products.json", data_dir)
+        self._source_stamp = self._read_source_stamp()
+        self._index = self._build_index(load_json_file(self.products_path), version=1)
+        
+        self._reload_lock = threading.Lock()
+        self._reload_listeners: List[Callable[[Dict], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        
+        if settings.catalog_auto_reload:
+            self.start_watching(settings.catalog_reload_interval)
+    
+    @property
+    def index(self) -> CatalogIndex:
+        """Current catalog snapshot; read it once per operation for a consistent view"""
+        return self._index
     
-    def _load_products(self) -> List[Product]:
-        """Load products from JSON data"""
-        products = []
-        for product_data in self.products_data.get("products", []):
+    def all_products(self) -> List[Product]:
+        """
+        Every product of the current snapshot as a full model
+        Builds one Product per SKU on each call, so use it for exports and tests, not request paths
+        """
+        index = self._index
+        return index.materialize(range(len(index)))
+    
+    def _load_products(self, products_data: Dict) -> Iterator[Product]:
+        """Validate products from JSON data one at a time"""
+        for product_data in products_data.get("products", []):
             try:
-                products.append(Product(**product_data))
+                yield Product(**product_data)
             except Exception as e:
                 print(f"Error loading product {product_data.get('sku')}: {e}")
-        return products
+    
+    def _build_index(self, products_data: Dict, version: int) -> CatalogIndex:
+        """Build a complete catalog snapshot from raw JSON data"""
+        return CatalogIndex(
+            self._load_products(products_data),
+            categories=products_data.get("categories", []),
+            version=version
+        )
+    
+    def _read_source_stamp(self) -> Optional[tuple]:
+        """Modification stamp of the products source file"""
+        try:
+            stat = os.stat(self.products_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def add_reload_listener(self, callback: Callable[[Dict], None]) -> None:
+        """Register a callback receiving the change report of every reload"""
+        self._reload_listeners.append(callback)
+    
+    def reload(self) -> Optional[Dict]:
+        """
+        Rebuild indexes from the products source and swap them in atomically
+        Returns: {"version", "added", "removed", "changed"} or None if the source is unusable
+        """
+        with self._reload_lock:
+            self._source_stamp = self._read_source_stamp()
+            products_data = load_json_file(self.products_path)
+            if "products" not in products_data:
+                print("Warning: products.json could not be loaded, keeping current catalog")
+                return None
+            
+            previous = self._index
+            new_index = self._build_index(products_data, version=previous.version + 1)
+            changes = new_index.diff(previous)
+            
+            # Single reference assignment: readers see either snapshot, never a mix
+            self._index = new_index
+        
+        report = {"version": new_index.version, **changes}
+        for callback in list(self._reload_listeners):
+            try:
+                callback(report)
+            except Exception as e:
+                print(f"Error in catalog reload listener: {e}")
+        
+        return report
+    
+    def start_watching(self, interval: float = 5.0) -> None:
+        """Poll the products source in a background thread and reload on change"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch_source,
+            args=(interval,),
+            name="catalog-reloader",
+            daemon=True
+        )
+        self._watcher.start()
+    
+    def stop_watching(self) -> None:
+        """Stop the background source watcher"""
+        self._stop_watching.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
+    
+    def _watch_source(self, interval: float) -> None:
+        """Watcher loop: rebuild off the request path whenever the source changes"""
+        while not self._stop_watching.wait(interval):
+            if self._read_source_stamp() != self._source_stamp:
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Error reloading catalog: {e}")
     
     def get_product_by_sku(self, sku: str) -> Optional[Product]:
         """Get product by SKU"""
-        for product in self.products:
-            if product.sku == sku:
-                return product
-        return None
+        return self.index.get(sku)
     
     def search_products(
         self,
@@ -36,39 +137,100 @@ class ProductCatalogService:
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
         tags: Optional[List[str]] = None,
-        limit: int = 10
+        limit: int = 10,
+        subcategory: Optional[str] = None,
+        brand: Optional[str] = None,
+        fuzzy: bool = False
     ) -> List[Product]:
-        """Search products with filters"""
-        results = self.products.copy()
+        """
+        Search products with filters, ranked by relevance when a query is given
+        With fuzzy=True the query is matched typo-tolerantly against name, brand and tags
+        """
+        index = self.index
+        positions = self._search_positions(
+            index, query, category, min_price, max_price, tags, subcategory, brand, fuzzy
+        )
+        return index.materialize(positions[:limit])
+    
+    def search_with_facets(
+        self,
+        query: Optional[str] = None,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        tags: Optional[List[str]] = None,
+        subcategory: Optional[str] = None,
+        brand: Optional[str] = None,
+        color: Optional[str] = None,
+        size: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict:
+        """Search products and count category, brand, color, size and price facets over all matches"""
+        index = self.index
+        positions = self._search_positions(
+            index, query, category, min_price, max_price, tags, subcategory, brand
+        )
         
-        # Filter by query (name, description, tags)
-        if query:
-            query_lower = query.lower()
-            results = [
-                p for p in results
-                if (query_lower in p.name.lower() or
-                    query_lower in p.description.lower() or
-                    any(query_lower in tag.lower() for tag in p.tags))
-            ]
+        # Filter by selected color and size facet values
+        for facet, value in (("color", color), ("size", size)):
+            if value:
+                positions = positions[np.isin(positions, index.facets.positions_with(facet, value))]
         
-        # Filter by category
-        if category:
-            results = [p for p in results if p.category.lower() == category.lower()]
+        # Unfiltered browsing reuses the precomputed catalog-wide counts
+        unfiltered = not any([query, category, min_price is not None, max_price is not None,
+                              tags, subcategory, brand, color, size])
+        facets = index.facets.count(None if unfiltered else positions)
         
-        # Filter by price range
-        if min_price is not None:
-            results = [p for p in results if p.price >= min_price]
-        if max_price is not None:
-            results = [p for p in results if p.price <= max_price]
+        return {
+            "total": len(positions),
+            "products": index.materialize(positions[offset:offset + limit]),
+            "facets": facets
+        }
+    
+    def _search_positions(
+        self,
+        index: CatalogIndex,
+        query: Optional[str],
+        category: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+        tags: Optional[List[str]],
+        subcategory: Optional[str],
+        brand: Optional[str],
+        fuzzy: bool = False
+    ) -> np.ndarray:
+        """Positions of all products matching a search, in result order"""
+        # Rank by query relevance (name, description, tags), otherwise
+        # start from the shortest matching attribute or tag posting list
+        if query:
+            text_index = index.fuzzy_index if fuzzy else index.search_index
+            positions = np.fromiter(
+                (doc_id for doc_id, _ in text_index.search(query)),
+                dtype=np.int64
+            )
+        else:
+            positions = index.narrowest_postings(category, subcategory, brand)
+            if tags:
+                tagged = index.tag_positions(tags)
+                if len(tagged) < len(positions):
+                    positions = tagged
+        
+        # Filter by category, subcategory, brand and price range
+        mask = index.filter_mask(
+            positions,
+            category=category,
+            subcategory=subcategory,
+            brand=brand,
+            min_price=min_price,
+            max_price=max_price
+        )
         
         # Filter by tags
         if tags:
-            results = [
-                p for p in results
-                if any(tag.lower() in [t.lower() for t in p.tags] for tag in tags)
-            ]
+            mask &= np.isin(positions, index.tag_positions(tags))
         
-        return results[:limit]
+        return positions[mask]
     
     def get_recommendations(
         self,
@@ -76,28 +238,30 @@ class ProductCatalogService:
         limit: int = 5
     ) -> List[Product]:
         """Get product recommendations based on preferences"""
-        matching_products = [
-            p for p in self.products
-            if p.matches_preferences(customer_preferences)
-        ]
-        
-        # Sort by rating and discount
-        matching_products.sort(
-            key=lambda p: (p.ratings.average, p.discount_percent),
-            reverse=True
-        )
+        # Merge the precomputed budget/style pools, ranked by rating and discount
+        index = self.index
+        return index.materialize(index.recommendation_pools.top_k(customer_preferences, limit))
+    
+    def get_similar_products(self, sku: str, limit: int = 5, approximate: bool = False) -> List[Product]:
+        """Get products most similar to a SKU by text and attributes (approximate uses IVF partitions)"""
+        index = self.index
+        position = index.sku_positions.get(sku)
+        if position is None:
+            return []
         
-        return matching_products[:limit]
+        positions = index.similarity_index.similar_to(position, limit, approximate=approximate)
+        return index.materialize(positions)
     
     def get_complementary_products(self, sku: str, limit: int = 3) -> List[Product]:
         """Get complementary products for a given SKU"""
-        product = self.get_product_by_sku(sku)
+        index = self.index
+        product = index.get(sku)
         if not product or not product.complementary_products:
             return []
         
         complementary = []
         for comp_sku in product.complementary_products[:limit]:
-            comp_product = self.get_product_by_sku(comp_sku)
+            comp_product = index.get(comp_sku)
             if comp_product:
                 complementary.append(comp_product)
         
@@ -105,8 +269,14 @@ class ProductCatalogService:
     
     def get_products_by_category(self, category: str, limit: int = 10) -> List[Product]:
         """Get products by category"""
-        return self.search_products(category=category, limit=limit)
+        index = self.index
+        return index.materialize(index.by_category.get(category.lower(), [])[:limit])
+    
+    def get_products_by_brand(self, brand: str, limit: int = 10) -> List[Product]:
+        """Get products by brand"""
+        index = self.index
+        return index.materialize(index.by_brand.get(brand.lower(), [])[:limit])
     
     def get_all_categories(self) -> List[Dict]:
         """Get all product categories"""
-        return self.products_data.get("categories", [])
+        return self.index.categories
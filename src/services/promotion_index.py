@@ -0,0 +1,167 @@
+"""Compiled promotion rules bucketed by tier and category"""
+
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+
+# Audiences that limit a promotion to one loyalty tier; any other audience is open to all
+TIER_AUDIENCES = {"platinum_members": "Platinum"}
+
+
+class PromotionRule:
+    """One active promotion with its eligibility and discount fields pulled out"""
+    
+    __slots__ = ("order", "promotion", "min_amount", "categories", "tier", "kind", "value", "cap", "stackable")
+    
+    def __init__(self, order: int, promotion: Dict):
+        self.order = order
+        self.promotion = promotion
+        self.min_amount = promotion.get("min_purchase_amount", 0)
+        self.categories = frozenset(promotion.get("applicable_categories", []))
+        self.tier = TIER_AUDIENCES.get(promotion.get("applicable_to"))
+        self.kind = promotion.get("type")
+        self.value = promotion.get("value", 0)
+        self.cap = promotion.get("max_discount")
+        self.stackable = bool(promotion.get("stackable", False))
+    
+    def discount(self, cart_total: float) -> float:
+        """Same arithmetic as LoyaltyService.apply_promotion"""
+        if self.kind == "percentage_discount":
+            discount = (cart_total * self.value) / 100
+            if self.cap:
+                discount = min(discount, self.cap)
+            return discount
+        if self.kind == "flat_discount":
+            return self.value
+        return 0.0
+
+
+def outranks(discount: float, rule: PromotionRule, best_discount: float, best_rule: Optional[PromotionRule]) -> bool:
+    """Larger positive discount wins; on a tie the promotion listed first wins"""
+    if discount > best_discount:
+        return True
+    return discount == best_discount and best_rule is not None and rule.order < best_rule.order
+
+
+class RuleBucket:
+    """
+    Rules sorted by minimum purchase, so the rules a cart total qualifies for are a prefix
+    
+    Flat discounts do not depend on the cart total, so the best flat rule of
+    every prefix is precomputed; only percentage rules are evaluated per query.
+    """
+    
+    def __init__(self, rules: List[PromotionRule]):
+        self.rules = sorted(rules, key=lambda rule: (rule.min_amount, rule.order))
+        self.min_amounts = [rule.min_amount for rule in self.rules]
+        
+        self.percentage = [rule for rule in self.rules if rule.kind == "percentage_discount"]
+        self.percentage_min_amounts = [rule.min_amount for rule in self.percentage]
+        
+        self.best_flat: List[Optional[PromotionRule]] = [None]
+        for rule in self.rules:
+            best = self.best_flat[-1]
+            if rule.kind == "flat_discount" and outranks(rule.value, rule, best.value if best else 0.0, best):
+                best = rule
+            self.best_flat.append(best)
+    
+    def eligible(self, cart_total: float) -> List[PromotionRule]:
+        return self.rules[:bisect_right(self.min_amounts, cart_total)]
+    
+    def best(self, cart_total: float) -> Tuple[float, Optional[PromotionRule]]:
+        """(discount, rule) of the best qualifying rule in this bucket"""
+        best_rule = self.best_flat[bisect_right(self.min_amounts, cart_total)]
+        best_discount = best_rule.value if best_rule else 0.0
+        for rule in self.percentage[:bisect_right(self.percentage_min_amounts, cart_total)]:
+            discount = rule.discount(cart_total)
+            if outranks(discount, rule, best_discount, best_rule):
+                best_rule, best_discount = rule, discount
+        return best_discount, best_rule
+
+
+class PromotionIndex:
+    """
+    Active promotions compiled for lookup by cart total, tier and categories
+    
+    Rules are split by the tier they are limited to (None for everyone) and
+    then into one bucket of uncategorized rules plus one bucket per
+    category, alongside an "all" bucket for carts without category info.
+    A query only looks at the buckets its tier and categories can match and
+    only at the qualifying prefix of each.
+    """
+    
+    def __init__(self, promotions: List[Dict]):
+        grouped: Dict[Optional[str], Dict] = {}
+        for order, promotion in enumerate(promotions):
+            if not promotion.get("active", False):
+                continue
+            rule = PromotionRule(order, promotion)
+            
+            buckets = grouped.setdefault(rule.tier, {"all": [], "uncategorized": [], "categories": {}})
+            buckets["all"].append(rule)
+            if not rule.categories:
+                buckets["uncategorized"].append(rule)
+            for category in rule.categories:
+                buckets["categories"].setdefault(category, []).append(rule)
+        
+        self.buckets: Dict[Optional[str], Tuple[RuleBucket, RuleBucket, Dict[str, RuleBucket]]] = {
+            tier: (
+                RuleBucket(buckets["all"]),
+                RuleBucket(buckets["uncategorized"]),
+                {category: RuleBucket(rules) for category, rules in buckets["categories"].items()}
+            )
+            for tier, buckets in grouped.items()
+        }
+    
+    def candidate_buckets(self, customer_tier: str = "Bronze", categories: Optional[List[str]] = None) -> List[RuleBucket]:
+        """Buckets holding every rule the tier and categories can match"""
+        found: List[RuleBucket] = []
+        for tier in dict.fromkeys((None, customer_tier)):
+            if tier not in self.buckets:
+                continue
+            every, uncategorized, by_category = self.buckets[tier]
+            if not categories:
+                found.append(every)
+                continue
+            
+            found.append(uncategorized)
+            found.extend(by_category[category] for category in dict.fromkeys(categories) if category in by_category)
+        return found
+    
+    def applicable(
+        self,
+        cart_total: float,
+        customer_tier: str = "Bronze",
+        categories: Optional[List[str]] = None
+    ) -> List[Dict]:
+        """Qualifying promotions in their original order"""
+        return [rule.promotion for rule in self.applicable_rules(cart_total, customer_tier, categories)]
+    
+    def applicable_rules(
+        self,
+        cart_total: float,
+        customer_tier: str = "Bronze",
+        categories: Optional[List[str]] = None
+    ) -> List[PromotionRule]:
+        """Qualifying compiled rules in their original order"""
+        rules = {
+            rule.order: rule
+            for bucket in self.candidate_buckets(customer_tier, categories)
+            for rule in bucket.eligible(cart_total)
+        }
+        return [rules[order] for order in sorted(rules)]
+    
+    def best(
+        self,
+        cart_total: float,
+        customer_tier: str = "Bronze",
+        categories: Optional[List[str]] = None
+    ) -> Optional[Dict]:
+        """Qualifying promotion with the largest positive discount; ties go to the one listed first"""
+        best_rule = None
+        best_discount = 0.0
+        for bucket in self.candidate_buckets(customer_tier, categories):
+            discount, rule = bucket.best(cart_total)
+            if rule is not None and outranks(discount, rule, best_discount, best_rule):
+                best_rule, best_discount = rule, discount
+        return best_rule.promotion if best_rule else None
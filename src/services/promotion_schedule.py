@@ -0,0 +1,133 @@
+"""Validity-window activation for promotions and coupons"""
+
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+
+# Event kinds; at equal times ends sort before starts
+END = 0
+START = 1
+
+
+def parse_boundary(value: Optional[str], end: bool = False) -> Optional[float]:
+    """
+    Timestamp of a valid_from / valid_until value, or None when unset or unreadable
+    A bare date in valid_until names the last valid day, so the window ends at the next midnight
+    """
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        print(f"Warning: ignoring unreadable validity date {value!r}")
+        return None
+    if end and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment.timestamp()
+
+
+def validity_window(item: Dict) -> Tuple[Optional[float], Optional[float]]:
+    """(start, end) timestamps of an item's validity; the end is exclusive"""
+    return parse_boundary(item.get("valid_from")), parse_boundary(item.get("valid_until"), end=True)
+
+
+def runs_on(item: Dict, day: str) -> bool:
+    """Whether an item limited to applicable_days (weekday names) runs on day; items without them run every day"""
+    days = item.get("applicable_days")
+    return not days or day.lower() in {name.lower() for name in days}
+
+
+class ActivationSchedule:
+    """
+    Items switched on and off as the clock passes their validity boundaries
+    
+    Every item contributes a start and an end event; the events are kept
+    sorted by time with a cursor at the current time. advance() applies the
+    events the clock has passed since the last call, so between boundaries
+    it is a single comparison and the active set never has to be rebuilt by
+    scanning the items. Items without valid_from are active from the start;
+    items without valid_until never expire. If the clock moves backwards the
+    cursor is replayed from the beginning.
+    """
+    
+    def __init__(self, items: List[Dict], clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.items: List[Dict] = []
+        self.events: List[Tuple[float, int, int]] = []
+        self.position = 0
+        self.now = float("-inf")
+        self.active: Set[int] = set()
+        self.version = 0
+        self._lock = threading.Lock()
+        
+        for item in items:
+            self.events.extend(self._events(len(self.items), item))
+            self.items.append(item)
+        self.events.sort()
+    
+    @staticmethod
+    def _events(key: int, item: Dict) -> List[Tuple[float, int, int]]:
+        """An item's start and end events; an empty window has none"""
+        start, end = validity_window(item)
+        start = float("-inf") if start is None else start
+        if end is not None and end <= start:
+            return []
+        return [(start, START, key)] + ([(end, END, key)] if end is not None else [])
+    
+    def add(self, item: Dict) -> int:
+        """Schedule one more item; returns its key"""
+        with self._lock:
+            key = len(self.items)
+            self.items.append(item)
+            for event in self._events(key, item):
+                index = bisect_right(self.events, event)
+                self.events.insert(index, event)
+                # Landed behind the cursor: apply it now so everything before the cursor stays applied
+                if index <= self.position and event[0] <= self.now:
+                    self._apply(event)
+                    self.position += 1
+                    self.version += 1
+            return key
+    
+    def _apply(self, event: Tuple[float, int, int]) -> None:
+        _, kind, key = event
+        if kind == START:
+            self.active.add(key)
+        else:
+            self.active.discard(key)
+    
+    def advance(self, now: Optional[float] = None) -> bool:
+        """Apply every boundary up to now; returns whether the active set changed"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            changed = False
+            if now < self.now:
+                self.position = 0
+                self.active = set()
+                changed = True
+            self.now = now
+            
+            while self.position < len(self.events) and self.events[self.position][0] <= now:
+                self._apply(self.events[self.position])
+                self.position += 1
+                changed = True
+            if changed:
+                self.version += 1
+            return changed
+    
+    def is_active(self, key: int) -> bool:
+        """Whether an item is inside its validity window now"""
+        self.advance()
+        return key in self.active
+    
+    def active_items(self) -> List[Dict]:
+        """Items valid now, in their original order"""
+        self.advance()
+        return [self.items[key] for key in sorted(self.active)]
+    
+    def next_boundary(self) -> Optional[float]:
+        """When the active set next changes, or None if it never will"""
+        return self.events[self.position][0] if self.position < len(self.events) else None
@@ -0,0 +1,476 @@
+"""Best legal stack of promotions and coupons for a cart"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+from src.services.promotion_index import PromotionIndex, PromotionRule
+from src.utils.cache import VersionedLRUCache
+
+
+class CartLine:
+    """One cart line as the optimizer sees it"""
+    
+    __slots__ = ("index", "category", "price", "quantity", "amount")
+    
+    def __init__(self, index: int, category: Optional[str], price: float, quantity: int):
+        self.index = index
+        self.category = category
+        self.price = price
+        self.quantity = quantity
+        self.amount = price * quantity
+
+
+def is_line_rule(rule: PromotionRule) -> bool:
+    """Category promotions and BOGO discount particular lines; the rest discount the order"""
+    return bool(rule.categories) or rule.kind == "bogo"
+
+
+def applies_to(rule: PromotionRule, line: CartLine) -> bool:
+    return not rule.categories or line.category in rule.categories
+
+
+def line_rule_discount(rule: PromotionRule, base: float, units: Tuple[float, ...], lines: int) -> float:
+    """Discount a line-level rule gives on the lines assigned to it"""
+    if not lines:
+        return 0.0
+    if rule.kind == "percentage_discount":
+        discount = base * rule.value / 100
+        return min(discount, rule.cap) if rule.cap else discount
+    if rule.kind == "flat_discount":
+        return min(rule.value, base)
+    if rule.kind == "bogo":
+        # Buy N get M: in each group of N + M units, most expensive first, the last M are free
+        buy, group = bogo_shape(rule)
+        ordered = sorted(units, reverse=True)
+        return sum(price for position, price in enumerate(ordered) if position % group >= buy)
+    return 0.0
+
+
+def bogo_shape(rule: PromotionRule) -> Tuple[int, int]:
+    """(units bought, group size) of a BOGO rule"""
+    buy = rule.promotion.get("buy_quantity", 2)
+    return buy, buy + (rule.value or 1)
+
+
+def order_rule_discount(rule: PromotionRule, remaining: float) -> float:
+    """Discount an order-level rule or coupon gives on what is left of the order"""
+    if rule.kind == "percentage_discount":
+        discount = remaining * rule.value / 100
+        return min(discount, rule.cap) if rule.cap else discount
+    if rule.kind == "flat_discount":
+        return min(rule.value, remaining)
+    return 0.0
+
+
+class LineAssignment:
+    """
+    Branch and bound over which line-level rule (if any) each cart line goes to
+    
+    Each line takes at most one line-level promotion. Caps and BOGO grouping
+    couple the lines of a rule, so the best split is a search: lines are
+    visited largest first, a branch is cut when an optimistic bound on its
+    final value cannot beat the incumbent, and states reached again with no
+    more value (same rule totals at the same depth) are skipped.
+    
+    No rule's discount shrinks when it gets another line, so a line is only
+    left out when no rule applies to it, and a percentage or flat rule that
+    is already used up is never given more lines. What such a rule can still
+    add is capped by its headroom, which keeps the bound tight on carts with
+    many overlapping rules. The free units of a BOGO group are its cheapest,
+    so they are worth at most M / (N + M) of the group; the bound uses that
+    share of the rule's lines rather than its current (possibly incomplete)
+    groups.
+    
+    Before searching, two greedy passes (line by line, and rule by rule in
+    order of discount per line) give an incumbent, which single-line moves
+    then improve while time remains. Large carts rarely finish the search
+    inside the budget, so this fallback is what they mostly get; the search
+    can only improve on it. The search stops at the deadline with the best
+    assignment found so far, and strategy says which of the two it is.
+    """
+    
+    def __init__(self, lines: List[CartLine], rules: List[PromotionRule], deadline: float):
+        self.lines = sorted(lines, key=lambda line: -line.amount)
+        self.rules = rules
+        self.deadline = deadline
+        self.eligible = [
+            [k for k, rule in enumerate(rules) if applies_to(rule, line)]
+            for line in self.lines
+        ]
+        self.free_share = [0.0] * len(rules)
+        for k, rule in enumerate(rules):
+            if rule.kind == "bogo":
+                buy, group = bogo_shape(rule)
+                self.free_share[k] = (group - buy) / group
+        self.bogo_rules = [k for k, share in enumerate(self.free_share) if share]
+        
+        # Rules with the same terms on the same lines are interchangeable; an empty
+        # rule is only tried when its earlier twins already have lines
+        shapes: Dict[tuple, List[int]] = {}
+        self.twins: List[List[int]] = []
+        for k, rule in enumerate(rules):
+            lines_covered = tuple(i for i, eligible in enumerate(self.eligible) if k in eligible)
+            shape = (rule.kind, rule.value, rule.cap, self.free_share[k], lines_covered)
+            self.twins.append(list(shapes.setdefault(shape, [])))
+            shapes[shape].append(k)
+        
+        self.base = [0.0] * len(rules)
+        self.units: List[Tuple[float, ...]] = [()] * len(rules)
+        self.counts = [0] * len(rules)
+        self.values = [0.0] * len(rules)
+        self.choice = [-1] * len(self.lines)
+        self.seen: Dict[tuple, float] = {}
+        
+        self.best_value = 0.0
+        self.best_choice = list(self.choice)
+        self.greedy_value = 0.0
+        self.timed_out = False
+        self.nodes = 0
+    
+    def _optimistic_gain(self, k: int, line: CartLine) -> float:
+        """Most the line can still add through rule k, whatever else the rule gets later"""
+        rule = self.rules[k]
+        if rule.kind == "percentage_discount":
+            gain = line.amount * rule.value / 100
+            return min(gain, rule.cap - self.values[k]) if rule.cap else gain
+        if rule.kind == "flat_discount":
+            return min(rule.value - self.values[k], line.amount)
+        return line.amount * self.free_share[k]
+    
+    def _worth_trying(self, k: int) -> bool:
+        return self.counts[k] > 0 or all(self.counts[twin] > 0 for twin in self.twins[k])
+    
+    def _remaining_bound(self, i: int) -> float:
+        return sum(
+            max((self._optimistic_gain(k, self.lines[j]) for k in self.eligible[j]), default=0.0)
+            for j in range(i, len(self.lines))
+        )
+    
+    def _gain(self, k: int, line: CartLine) -> Tuple[float, float, Tuple[float, ...]]:
+        """(gain, new base, new units) of adding the line to rule k"""
+        base = self.base[k] + line.amount
+        units = self.units[k] + (line.price,) * line.quantity if self.rules[k].kind == "bogo" else ()
+        value = line_rule_discount(self.rules[k], base, units, self.counts[k] + 1)
+        return value - self.values[k], base, units
+    
+    def _apply(self, i: int, k: int, base: float, units: Tuple[float, ...], gain: float) -> Tuple:
+        undo = (self.base[k], self.units[k], self.values[k])
+        self.base[k], self.units[k] = base, units
+        self.counts[k] += 1
+        self.values[k] += gain
+        self.choice[i] = k
+        return undo
+    
+    def _undo(self, i: int, k: int, undo: Tuple) -> None:
+        self.base[k], self.units[k], self.values[k] = undo
+        self.counts[k] -= 1
+        self.choice[i] = -1
+    
+    @property
+    def strategy(self) -> str:
+        """exact if the search finished, else partial if it beat the greedy fallback, else greedy"""
+        if not self.timed_out:
+            return "exact"
+        return "partial" if self.best_value > self.greedy_value + 1e-9 else "greedy"
+    
+    def solve(self) -> Tuple[float, List[int]]:
+        """(best total discount, rule index per line in the caller's line order)"""
+        if len(self.rules) == 1:
+            # A rule's discount never shrinks as it gets more lines, so alone it takes them all
+            self._take_all()
+        else:
+            self._greedy()
+            # Nothing to search for when the fallback already meets the upper bound
+            if self.best_value < self._remaining_bound(0) - 1e-9:
+                if time.perf_counter() < self.deadline:
+                    self._search(0, 0.0)
+                else:
+                    self.timed_out = True
+        
+        by_index = {line.index: k for line, k in zip(self.lines, self.best_choice)}
+        return self.best_value, [by_index[index] for index in sorted(by_index)]
+    
+    def _take_all(self) -> None:
+        for i, line in enumerate(self.lines):
+            if self.eligible[i]:
+                gain, base, units = self._gain(0, line)
+                self._apply(i, 0, base, units, gain)
+        self.best_value, self.best_choice = self.values[0], list(self.choice)
+        self.greedy_value = self.best_value
+    
+    def _greedy(self) -> None:
+        """Incumbent: both greedy passes, each improved by moving single lines, whichever is better"""
+        for _, choice in (self._greedy_lines(), self._greedy_rules()):
+            value, choice = self._improve(choice)
+            if value > self.best_value + 1e-9:
+                self.best_value, self.best_choice = value, choice
+        self.greedy_value = self.best_value
+    
+    def _greedy_lines(self) -> Tuple[float, List[int]]:
+        """Every line, largest first, to the rule that gains most from it right now"""
+        total = 0.0
+        applied = []
+        for i, line in enumerate(self.lines):
+            options = [(self._gain(k, line), k) for k in self.eligible[i]]
+            options = [option for option in options if option[0][0] > 0]
+            if options:
+                (gain, base, units), k = max(options, key=lambda option: option[0][0])
+                applied.append((i, k, self._apply(i, k, base, units, gain)))
+                total += gain
+        return total, self._unwind(applied)
+    
+    def _greedy_rules(self) -> Tuple[float, List[int]]:
+        """Rules in order of discount per eligible line, each taking the free lines that still add to it"""
+        def per_line(k: int) -> float:
+            covered = [i for i, eligible in enumerate(self.eligible) if k in eligible]
+            return self._value(k, covered) / len(covered) if covered else 0.0
+        
+        total = 0.0
+        applied = []
+        for k in sorted(range(len(self.rules)), key=per_line, reverse=True):
+            for i, line in enumerate(self.lines):
+                if self.choice[i] < 0 and k in self.eligible[i]:
+                    gain, base, units = self._gain(k, line)
+                    if gain > 1e-9 or self.free_share[k]:
+                        applied.append((i, k, self._apply(i, k, base, units, gain)))
+                        total += gain
+        return total, self._unwind(applied)
+    
+    def _unwind(self, applied: List[Tuple]) -> List[int]:
+        """Undo a greedy pass, returning the choice it made"""
+        choice = list(self.choice)
+        for i, k, undo in reversed(applied):
+            self._undo(i, k, undo)
+        return choice
+    
+    def _value(self, k: int, members: List[int]) -> float:
+        """Discount rule k gives on the lines at the given positions"""
+        assigned = [self.lines[i] for i in members]
+        units = tuple(line.price for line in assigned for _ in range(line.quantity)) if self.rules[k].kind == "bogo" else ()
+        return line_rule_discount(self.rules[k], sum(line.amount for line in assigned), units, len(assigned))
+    
+    def _improve(self, choice: List[int]) -> Tuple[float, List[int]]:
+        """Hill-climb: keep moving the single line whose move to another rule (or none) gains most"""
+        choice = list(choice)
+        members: List[List[int]] = [[] for _ in self.rules]
+        for i, k in enumerate(choice):
+            if k >= 0:
+                members[k].append(i)
+        values = [self._value(k, members[k]) for k in range(len(self.rules))]
+        
+        while time.perf_counter() < self.deadline:
+            best_move, best_gain = None, 1e-9
+            for i, current in enumerate(choice):
+                loss = 0.0
+                if current >= 0:
+                    loss = values[current] - self._value(current, [j for j in members[current] if j != i])
+                for k in self.eligible[i]:
+                    if k != current:
+                        gain = self._value(k, members[k] + [i]) - values[k] - loss
+                        if gain > best_gain:
+                            best_move, best_gain = (i, k), gain
+                if current >= 0 and -loss > best_gain:
+                    best_move, best_gain = (i, -1), -loss
+            if best_move is None:
+                break
+            
+            i, k = best_move
+            for rule in (choice[i], k):
+                if rule >= 0:
+                    if rule == choice[i]:
+                        members[rule].remove(i)
+                    else:
+                        members[rule].append(i)
+                    values[rule] = self._value(rule, members[rule])
+            choice[i] = k
+        return sum(values), choice
+    
+    def _search(self, i: int, value: float) -> None:
+        self.nodes += 1
+        if self.timed_out or (self.nodes & 63 == 0 and time.perf_counter() > self.deadline):
+            self.timed_out = True
+            return
+        if i == len(self.lines):
+            if value > self.best_value + 1e-9:
+                self.best_value, self.best_choice = value, list(self.choice)
+            return
+        optimistic = value + sum(self.base[k] * self.free_share[k] - self.values[k] for k in self.bogo_rules)
+        if optimistic + self._remaining_bound(i) <= self.best_value + 1e-9:
+            return
+        
+        key = (i, tuple(self.base), tuple(self.counts), tuple(self.units))
+        if self.seen.get(key, -1.0) >= value - 1e-9:
+            return
+        self.seen[key] = value
+        
+        line = self.lines[i]
+        branches = sorted(
+            (
+                branch for branch in ((self._gain(k, line), k) for k in self.eligible[i] if self._worth_trying(k))
+                if branch[0][0] > 1e-9 or self.free_share[branch[1]]
+            ),
+            key=lambda branch: -branch[0][0]
+        )
+        for (gain, base, units), k in branches:
+            undo = self._apply(i, k, base, units, gain)
+            self._search(i + 1, value + gain)
+            self._undo(i, k, undo)
+        if not branches:
+            self._search(i + 1, value)
+
+
+class StackingOptimizer:
+    """
+    Picks the promotions (and at most one coupon) that save a cart the most
+    
+    Legal stacks:
+    - a promotion that is not stackable is used on its own, with no coupon
+    - stackable promotions combine; each line gets at most one category/BOGO
+      promotion, and promotions without categories then apply to the rest
+      of the order, percentages before flat amounts
+    - one coupon applies last to what is left; coupons combine with
+      stackable promotions unless they say "stackable": false
+    
+    Exact results are memoized by cart signature (tier, coupons and the
+    sorted category/price/quantity of each line); a stack cut short by the
+    time budget is not, so the next call searches again. "strategy" in a
+    result is "exact" when every stack was searched to the end; when the
+    budget ran out it is "greedy" if the best stack is the greedy fallback
+    and "partial" if the search improved on it.
+    """
+    
+    def __init__(self, index: PromotionIndex, time_budget: float = 0.05, cache_size: int = 1024):
+        self.index = index
+        self.time_budget = time_budget
+        self.cache = VersionedLRUCache(cache_size)
+    
+    def best_stack(
+        self,
+        lines: List[Dict],
+        customer_tier: str = "Bronze",
+        coupons: Optional[List[Dict]] = None,
+        time_budget: Optional[float] = None
+    ) -> Dict:
+        """
+        Best legal stack for cart lines ({"category", "price", "quantity"} dicts)
+        Returns: {"discount", "promotions", "coupon", "optimal", "strategy"}; promotion
+        entries list the indexes of the lines they discount
+        """
+        cart = [
+            CartLine(i, line.get("category"), float(line["price"]), int(line.get("quantity", 1)))
+            for i, line in enumerate(lines)
+        ]
+        order = sorted(range(len(cart)), key=lambda i: (str(cart[i].category), cart[i].price, cart[i].quantity))
+        budget = self.time_budget if time_budget is None else time_budget
+        key = (
+            customer_tier,
+            tuple((cart[i].category, cart[i].price, cart[i].quantity) for i in order),
+            tuple(sorted(coupon["code"] for coupon in coupons or []))
+        )
+        
+        result = self.cache.get(key, 0)
+        if result is None:
+            canonical = [CartLine(position, cart[i].category, cart[i].price, cart[i].quantity) for position, i in enumerate(order)]
+            result = self._solve(canonical, customer_tier, coupons or [], time.perf_counter() + budget)
+            if result["optimal"]:
+                self.cache.put(key, 0, result)
+        
+        # Map line positions in the canonical cart back to the caller's order
+        return {
+            **result,
+            "promotions": [
+                {**entry, "lines": sorted(order[position] for position in entry["lines"])}
+                for entry in result["promotions"]
+            ]
+        }
+    
+    def _solve(self, cart: List[CartLine], customer_tier: str, coupons: List[Dict], deadline: float) -> Dict:
+        subtotal = sum(line.amount for line in cart)
+        categories = list(dict.fromkeys(line.category for line in cart if line.category))
+        rules = self.index.applicable_rules(subtotal, customer_tier, categories)
+        coupon_rules = [
+            (PromotionRule(-1, coupon), coupon.get("stackable", True))
+            for coupon in coupons
+            if subtotal >= coupon.get("min_purchase_amount", 0)
+        ]
+        
+        best = {"discount": 0.0, "promotions": [], "coupon": None, "strategy": "exact"}
+        optimal = True
+        
+        def consider(candidate: Dict) -> None:
+            nonlocal optimal
+            optimal = optimal and candidate["strategy"] == "exact"
+            if candidate["discount"] > best["discount"] + 1e-9:
+                best.update(candidate)
+        
+        # Stand-alone promotions and coupons
+        for rule in rules:
+            if not rule.stackable:
+                consider(self._stack(cart, subtotal, [rule], None, deadline))
+        for coupon, stackable in coupon_rules:
+            if not stackable:
+                consider(self._stack(cart, subtotal, [], coupon, deadline))
+        
+        # Every stackable promotion, with each stackable coupon in turn
+        stackable = [rule for rule in rules if rule.stackable]
+        for coupon in [None] + [coupon for coupon, can_stack in coupon_rules if can_stack]:
+            consider(self._stack(cart, subtotal, stackable, coupon, deadline))
+        
+        best["discount"] = round(best["discount"], 2)
+        best["optimal"] = optimal
+        if not optimal and best["strategy"] == "exact":
+            # The best stack was searched fully, but another one was cut short
+            best["strategy"] = "partial"
+        return best
+    
+    def _stack(
+        self,
+        cart: List[CartLine],
+        subtotal: float,
+        rules: List[PromotionRule],
+        coupon: Optional[PromotionRule],
+        deadline: float
+    ) -> Dict:
+        """Value of one legal stack: best line assignment, then order rules, then the coupon"""
+        line_rules = [rule for rule in rules if is_line_rule(rule)]
+        search = LineAssignment(cart, line_rules, deadline)
+        line_discount, choice = search.solve()
+        
+        entries = []
+        for k, rule in enumerate(line_rules):
+            assigned = [line for line, chosen in zip(cart, choice) if chosen == k]
+            discount = line_rule_discount(
+                rule,
+                sum(line.amount for line in assigned),
+                tuple(line.price for line in assigned for _ in range(line.quantity)),
+                len(assigned)
+            )
+            if discount > 0:
+                entries.append((rule, discount, [line.index for line in assigned]))
+        
+        remaining = subtotal - line_discount
+        order_rules = sorted(
+            (rule for rule in rules if not is_line_rule(rule)),
+            key=lambda rule: (rule.kind != "percentage_discount", rule.order)
+        )
+        for rule in order_rules:
+            discount = order_rule_discount(rule, remaining)
+            if discount > 0:
+                remaining -= discount
+                entries.append((rule, discount, [line.index for line in cart]))
+        
+        coupon_entry = None
+        if coupon is not None:
+            discount = order_rule_discount(coupon, remaining)
+            if discount > 0:
+                remaining -= discount
+                coupon_entry = {"code": coupon.promotion["code"], "discount": round(discount, 2)}
+        
+        return {
+            "discount": subtotal - remaining,
+            "promotions": [
+                {"id": rule.promotion.get("id"), "name": rule.promotion.get("name"), "discount": round(discount, 2), "lines": lines}
+                for rule, discount, lines in sorted(entries, key=lambda entry: entry[0].order)
+            ],
+            "coupon": coupon_entry,
+            "strategy": search.strategy
+        }
@@ -0,0 +1,83 @@
+"""Precomputed candidate pools for preference-based recommendations"""
+
+import heapq
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
+import numpy as np
+from src.models.product import BUDGET_RANGES
+from src.services.compact_store import CompactProduct
+
+
+# Pool key used when no budget range applies
+ANY_BUDGET = "*"
+
+
+class RecommendationPools:
+    """
+    Rank-ordered product pools per budget range and per (budget range, style tag)
+    
+    Every product gets a global rank by (rating average, discount) descending,
+    ties in catalog order. Each pool is a sorted array of ranks, so a request
+    only merges the pools it needs and stops after `limit` distinct products.
+    """
+    
+    def __init__(self, products: List[CompactProduct], prices: np.ndarray, ratings: np.ndarray, discounts: np.ndarray):
+        positions = np.arange(len(products), dtype=np.int64)
+        self.rank_order = np.lexsort((positions, -discounts, -ratings))
+        ranks = np.empty(len(products), dtype=np.int64)
+        ranks[self.rank_order] = positions
+        
+        # Budget pools, bounds inclusive on both ends like Product.matches_preferences
+        self.budget_pools: Dict[str, np.ndarray] = {ANY_BUDGET: positions}
+        for budget, (min_price, max_price) in BUDGET_RANGES.items():
+            in_range = (prices >= min_price) & (prices <= max_price)
+            self.budget_pools[budget] = np.sort(ranks[in_range])
+        
+        # Style pools within each budget, keyed by lowercased tag
+        style_ranks: Dict[Tuple[str, str], List[int]] = {}
+        for position, product in enumerate(products):
+            rank = int(ranks[position])
+            budgets = [ANY_BUDGET] + [
+                budget for budget, (min_price, max_price) in BUDGET_RANGES.items()
+                if min_price <= prices[position] <= max_price
+            ]
+            for tag in {tag.lower() for tag in product.tags}:
+                for budget in budgets:
+                    style_ranks.setdefault((budget, tag), []).append(rank)
+        
+        self.style_pools: Dict[Tuple[str, str], np.ndarray] = {
+            key: np.sort(np.array(pool_ranks, dtype=np.int64))
+            for key, pool_ranks in style_ranks.items()
+        }
+    
+    def top_k(self, preferences: Dict, limit: int) -> np.ndarray:
+        """Positions of the best `limit` products matching budget and style preferences"""
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64)
+        
+        if not preferences:
+            return self.rank_order[:limit]
+        
+        budget = preferences.get("budget_range", "mid")
+        if budget not in BUDGET_RANGES:
+            budget = ANY_BUDGET
+        
+        styles = {style.lower() for style in preferences.get("styles", [])}
+        if not styles:
+            return self.rank_order[self.budget_pools[budget][:limit]]
+        
+        pools = [self.style_pools[(budget, style)] for style in styles if (budget, style) in self.style_pools]
+        ranks = list(islice(self._merge_distinct(pools), limit))
+        return self.rank_order[np.array(ranks, dtype=np.int64)]
+    
+    def _merge_distinct(self, pools: List[np.ndarray]) -> Iterator[int]:
+        """Lazily merge sorted rank pools, skipping products found in several pools"""
+        if len(pools) == 1:
+            yield from pools[0]
+            return
+        
+        last = -1
+        for rank in heapq.merge(*pools):
+            if rank != last:
+                last = rank
+                yield rank
@@ -0,0 +1,158 @@
+"""Inventory reservations: TTL holds on stock during checkout"""
+
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+from src.services.inventory_matrix import ONLINE
+
+
+class Hold:
+    """Units taken out of available stock until committed, released or expired"""
+    
+    __slots__ = ("hold_id", "sku", "location", "color", "size", "quantity", "expires_at")
+    
+    def __init__(self, hold_id: str, sku: str, location: str, color: str, size: str, quantity: int, expires_at: float):
+        self.hold_id = hold_id
+        self.sku = sku
+        self.location = location
+        self.color = color
+        self.size = size
+        self.quantity = quantity
+        self.expires_at = expires_at
+    
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ReservationEngine:
+    """
+    Per-variant stock holds with a time-to-live
+    
+    A hold is an atomic decrement-if-available on the inventory store, so
+    two checkouts can never both take the last unit. Releasing or expiring a
+    hold puts the units back; committing keeps them sold. Removing a hold
+    from the table is a single dict pop, so exactly one of commit, release
+    or expiry wins for each hold.
+    """
+    
+    def __init__(self, store, ttl: float = 900.0, clock: Callable[[], float] = time.monotonic):
+        self.store = store
+        self.ttl = ttl
+        self.clock = clock
+        self.holds: Dict[str, Hold] = {}
+        
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeping = threading.Event()
+        self._sweeper_lock = threading.Lock()
+    
+    def reserve(
+        self,
+        sku: str,
+        color: Optional[str],
+        size: Optional[str],
+        quantity: int = 1,
+        location: str = ONLINE,
+        ttl: Optional[float] = None
+    ) -> Optional[str]:
+        """
+        Hold units of a variant; a missing color or size takes the first variant with enough stock
+        Returns: hold id, or None if not enough stock
+        """
+        if quantity <= 0:
+            return None
+        
+        for variant_color, variant_size in self._variants(sku, color, size):
+            # Cheap read first; the decrement itself re-checks atomically
+            if self.store.quantity(sku, location, variant_color, variant_size) < quantity:
+                continue
+            if self.store.adjust(sku, location, variant_color, variant_size, -quantity) is None:
+                continue
+            
+            hold = Hold(
+                uuid.uuid4().hex,
+                sku,
+                location,
+                variant_color,
+                variant_size,
+                quantity,
+                self.clock() + (self.ttl if ttl is None else ttl)
+            )
+            self.holds[hold.hold_id] = hold
+            return hold.hold_id
+        
+        return None
+    
+    def reserve_all(self, lines: List[Tuple], location: str = ONLINE) -> Optional[List[str]]:
+        """
+        Hold every (sku, color, size, quantity) line, or none of them
+        Returns: hold ids in line order, or None if any line is short
+        """
+        hold_ids = []
+        for sku, color, size, quantity in lines:
+            hold_id = self.reserve(sku, color, size, quantity, location)
+            if hold_id is None:
+                for taken in hold_ids:
+                    self.release(taken)
+                return None
+            hold_ids.append(hold_id)
+        return hold_ids
+    
+    def release(self, hold_id: str) -> bool:
+        """Return a hold's units to stock (payment failed, cart abandoned)"""
+        hold = self.holds.pop(hold_id, None)
+        if hold is None:
+            return False
+        self.store.adjust(hold.sku, hold.location, hold.color, hold.size, hold.quantity)
+        return True
+    
+    def commit(self, hold_id: str) -> bool:
+        """Make a hold's decrement permanent (order confirmed)"""
+        return self.holds.pop(hold_id, None) is not None
+    
+    def get_hold(self, hold_id: str) -> Optional[Dict]:
+        """Details of an active hold"""
+        hold = self.holds.get(hold_id)
+        return hold.to_dict() if hold else None
+    
+    def expire_stale(self) -> int:
+        """Release every hold past its expiry; returns how many were released"""
+        now = self.clock()
+        expired = [hold.hold_id for hold in list(self.holds.values()) if hold.expires_at <= now]
+        return sum(self.release(hold_id) for hold_id in expired)
+    
+    def start_sweeper(self, interval: float = 30.0) -> None:
+        """Expire stale holds in a background thread"""
+        with self._sweeper_lock:
+            if self._sweeper and self._sweeper.is_alive():
+                return
+            
+            self._stop_sweeping.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep,
+                args=(interval,),
+                name="reservation-sweeper",
+                daemon=True
+            )
+            self._sweeper.start()
+    
+    def stop_sweeper(self) -> None:
+        """Stop the background sweeper"""
+        self._stop_sweeping.set()
+        if self._sweeper:
+            self._sweeper.join()
+            self._sweeper = None
+    
+    def _sweep(self, interval: float) -> None:
+        """Sweeper loop"""
+        while not self._stop_sweeping.wait(interval):
+            try:
+                self.expire_stale()
+            except Exception as e:
+                print(f"Error expiring reservations: {e}")
+    
+    def _variants(self, sku: str, color: Optional[str], size: Optional[str]) -> List[Tuple[str, str]]:
+        """Concrete (color, size) pairs matching a possibly partial variant"""
+        colors = [color] if color else self.store.colors_for(sku)
+        sizes = [size] if size else self.store.sizes_for(sku)
+        return [(c, s) for c in colors for s in sizes]
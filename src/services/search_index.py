@@ -0,0 +1,88 @@
+"""Inverted index with BM25 ranking for product text search"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# BM25 tuning constants
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def normalize_token(token: str) -> str:
+    """Strip simple English plural endings so "dresses" matches "dress" """
+    if len(token) <= 3:
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("sses"):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into normalized lowercase tokens"""
+    return [normalize_token(token) for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+class InvertedIndex:
+    """Token to postings index over documents identified by insertion order"""
+    
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None):
+        self.field_weights = field_weights or {}
+        self.postings: Dict[str, Dict[int, float]] = {}
+        self.doc_lengths: List[float] = []
+        self.avg_doc_length = 0.0
+    
+    def add_document(self, fields: Dict[str, str]) -> int:
+        """Index a document and return its id"""
+        doc_id = len(self.doc_lengths)
+        doc_length = 0.0
+        
+        for field_name, text in fields.items():
+            weight = self.field_weights.get(field_name, 1.0)
+            for token in tokenize(text or ""):
+                postings = self.postings.setdefault(token, {})
+                postings[doc_id] = postings.get(doc_id, 0.0) + weight
+                doc_length += weight
+        
+        self.doc_lengths.append(doc_length)
+        return doc_id
+    
+    def finalize(self) -> None:
+        """Compute collection statistics once all documents are added"""
+        if self.doc_lengths:
+            self.avg_doc_length = sum(self.doc_lengths) / len(self.doc_lengths)
+    
+    def idf(self, token: str) -> float:
+        """BM25 inverse document frequency for a token"""
+        doc_freq = len(self.postings.get(token, ()))
+        total_docs = len(self.doc_lengths)
+        return math.log(1 + (total_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+    
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """
+        Score documents containing any query token
+        Returns: [(doc_id, score)] sorted by descending score
+        """
+        scores: Dict[int, float] = {}
+        avg_length = self.avg_doc_length or 1.0
+        
+        for token in set(tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            
+            idf = self.idf(token)
+            for doc_id, tf in postings.items():
+                length_norm = 1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / avg_length
+                score = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+        
+        # Ties keep catalog order
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
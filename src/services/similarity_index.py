@@ -0,0 +1,158 @@
+"""Local vector-similarity index for "similar products" queries"""
+
+import math
+import zlib
+from typing import Dict, List, Optional
+import numpy as np
+from src.services.compact_store import CompactProduct
+from src.services.search_index import tokenize
+
+
+# Hashed feature space size; rows are L2-normalized float32 vectors
+DEFAULT_DIMENSIONS = 256
+
+# Below this size approximate queries just scan every product
+IVF_MIN_PRODUCTS = 2048
+IVF_TRAINING_ITERATIONS = 10
+IVF_DEFAULT_PROBES = 8
+
+
+def product_features(product: CompactProduct, price: float) -> Dict[str, float]:
+    """Weighted text and attribute features of a product"""
+    features: Dict[str, float] = {}
+    
+    def add(feature: str, weight: float) -> None:
+        features[feature] = features.get(feature, 0.0) + weight
+    
+    for token in tokenize(product.name):
+        add(token, 2.0)
+    for token in tokenize(" ".join(product.tags)):
+        add(token, 2.0)
+    for token in tokenize(product.description):
+        add(token, 1.0)
+    
+    add(f"category:{product.category.lower()}", 3.0)
+    add(f"subcategory:{product.subcategory.lower()}", 3.0)
+    add(f"brand:{product.brand.lower()}", 1.0)
+    if product.fabric:
+        add(f"fabric:{product.fabric.lower()}", 1.0)
+    for color in product.colors:
+        for token in tokenize(color):
+            add(f"color:{token}", 0.5)
+    
+    # Neighbouring price levels share a feature, so similar prices score higher
+    price_level = int(math.log2(max(price, 1.0)))
+    add(f"price:{price_level}", 1.5)
+    add(f"price:{price_level + 1}", 0.5)
+    
+    return features
+
+
+def _hash_feature(feature: str, dimensions: int) -> tuple:
+    """Stable (bucket, sign) for a feature string"""
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % dimensions, 1.0 if digest & 0x80000000 else -1.0
+
+
+class SimilarityIndex:
+    """TF-IDF weighted hashed feature vectors with exact and IVF nearest-neighbour search"""
+    
+    def __init__(self, products: List[CompactProduct], prices: np.ndarray, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        feature_ids: Dict[str, int] = {}
+        rows: List[int] = []
+        ids: List[int] = []
+        weights: List[float] = []
+        for row, product in enumerate(products):
+            for feature, weight in product_features(product, float(prices[row])).items():
+                rows.append(row)
+                ids.append(feature_ids.setdefault(feature, len(feature_ids)))
+                weights.append(weight)
+        
+        ids_array = np.array(ids, dtype=np.int64)
+        
+        # IDF weighting from document frequencies
+        total = len(products)
+        doc_freq = np.bincount(ids_array, minlength=len(feature_ids))
+        idf = np.log((1 + total) / (1 + doc_freq)) + 1
+        
+        # Hash each distinct feature once into a signed bucket
+        buckets = np.empty(len(feature_ids), dtype=np.int64)
+        signs = np.empty(len(feature_ids), dtype=np.float64)
+        for feature, feature_id in feature_ids.items():
+            buckets[feature_id], signs[feature_id] = _hash_feature(feature, dimensions)
+        
+        values = np.array(weights, dtype=np.float64) * idf[ids_array] * signs[ids_array]
+        self.vectors = np.zeros((total, dimensions), dtype=np.float32)
+        np.add.at(self.vectors, (np.array(rows, dtype=np.int64), buckets[ids_array]), values)
+        
+        norms = np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.vectors /= np.maximum(norms, 1e-12)
+        
+        self.centroids: Optional[np.ndarray] = None
+        self.partitions: List[np.ndarray] = []
+    
+    def __len__(self) -> int:
+        return len(self.vectors)
+    
+    def nearest(
+        self,
+        vector: np.ndarray,
+        limit: int,
+        exclude: Optional[int] = None,
+        approximate: bool = False,
+        probes: int = IVF_DEFAULT_PROBES
+    ) -> List[int]:
+        """Positions of the `limit` most cosine-similar products"""
+        if limit <= 0 or not len(self.vectors):
+            return []
+        
+        if approximate and len(self.vectors) >= IVF_MIN_PRODUCTS:
+            if self.centroids is None:
+                self._build_partitions()
+            closest = np.argsort(-(self.centroids @ vector))[:probes]
+            candidates = np.concatenate([self.partitions[c] for c in closest])
+        else:
+            candidates = np.arange(len(self.vectors))
+        
+        scores = self.vectors[candidates] @ vector
+        if exclude is not None:
+            scores[candidates == exclude] = -np.inf
+        
+        take = min(limit, len(candidates))
+        top = np.argpartition(-scores, take - 1)[:take]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [int(candidates[i]) for i in top if scores[i] > -np.inf]
+    
+    def similar_to(self, position: int, limit: int, approximate: bool = False) -> List[int]:
+        """Positions of the products most similar to the product at `position`"""
+        return self.nearest(self.vectors[position], limit, exclude=position, approximate=approximate)
+    
+    def _build_partitions(self) -> None:
+        """Spherical k-means over a sample, then assign every product to its closest centroid"""
+        total = len(self.vectors)
+        partition_count = max(1, int(math.sqrt(total)))
+        rng = np.random.default_rng(0)
+        
+        sample_size = min(total, partition_count * 64)
+        sample = self.vectors[rng.choice(total, size=sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, size=partition_count, replace=False)].copy()
+        
+        for _ in range(IVF_TRAINING_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            occupied = np.bincount(assignment, minlength=partition_count) > 0
+            centroids[occupied] = sums[occupied]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        
+        # Assign the full catalog in chunks to bound the score matrix size
+        assignment = np.empty(total, dtype=np.int64)
+        for start in range(0, total, 65536):
+            chunk = self.vectors[start:start + 65536]
+            assignment[start:start + 65536] = np.argmax(chunk @ centroids.T, axis=1)
+        
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.cumsum(np.bincount(assignment, minlength=partition_count))[:-1]
+        self.partitions = np.split(order, bounds)
+        self.centroids = centroids
@@ -0,0 +1,118 @@
+"""Character-trigram index for typo-tolerant product search"""
+
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from src.services.search_index import tokenize
+
+
+def trigrams(term: str) -> List[str]:
+    """Padded character trigrams of a term"""
+    padded = f"${term}$"
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def max_edits_for(term: str) -> int:
+    """Edit distance tolerated for a query term of this length"""
+    if len(term) <= 3:
+        return 0
+    if len(term) <= 5:
+        return 1
+    return 2
+
+
+def bounded_edit_distance(a: str, b: str, max_distance: int) -> Optional[int]:
+    """Levenshtein distance, or None as soon as it must exceed max_distance"""
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > max_distance:
+            return None
+        previous = current
+    
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+class TrigramIndex:
+    """Trigram -> vocabulary term index, with term -> product postings"""
+    
+    def __init__(self):
+        self.terms: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        self.term_postings: List[List[int]] = []
+        self._trigram_lists: Dict[str, List[int]] = {}
+        self.trigram_postings: Dict[str, np.ndarray] = {}
+    
+    def add_document(self, doc_id: int, text: str) -> None:
+        """Index the terms of a document"""
+        for term in set(tokenize(text)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                term_id = len(self.terms)
+                self.term_ids[term] = term_id
+                self.terms.append(term)
+                self.term_postings.append([])
+                for gram in set(trigrams(term)):
+                    self._trigram_lists.setdefault(gram, []).append(term_id)
+            self.term_postings[term_id].append(doc_id)
+    
+    def finalize(self) -> None:
+        """Freeze trigram postings into arrays"""
+        self.trigram_postings = {
+            gram: np.array(term_ids, dtype=np.int32)
+            for gram, term_ids in self._trigram_lists.items()
+        }
+        self._trigram_lists = {}
+    
+    def match_terms(self, token: str) -> List[Tuple[int, float]]:
+        """
+        Vocabulary terms within the edit bound of a normalized query token
+        Returns: [(term_id, similarity)] with similarity in (0, 1]
+        """
+        exact = self.term_ids.get(token)
+        max_edits = max_edits_for(token)
+        if max_edits == 0:
+            return [(exact, 1.0)] if exact is not None else []
+        
+        grams = set(trigrams(token))
+        postings = [self.trigram_postings[g] for g in grams if g in self.trigram_postings]
+        if not postings:
+            return []
+        
+        # Each edit destroys at most three trigrams
+        candidates, shared = np.unique(np.concatenate(postings), return_counts=True)
+        min_shared = max(1, len(grams) - 3 * max_edits)
+        
+        matches = []
+        for term_id in candidates[shared >= min_shared].tolist():
+            term = self.terms[term_id]
+            distance = bounded_edit_distance(token, term, max_edits)
+            if distance is not None:
+                matches.append((term_id, 1.0 - distance / max(len(token), len(term))))
+        return matches
+    
+    def search(self, query: str) -> List[Tuple[int, float]]:
+        """
+        Rank documents by summed best-term similarity over query tokens
+        Returns: [(doc_id, score)] sorted by descending score
+        """
+        scores: Dict[int, float] = {}
+        for token in set(tokenize(query)):
+            best: Dict[int, float] = {}
+            for term_id, similarity in self.match_terms(token):
+                for doc_id in self.term_postings[term_id]:
+                    if similarity > best.get(doc_id, 0.0):
+                        best[doc_id] = similarity
+            for doc_id, similarity in best.items():
+                scores[doc_id] = scores.get(doc_id, 0.0) + similarity
+        
+        # Ties keep catalog order
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
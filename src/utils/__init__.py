@@ -3,6 +3,7 @@
 from .llm_client import LLMClient
 from .context_manager import ContextManager
 from .helpers import format_currency, generate_id, load_json_data
+from .cache import VersionedLRUCache
 
 __all__ = [
     "LLMClient",
@@ -10,4 +11,5 @@ __all__ = [
     "format_currency",
     "generate_id",
     "load_json_data",
+    "VersionedLRUCache",
 ]
@@ -0,0 +1,67 @@
+"""Bounded LRU cache with version-tagged entries"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class VersionedLRUCache:
+    """
+    Least-recently-used cache whose entries carry a version tag
+    
+    A lookup only hits when the caller's current version matches the one
+    the entry was stored with, so bumping a version invalidates exactly the
+    entries built from the old data without any explicit purge.
+    """
+    
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self.entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, version: int) -> Optional[Any]:
+        """Cached value for key at this version, or None"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key: Hashable, version: int, value: Any) -> None:
+        """Store value for key, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self.entries[key] = (version, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def stats(self) -> Dict:
+        """Hit and miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
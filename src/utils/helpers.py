@@ -18,21 +18,31 @@ def generate_id(prefix: str = "") -> str:
     return f"{prefix}{unique_id}" if prefix else unique_id
 
 
-def load_json_data(filename: str) -> Dict:
-    """Load JSON data from data directory"""
+def get_data_path(filename: str, data_dir: Optional[Path] = None) -> Path:
+    """Get absolute path of a file in the data directory (or an override directory)"""
+    if data_dir is not None:
+        return Path(data_dir) / filename
+    
     # Use absolute path relative to this file
     base_dir = Path(__file__).parent.parent.parent
-    data_dir = base_dir / "data"
-    file_path = data_dir / filename
-    
+    return base_dir / "data" / filename
+
+
+def load_json_data(filename: str, data_dir: Optional[Path] = None) -> Dict:
+    """Load JSON data from data directory"""
+    return load_json_file(get_data_path(filename, data_dir))
+
+
+def load_json_file(file_path: Path) -> Dict:
+    """Load JSON data from an explicit path"""
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             return json.load(f)
     except FileNotFoundError:
-        print(f"Warning: {filename} not found at {file_path}")
+        print(f"Warning: {file_path.name} not found at {file_path}")
         return {}
     except json.JSONDecodeError:
-        print(f"Warning: {filename} is not valid JSON")
+        print(f"Warning: {file_path.name} is not valid JSON")
         return {}
 
 
@@ -0,0 +1,1011 @@
+"""Tests for service layer indexes and engines"""
+
+import itertools
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import fakeredis
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config.settings import settings
+from src.models.cart import Cart
+from src.orchestrator import WorkflowEngine
+from src.services import FulfillmentService, InventoryService, LoyaltyService, ProductCatalogService
+from src.services.compact_store import CompactProduct
+from src.services.coupon_store import CouponStore
+from src.services.delivery_slots import SlotInventory
+from src.services.geo_index import KDTree, haversine_km, to_unit_vector
+from src.services.inventory_store import LocalInventoryStore, RedisInventoryStore, create_inventory_store
+from src.services.points_ledger import DAY_SECONDS, PointsLedger
+from src.services.promotion_index import PromotionIndex
+from src.services.promotion_stacking import StackingOptimizer, is_line_rule, line_rule_discount
+from src.services.recommendation_pools import RecommendationPools
+from src.services.search_index import InvertedIndex, tokenize
+from src.services.similarity_index import IVF_DEFAULT_PROBES, IVF_MIN_PRODUCTS, SimilarityIndex
+from src.services.trigram_index import bounded_edit_distance
+from src.utils.helpers import load_json_data
+
+
+def test_tokenize():
+    """Test tokenizer normalization"""
+    assert tokenize("Floral Maxi-Dresses") == ["floral", "maxi", "dress"]
+    assert tokenize("Jeans & Accessories") == ["jean", "accessory"]
+    print("✓ Tokenize test passed")
+
+
+def test_inverted_index_ranking():
+    """Test BM25 ranking prefers documents with more query matches"""
+    index = InvertedIndex()
+    index.add_document({"text": "blue denim jacket"})
+    index.add_document({"text": "blue cotton shirt"})
+    index.add_document({"text": "red silk saree"})
+    index.finalize()
+    
+    ranked = index.search("blue denim")
+    assert [doc_id for doc_id, _ in ranked] == [0, 1]
+    assert index.search("wool") == []
+    print("✓ Inverted index ranking test passed")
+
+
+def test_catalog_search():
+    """Test catalog search with query and filters"""
+    catalog = ProductCatalogService()
+    
+    results = catalog.search_products("summer dresses")
+    assert results and results[0].sku == "DRESS-001"
+    
+    casual = catalog.search_products("casual", max_price=3000, limit=50)
+    assert casual
+    assert all(p.price <= 3000 and "casual" in p.tags for p in casual)
+    
+    assert catalog.search_products("casual", category="Footwear")[0].sku == "SNEAKERS-023"
+    print("✓ Catalog search test passed")
+
+
+def test_catalog_indexes():
+    """Test SKU map and attribute posting lists"""
+    catalog = ProductCatalogService()
+    
+    assert catalog.get_product_by_sku("JEANS-067").brand == "Levi's"
+    assert catalog.get_product_by_sku("UNKNOWN-999") is None
+    
+    ethnic = catalog.get_products_by_category("ethnic wear")
+    assert [p.sku for p in ethnic] == ["KURTI-056", "SAREE-089", "LEHENGA-001"]
+    assert [p.sku for p in catalog.search_products(brand="puma")] == ["SNEAKERS-023"]
+    assert [p.sku for p in catalog.search_products(subcategory="Sarees")] == ["SAREE-089"]
+    print("✓ Catalog index test passed")
+
+
+def test_catalog_recommendations():
+    """Test vectorized recommendations match the per-product preference check"""
+    catalog = ProductCatalogService()
+    
+    for preferences in [{}, {"budget_range": "mid"}, {"budget_range": "premium", "styles": ["Formal", "wedding"]}]:
+        expected = [p for p in catalog.all_products() if p.matches_preferences(preferences)]
+        expected.sort(key=lambda p: (p.ratings.average, p.discount_percent), reverse=True)
+        
+        results = catalog.get_recommendations(preferences, limit=3)
+        assert [p.sku for p in results] == [p.sku for p in expected[:3]]
+    
+    print("✓ Catalog recommendations test passed")
+
+
+def test_recommendation_pools():
+    """Test budget and style pools rank by rating then discount and merge styles without duplicates"""
+    rows = [
+        # (price, rating, discount, tags)
+        (1500, 4.5, 10, ["Casual", "Summer"]),
+        (2000, 4.8, 0, ["casual"]),
+        (4000, 4.8, 20, ["Formal"]),
+        (4000, 4.8, 20, ["formal", "Wedding"]),
+        (5000, 3.9, 5, ["Wedding"]),
+        (25000, 4.9, 0, ["Wedding", "Formal"]),
+    ]
+    products = [SimpleNamespace(tags=tags) for _, _, _, tags in rows]
+    pools = RecommendationPools(
+        products,
+        np.array([row[0] for row in rows], dtype=np.float64),
+        np.array([row[1] for row in rows], dtype=np.float64),
+        np.array([row[2] for row in rows], dtype=np.float64)
+    )
+    
+    # Ties keep catalog order; 2000 and 5000 sit in both neighbouring budget ranges
+    assert list(pools.top_k({}, 10)) == [5, 2, 3, 1, 0, 4]
+    assert list(pools.top_k({"budget_range": "mid"}, 10)) == [2, 3, 1, 4]
+    assert list(pools.top_k({"budget_range": "budget"}, 10)) == [1, 0]
+    assert list(pools.top_k({"budget_range": "unknown"}, 2)) == [5, 2]
+    
+    # Product 3 is in both the formal and wedding pools but comes back once
+    assert list(pools.top_k({"budget_range": "mid", "styles": ["FORMAL", "wedding"]}, 10)) == [2, 3, 4]
+    assert list(pools.top_k({"budget_range": "mid", "styles": ["Formal", "wedding"]}, 2)) == [2, 3]
+    assert list(pools.top_k({"budget_range": "mid", "styles": ["beach"]}, 5)) == []
+    assert list(pools.top_k({"budget_range": "mid"}, 0)) == []
+    print("✓ Recommendation pools test passed")
+
+
+def test_catalog_facets():
+    """Test facet counts match a direct count over the result set"""
+    catalog = ProductCatalogService()
+    
+    result = catalog.search_with_facets(query="casual", limit=2)
+    matches = catalog.search_products("casual", limit=100)
+    assert result["total"] == len(matches)
+    assert len(result["products"]) == 2
+    
+    colors = {facet["value"]: facet["count"] for facet in result["facets"]["color"]}
+    assert colors["Black"] == sum("Black" in p.colors for p in matches)
+    assert sum(bucket["count"] for bucket in result["facets"]["price"]) == len(matches)
+    
+    black = catalog.search_with_facets(color="black", limit=100)
+    assert black["products"] and all("Black" in p.colors for p in black["products"])
+    print("✓ Catalog facets test passed")
+
+
+def test_catalog_hot_reload():
+    """Test background reload swaps indexes and reports changed SKUs"""
+    catalog = ProductCatalogService()
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        products_path = Path(tmp_dir) / "products.json"
+        shutil.copy(catalog.products_path, products_path)
+        catalog.products_path = products_path
+        assert catalog.reload()["changed"] == []
+        
+        reports = []
+        catalog.add_reload_listener(reports.append)
+        catalog.start_watching(interval=0.05)
+        
+        data = json.loads(products_path.read_text(encoding="utf-8"))
+        data["products"][0]["price"] = 999
+        data["products"] = [p for p in data["products"] if p["sku"] != "BAG-045"]
+        products_path.write_text(json.dumps(data), encoding="utf-8")
+        
+        deadline = time.time() + 5
+        while not reports and time.time() < deadline:
+            time.sleep(0.05)
+        catalog.stop_watching()
+    
+    assert reports and reports[0]["changed"] == ["DRESS-001"]
+    assert reports[0]["removed"] == ["BAG-045"]
+    assert catalog.get_product_by_sku("DRESS-001").price == 999
+    assert catalog.get_product_by_sku("BAG-045") is None
+    assert catalog.search_products("floral", max_price=1000)[0].sku == "DRESS-001"
+    print("✓ Catalog hot reload test passed")
+
+
+def test_catalog_fuzzy_search():
+    """Test typo-tolerant search over name, brand and tags"""
+    catalog = ProductCatalogService()
+    
+    assert bounded_edit_distance("jeen", "jean", 1) == 1
+    assert bounded_edit_distance("kurtha", "kurti", 1) is None
+    
+    assert catalog.search_products("jeens") == []
+    assert catalog.search_products("jeens", fuzzy=True)[0].sku == "JEANS-067"
+    assert catalog.search_products("kurtha", fuzzy=True)[0].sku == "KURTI-056"
+    assert catalog.search_products("flral dress", fuzzy=True)[0].sku == "DRESS-001"
+    assert catalog.search_products("sneekers", fuzzy=True, max_price=1000) == []
+    print("✓ Catalog fuzzy search test passed")
+
+
+def test_catalog_similar_products():
+    """Test exact and approximate nearest-neighbour product similarity"""
+    catalog = ProductCatalogService()
+    
+    similar = catalog.get_similar_products("SUIT-001", limit=3)
+    assert len(similar) == 3
+    assert "SUIT-001" not in [p.sku for p in similar]
+    assert similar[0].sku == "SHIRT-034"
+    
+    approximate = catalog.get_similar_products("SUIT-001", limit=3, approximate=True)
+    assert [p.sku for p in approximate] == [p.sku for p in similar]
+    assert catalog.get_similar_products("UNKNOWN-999") == []
+    print("✓ Catalog similar products test passed")
+
+
+def test_similarity_ivf():
+    """Test IVF top-k recall against exact search on a synthetic catalog above the IVF threshold"""
+    rng = random.Random(4)
+    categories = ["Dresses", "Topwear", "Bottomwear", "Ethnic Wear", "Footwear", "Accessories"]
+    words = [f"word{i}" for i in range(60)]
+    products, prices = [], []
+    for i in range(2500):
+        c = rng.randrange(len(categories))
+        theme = words[c * 10:(c + 1) * 10]
+        products.append(CompactProduct(
+            sku=f"SYN-{i:05d}", name=" ".join(rng.sample(theme, 3)), category=categories[c],
+            subcategory=f"{categories[c]} {rng.randint(1, 4)}", brand=f"Brand{rng.randint(1, 30)}",
+            description=" ".join(rng.sample(words, 6)), fabric=rng.choice(["Cotton", "Silk", None]), care=None,
+            sizes=("M",), colors=(rng.choice(["Red", "Blue", "Black Olive"]),), images=(),
+            tags=tuple(rng.sample(theme, 2)), complementary_products=(),
+        ))
+        prices.append(rng.choice([499, 999, 1999, 4999, 9999]))
+    index = SimilarityIndex(products, np.array(prices, dtype=np.float64))
+    assert len(index) >= IVF_MIN_PRODUCTS
+    
+    recalls = []
+    for position in rng.sample(range(len(index)), 50):
+        exact = index.similar_to(position, 10)
+        approximate = index.similar_to(position, 10, approximate=True)
+        assert position not in exact and position not in approximate
+        assert len(approximate) == 10
+        recalls.append(len(set(exact) & set(approximate)) / 10)
+    assert sum(recalls) / len(recalls) >= 0.9
+    
+    # Partitions were trained, cover every product once, and probing skips most of them
+    assert index.centroids is not None
+    assert sorted(p for partition in index.partitions for p in partition) == list(range(len(index)))
+    assert len(index.partitions) > IVF_DEFAULT_PROBES
+    print("✓ Similarity IVF test passed")
+
+
+def test_inventory_matrix():
+    """Test matrix lookups match summing the nested inventory dicts, and updates keep totals"""
+    inventory = InventoryService()
+    raw = load_json_data("inventory.json")["inventory"]
+    
+    for sku, entry in raw.items():
+        locations = [("online", entry["online"])] + list(entry["stores"].items())
+        for location, stock in locations:
+            colors = {c for c in stock}
+            sizes = {s for by_size in stock.values() for s in by_size}
+            assert inventory.check_availability(sku, location=location)[1] == sum(sum(v.values()) for v in stock.values())
+            for color in colors:
+                assert inventory.check_availability(sku, color, None, location)[1] == sum(stock[color].values())
+            for size in sizes:
+                assert inventory.check_availability(sku, None, size, location)[1] == sum(v.get(size, 0) for v in stock.values())
+                for color in colors:
+                    assert inventory.check_availability(sku, color, size, location)[1] == stock[color].get(size, 0)
+    
+    assert inventory.check_availability("DRESS-001", "Purple", "M") == (False, 0)
+    assert inventory.check_availability("UNKNOWN-999") == (False, 0)
+    
+    before = inventory.check_availability("DRESS-001", "Blue Floral")[1]
+    assert inventory.update_stock("DRESS-001", "Blue Floral", "M", -3) == 5
+    assert inventory.check_availability("DRESS-001", "Blue Floral")[1] == before - 3
+    assert inventory.update_stock("DRESS-001", "Blue Floral", "M", -10) is None
+    
+    # New store and color for an existing SKU relocate its block
+    assert inventory.update_stock("DRESS-001", "Purple", "M", 4, "Pune - Phoenix Marketcity") == 4
+    assert inventory.check_availability("DRESS-001", size="M", location="Pune - Phoenix Marketcity") == (True, 4)
+    assert inventory.check_availability("DRESS-001", "Blue Floral")[1] == before - 3
+    assert "Pune - Phoenix Marketcity" in inventory.get_available_stores("DRESS-001", "Purple")
+    print("✓ Inventory matrix test passed")
+
+
+def test_inventory_availability_bitmaps():
+    """Test store bitmaps agree with stock counts as stock changes"""
+    inventory = InventoryService()
+    matrix = inventory.store
+    rng = random.Random(7)
+    
+    def check():
+        for sku in matrix.layouts:
+            for color in [None] + matrix.colors_for(sku):
+                for size in [None] + matrix.sizes_for(sku):
+                    expected = [
+                        location for location in matrix.locations_for(sku)
+                        if matrix.quantity(sku, location, color, size) > 0
+                    ]
+                    assert matrix.available_locations(sku, color, size) == expected
+    
+    check()
+    for _ in range(300):
+        sku = rng.choice(list(matrix.layouts))
+        location = rng.choice(matrix.locations_for(sku) + ["Kolkata - Quest Mall"])
+        color = rng.choice(matrix.colors_for(sku))
+        size = rng.choice(matrix.sizes_for(sku))
+        matrix.adjust(sku, location, color, size, rng.randint(-5, 5))
+    check()
+    
+    options = inventory.get_fulfillment_options("DRESS-001", "Blue Floral", "M", "Mumbai")
+    assert options["home_delivery"]["available"] == (inventory.check_availability("DRESS-001", "Blue Floral", "M")[1] > 0)
+    assert options["store_pickup"]["stores"] == inventory.get_available_stores("DRESS-001", "Blue Floral", "M")
+    print("✓ Inventory availability bitmap test passed")
+
+
+def test_inventory_reservations():
+    """Test concurrent holds never oversell, and release, commit and expiry"""
+    inventory = InventoryService()
+    now = [0.0]
+    inventory.reservations.clock = lambda: now[0]
+    
+    available = inventory.check_availability("DRESS-001", "Blue Floral", "M")[1]
+    results = []
+    
+    def checkout():
+        results.append(inventory.reserve_inventory("DRESS-001", "Blue Floral", "M"))
+    
+    threads = [threading.Thread(target=checkout) for _ in range(available + 20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    holds = [hold_id for hold_id in results if hold_id]
+    assert len(holds) == available
+    assert inventory.check_availability("DRESS-001", "Blue Floral", "M") == (False, 0)
+    
+    assert inventory.commit_reservation(holds[0])
+    assert inventory.release_reservation(holds[1])
+    assert not inventory.release_reservation(holds[0])
+    assert inventory.check_availability("DRESS-001", "Blue Floral", "M")[1] == 1
+    
+    # Stale holds return to stock once the TTL passes
+    now[0] += inventory.reservations.ttl + 1
+    assert inventory.reservations.expire_stale() == available - 2
+    assert inventory.check_availability("DRESS-001", "Blue Floral", "M")[1] == available - 1
+    
+    # Multi-line holds are all-or-nothing
+    before = inventory.check_availability("JEANS-067")[1]
+    assert inventory.reserve_items([("JEANS-067", None, None, 1), ("DRESS-001", "Blue Floral", "M", 999)]) is None
+    assert inventory.check_availability("JEANS-067")[1] == before
+    inventory.reservations.stop_sweeper()
+    print("✓ Inventory reservation test passed")
+
+
+def test_checkout_releases_holds():
+    """Test a checkout that fails on bad input or a payment error leaves stock and coupons unchanged"""
+    engine = WorkflowEngine()
+    cart = Cart(customer_id="CUST001")
+    assert engine.add_to_cart(cart, "DRESS-001", 2, "M", "Blue Floral")["success"]
+    before = engine.inventory_service.check_availability("DRESS-001", "Blue Floral", "M")[1]
+    
+    try:
+        engine.create_order_from_cart(cart, "CUST001", {"name": "Asha"}, "upi")
+        assert False, "malformed shipping address should be rejected"
+    except ValueError:
+        pass
+    assert engine.inventory_service.check_availability("DRESS-001", "Blue Floral", "M")[1] == before
+    
+    def gateway_down(**kwargs):
+        raise ConnectionError("gateway unreachable")
+    
+    engine.payment_service.process_payment = gateway_down
+    address = {"name": "Asha", "address": "Andheri, Mumbai", "phone": "9800000000"}
+    try:
+        engine.create_order_from_cart(cart, "CUST001", address, "upi")
+        assert False, "payment error should propagate"
+    except ConnectionError:
+        pass
+    assert engine.inventory_service.check_availability("DRESS-001", "Blue Floral", "M")[1] == before
+    assert not cart.is_empty()
+    
+    # A coupon used at checkout is given back when payment fails, and spent when it succeeds
+    template = {"type": "percentage_discount", "value": 50, "usage_limit": 1, "active": True}
+    engine.loyalty_service.import_coupon_codes(["HALFOFF50"], template)
+    try:
+        engine.create_order_from_cart(cart, "CUST001", address, "upi", coupon_codes=["HALFOFF50"])
+        assert False, "payment error should propagate"
+    except ConnectionError:
+        pass
+    assert engine.loyalty_service.coupon_store.uses_left("HALFOFF50") == 1
+    
+    del engine.payment_service.process_payment
+    result = engine.create_order_from_cart(cart, "CUST001", address, "upi", coupon_codes=["HALFOFF50", "NOSUCHCODE"])
+    assert result["success"] and "HALFOFF50" in result["order"]["applied_promotions"]
+    assert engine.loyalty_service.coupon_store.uses_left("HALFOFF50") == 0
+    assert engine.inventory_service.check_availability("DRESS-001", "Blue Floral", "M")[1] == before - 2
+    engine.inventory_service.reservations.stop_sweeper()
+    print("✓ Checkout hold release test passed")
+
+
+def test_inventory_store_fallback():
+    """Test the Redis backend falls back to the in-process store without a server"""
+    inventory = load_json_data("inventory.json")["inventory"]
+    host, port = settings.redis_host, settings.redis_port
+    settings.redis_host, settings.redis_port = "127.0.0.1", 1
+    try:
+        store = create_inventory_store(inventory, backend="redis")
+    finally:
+        settings.redis_host, settings.redis_port = host, port
+    assert isinstance(store, LocalInventoryStore)
+    assert store.adjust("DRESS-001", "online", "Blue Floral", "M", -8) == 0
+    assert store.adjust("DRESS-001", "online", "Blue Floral", "M", -1) is None
+    print("✓ Inventory store fallback test passed")
+
+
+def test_redis_inventory_store():
+    """Test the Redis store's Lua adjust, pipelined batches and versions match the in-process store"""
+    inventory = load_json_data("inventory.json")["inventory"]
+    local = LocalInventoryStore(inventory)
+    remote = RedisInventoryStore(fakeredis.FakeRedis(decode_responses=True))
+    assert remote.load(inventory) and not remote.load(inventory)
+    
+    def assert_same(sku):
+        assert remote.locations_for(sku) == local.locations_for(sku)
+        assert remote.colors_for(sku) == local.colors_for(sku)
+        assert remote.sizes_for(sku) == local.sizes_for(sku)
+        cells = [
+            (sku, location, color, size)
+            for location in local.locations_for(sku)
+            for color in local.colors_for(sku) + [None]
+            for size in local.sizes_for(sku) + [None]
+        ]
+        assert remote.quantities(cells) == local.quantities(cells)
+        for color in local.colors_for(sku) + [None]:
+            assert remote.available_locations(sku, color) == local.available_locations(sku, color)
+        assert remote.sku_version(sku) == local.sku_version(sku)
+    
+    skus = list(inventory)[:15]
+    for sku in skus:
+        assert_same(sku)
+    
+    rng = random.Random(5)
+    for step in range(150):
+        sku = rng.choice(skus)
+        location = rng.choice(local.locations_for(sku) + ["Pune - Phoenix Mall"])
+        color = rng.choice(local.colors_for(sku) + ["Teal"])
+        size = rng.choice(local.sizes_for(sku) + ["XXL"])
+        if step % 10 == 0:
+            quantity = rng.randint(0, 6)
+            assert remote.set_quantity(sku, location, color, size, quantity) == local.set_quantity(sku, location, color, size, quantity)
+        else:
+            delta = rng.randint(-6, 4)
+            assert remote.adjust(sku, location, color, size, delta) == local.adjust(sku, location, color, size, delta)
+        assert_same(sku)
+    
+    batch = [(sku, "online", color, size, rng.randint(-3, 3)) for sku in skus for color in local.colors_for(sku)[:1] for size in local.sizes_for(sku)]
+    batch.append((skus[0], "online", "Teal", "M", -1))
+    assert remote.apply_batch(batch) == local.apply_batch(batch)
+    assert remote.apply_batch(batch)[-1] is None
+    local.apply_batch(batch)
+    for sku in skus:
+        assert_same(sku)
+    assert remote.version == local.version > 0
+    print("✓ Redis inventory store test passed")
+
+
+def test_inventory_delta_ingestion():
+    """Test JSONL delta batches update stock and bump global and per-SKU versions"""
+    inventory = InventoryService()
+    before = inventory.check_availability("DRESS-001", "Blue Floral", "M")[1]
+    start_version = inventory.get_inventory_version()
+    
+    lines = [
+        json.dumps({"sku": "DRESS-001", "location": "online", "color": "Blue Floral", "size": "M", "qty": 5}),
+        json.dumps({"sku": "DRESS-001", "color": "Blue Floral", "size": "M", "qty": -2}),
+        json.dumps({"sku": "JEANS-067", "location": "online", "color": "Dark Blue", "size": "30", "qty": -9999}),
+        "not json",
+        "",
+        json.dumps({"sku": "SUIT-001", "location": "Pune - Phoenix Marketcity", "color": "Navy Blue", "size": "40", "qty": 3})
+    ]
+    report = inventory.apply_deltas(lines, batch_size=2)
+    
+    assert report["applied"] == 3 and report["rejected"] == 2
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+    assert report["version"] == start_version + 3 == inventory.get_inventory_version()
+    assert inventory.check_availability("DRESS-001", "Blue Floral", "M")[1] == before + 3
+    assert inventory.check_availability("SUIT-001", "Navy Blue", "40", "Pune - Phoenix Marketcity") == (True, 3)
+    assert inventory.get_inventory_version("SUIT-001") == report["version"]
+    assert inventory.get_inventory_version("DRESS-001") == report["version"] - 1
+    assert inventory.get_inventory_version("JEANS-067") == 0
+    
+    # Fractional or string quantities are malformed, and rejected deltas never grow the matrix
+    layout = inventory.store.layouts["JEANS-067"]
+    report = inventory.apply_deltas([
+        json.dumps({"sku": "JEANS-067", "color": "Dark Blue", "size": "30", "qty": 1.7}),
+        json.dumps({"sku": "JEANS-067", "color": "Dark Blue", "size": "30", "qty": "5"}),
+        json.dumps({"sku": "JEANS-067", "location": "Atlantis", "color": "Teal", "size": "XXL", "qty": -1}),
+        json.dumps({"sku": "GHOST-001", "color": "Teal", "size": "XXL", "qty": -1})
+    ])
+    assert report["applied"] == 0 and report["rejected"] == 4
+    assert [error["error"].startswith("malformed") for error in report["errors"]] == [True, True, False, False]
+    assert inventory.store.layouts["JEANS-067"] is layout and "GHOST-001" not in inventory.store
+    assert "Atlantis" not in inventory.store.location_codes
+    print("✓ Inventory delta ingestion test passed")
+
+def test_inventory_availability_batch():
+    """Test a cart is checked in one pass with shortfalls on the lines that run out"""
+    inventory = InventoryService()
+    in_stock = inventory.check_availability("DRESS-001", "Blue Floral", "M")[1]
+    
+    result = inventory.check_availability_batch([
+        ("DRESS-001", "Blue Floral", "M", in_stock - 1),
+        ("DRESS-001", "Blue Floral", "M", 3),
+        ("DRESS-001", None, None, 1, "Mumbai - Phoenix Mall"),
+        ("UNKNOWN-SKU", "Red", "S", 2)
+    ])
+    
+    assert not result["available"]
+    assert [line["shortfall"] for line in result["lines"]] == [0, 2, 0, 2]
+    assert result["lines"][1]["in_stock"] == in_stock
+    assert result["lines"][2]["location"] == "Mumbai - Phoenix Mall"
+    assert inventory.check_availability_batch([("DRESS-001", "Blue Floral", "M", in_stock)])["available"]
+    print("✓ Inventory availability batch test passed")
+
+
+def test_fulfillment_options_cache():
+    """Test fulfillment lookups are cached per place and invalidated by the SKU's stock changes"""
+    inventory = InventoryService()
+    first = inventory.get_fulfillment_options("DRESS-001", "Blue Floral", "M", "Andheri, Mumbai")
+    first["store_pickup"]["stores"].clear()
+    second = inventory.get_fulfillment_options("DRESS-001", "Blue Floral", "M", "Mumbai")
+    assert second["store_pickup"]["stores"], "cached entry must not share caller-owned lists"
+    assert inventory.get_fulfillment_cache_stats()["hits"] == 1
+    
+    # Another SKU changing leaves the entry alone; this SKU changing invalidates it
+    inventory.update_stock("JEANS-067", "Dark Blue", "30", 1)
+    inventory.get_fulfillment_options("DRESS-001", "Blue Floral", "M", "Mumbai")
+    assert inventory.get_fulfillment_cache_stats()["hits"] == 2
+    
+    online = inventory.check_availability("DRESS-001", "Blue Floral", "M")[1]
+    inventory.update_stock("DRESS-001", "Blue Floral", "M", -online)
+    options = inventory.get_fulfillment_options("DRESS-001", "Blue Floral", "M", "Mumbai")
+    assert not options["home_delivery"]["available"]
+    
+    stats = inventory.get_fulfillment_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (2, 2)
+    print("✓ Fulfillment options cache test passed")
+
+
+def test_promotion_index():
+    """Test compiled promotions match a linear scan, including first-listed tie breaks"""
+    promotions = [
+        {"id": "A", "type": "flat_discount", "value": 500, "min_purchase_amount": 1000, "active": True},
+        {"id": "B", "type": "percentage_discount", "value": 10, "max_discount": 500, "min_purchase_amount": 0,
+         "applicable_categories": ["Dresses"], "active": True},
+        {"id": "C", "type": "flat_discount", "value": 500, "min_purchase_amount": 0, "active": True},
+        {"id": "D", "type": "percentage_discount", "value": 50, "min_purchase_amount": 0,
+         "applicable_to": "platinum_members", "active": True},
+        {"id": "E", "type": "flat_discount", "value": 9000, "min_purchase_amount": 0, "active": False},
+        {"id": "F", "type": "bogo", "value": 1, "min_purchase_amount": 0,
+         "applicable_categories": ["Dresses", "Topwear"], "active": True}
+    ]
+    index = PromotionIndex(promotions)
+    
+    def ids(found):
+        return [promo["id"] for promo in found]
+    
+    assert ids(index.applicable(999, "Gold", ["Dresses", "Topwear"])) == ["B", "C", "F"]
+    assert ids(index.applicable(1000, "Platinum")) == ["A", "B", "C", "D", "F"]
+    assert ids(index.applicable(1000, "Gold", ["Footwear"])) == ["A", "C"]
+    
+    # A and C tie at 500 above 1000, so A (listed first) wins; below 1000 only C qualifies
+    assert index.best(6000, "Gold")["id"] == "A"
+    assert index.best(999, "Gold")["id"] == "C"
+    assert index.best(5000, "Gold", ["Dresses"])["id"] == "A"
+    assert index.best(3000, "Platinum")["id"] == "D"
+    assert PromotionIndex([promotions[5]]).best(5000) is None
+    print("✓ Promotion index test passed")
+
+
+def test_promotion_stacking():
+    """Test stacks respect the stackable flag and caps, and the search matches brute force"""
+    promotions = [
+        {"id": "X", "type": "percentage_discount", "value": 20, "max_discount": 300,
+         "applicable_categories": ["Dresses"], "active": True, "stackable": True},
+        {"id": "Y", "type": "percentage_discount", "value": 10, "applicable_categories": ["Dresses"],
+         "active": True, "stackable": True},
+        {"id": "Z", "type": "flat_discount", "value": 200, "active": True, "stackable": True},
+        {"id": "N", "type": "percentage_discount", "value": 10, "active": True, "stackable": False}
+    ]
+    optimizer = StackingOptimizer(PromotionIndex(promotions))
+    lines = [
+        {"category": "Dresses", "price": 2000, "quantity": 1},
+        {"category": "Footwear", "price": 1000, "quantity": 1},
+        {"category": "Dresses", "price": 2000, "quantity": 1}
+    ]
+    
+    # X's cap makes splitting the dresses between X and Y worth 300 + 200, then Z takes 200
+    stack = optimizer.best_stack(lines)
+    assert stack["discount"] == 700 and stack["optimal"] and stack["coupon"] is None
+    assert [promo["id"] for promo in stack["promotions"]] == ["X", "Y", "Z"]
+    assert sorted(stack["promotions"][0]["lines"] + stack["promotions"][1]["lines"]) == [0, 2]
+    
+    # Stackable coupons apply last; non-stackable N (500) and BIG40 (2000) compete alone
+    save = {"code": "SAVE500", "type": "flat_discount", "value": 500, "min_purchase_amount": 3000}
+    big = {"code": "BIG40", "type": "percentage_discount", "value": 40, "stackable": False}
+    assert optimizer.best_stack(lines, coupons=[save])["discount"] == 1200
+    stack = optimizer.best_stack(lines, coupons=[save, big])
+    assert stack["discount"] == 2000 and stack["promotions"] == [] and stack["coupon"]["code"] == "BIG40"
+    
+    # Same cart in another order is a cache hit with line indexes in the caller's order
+    hits = optimizer.cache.hits
+    stack = optimizer.best_stack(list(reversed(lines)))
+    assert optimizer.cache.hits == hits + 1
+    assert sorted(stack["promotions"][0]["lines"] + stack["promotions"][1]["lines"]) == [0, 2]
+    
+    rng = random.Random(8)
+    categories = ["Dresses", "Topwear", "Ethnic Wear"]
+    for _ in range(25):
+        rules = []
+        for i in range(rng.randint(2, 4)):
+            kind = rng.choice(["percentage_discount", "flat_discount", "bogo"])
+            rules.append({
+                "id": f"R{i}", "type": kind, "value": {"percentage_discount": 20, "flat_discount": 400, "bogo": 1}[kind],
+                "max_discount": rng.choice([None, 300]), "applicable_categories": rng.sample(categories, rng.randint(1, 2)),
+                "active": True, "stackable": True
+            })
+        cart = [
+            {"category": rng.choice(categories), "price": rng.choice([499, 999, 1999]), "quantity": rng.randint(1, 3)}
+            for _ in range(rng.randint(1, 5))
+        ]
+        index = PromotionIndex(rules)
+        compiled = [rule for rule in index.applicable_rules(1e9) if is_line_rule(rule)]
+        
+        best = 0.0
+        for choice in itertools.product(*[[-1] + list(range(len(compiled)))] * len(cart)):
+            total = 0.0
+            for k, rule in enumerate(compiled):
+                assigned = [line for line, chosen in zip(cart, choice) if chosen == k and line["category"] in rule.categories]
+                units = tuple(line["price"] for line in assigned for _ in range(line["quantity"]))
+                total += line_rule_discount(rule, sum(units), units, len(assigned))
+            best = max(best, total)
+        assert StackingOptimizer(index, time_budget=5).best_stack(cart)["discount"] == round(best, 2)
+    print("✓ Promotion stacking test passed")
+
+
+def test_stacking_time_budget():
+    """Test a search cut short by its budget is never worse than the greedy fallback and says so"""
+    rng = random.Random(12)
+    categories = ["Dresses", "Topwear", "Bottomwear", "Ethnic Wear", "Footwear", "Accessories"]
+    for _ in range(4):
+        promotions = []
+        for i in range(40):
+            kind = rng.choice(["percentage_discount", "percentage_discount", "flat_discount", "bogo"])
+            promotions.append({
+                "id": f"R{i}", "type": kind,
+                "value": {"percentage_discount": rng.choice([10, 20, 30]), "flat_discount": rng.choice([200, 500, 1000]), "bogo": 1}[kind],
+                "max_discount": rng.choice([300, 600, 1000]) if kind == "percentage_discount" else None,
+                "applicable_categories": rng.sample(categories, rng.randint(1, 2)), "active": True, "stackable": True
+            })
+        cart = [
+            {"category": rng.choice(categories), "price": rng.choice([299, 499, 999, 1499, 2999]), "quantity": rng.randint(1, 3)}
+            for _ in range(20)
+        ]
+        optimizer = StackingOptimizer(PromotionIndex(promotions))
+        greedy = optimizer.best_stack(cart, time_budget=0)
+        assert greedy["strategy"] == "greedy" and not greedy["optimal"]
+        for budget in (0.005, 0.02):
+            stack = optimizer.best_stack(cart, time_budget=budget)
+            assert stack["discount"] >= greedy["discount"]
+            assert stack["strategy"] in ("greedy", "partial") and not stack["optimal"]
+        # Cut-short stacks are not memoized, so a later call can still improve on them
+        assert len(optimizer.cache) == 0
+        assert abs(sum(promo["discount"] for promo in stack["promotions"]) - stack["discount"]) < 0.1
+    
+    # Small carts finish the search and report it
+    optimizer = StackingOptimizer(PromotionIndex(promotions[:3]))
+    stack = optimizer.best_stack(cart[:4])
+    assert stack["optimal"] and stack["strategy"] == "exact"
+    assert len(optimizer.cache) == 1 and optimizer.best_stack(cart[:4], time_budget=0) == stack
+    print("✓ Stacking time budget test passed")
+
+
+def test_points_batch():
+    """Test batch accrual matches per-order points, truncating after each multiplier, and tier bounds"""
+    loyalty = LoyaltyService()
+    
+    # 19 base points, x1.25 -> 23, x1.5 -> 34 (one combined multiplier would give 35)
+    assert loyalty.calculate_points_earned(1999, "Silver", "Ethnic Wear") == 34
+    assert [loyalty.get_tier_info(p)["tier"] for p in [-1, 999, 999.5, 1000, 9999, 10000]] == [
+        "Bronze", "Bronze", "Bronze", "Silver", "Gold", "Platinum"
+    ]
+    
+    rng = random.Random(12)
+    amounts = [1999] + [rng.choice([rng.uniform(0, 40000), rng.randrange(0, 40000, 100)]) for _ in range(5000)]
+    tiers = ["Silver"] + [rng.choice(["Bronze", "Silver", "Gold", "Platinum", "Unknown"]) for _ in range(5000)]
+    categories = ["Ethnic Wear"] + [rng.choice(["Ethnic Wear", "Designer", "Accessories", "Dresses", None, ""]) for _ in range(5000)]
+    balances = [rng.randrange(0, 12000) for _ in range(5001)]
+    
+    result = loyalty.calculate_points_batch(amounts, tiers, categories, balances)
+    expected = [loyalty.calculate_points_earned(*row) for row in zip(amounts, tiers, categories)]
+    assert result["points"].tolist() == expected and result["points"][0] == 34
+    assert result["balances"].tolist() == [b + p for b, p in zip(balances, expected)]
+    assert result["tiers"].tolist() == [loyalty.get_tier_info(b + p)["tier"] for b, p in zip(balances, expected)]
+    
+    no_categories = loyalty.calculate_points_batch(amounts, tiers)
+    assert no_categories["points"].tolist() == [loyalty.calculate_points_earned(a, t) for a, t in zip(amounts, tiers)]
+    assert len(loyalty.calculate_points_batch([], [])["tiers"]) == 0
+    print("✓ Points batch test passed")
+
+
+def test_points_ledger():
+    """Test ledger balances and expiring points across redemptions, expiry, snapshots and compaction"""
+    now = [0.0]
+    ledger = PointsLedger(validity_days=30, snapshot_every=3, clock=lambda: now[0])
+    
+    ledger.earn("C1", 500, "ORD1")
+    now[0] = 10 * DAY_SECONDS
+    ledger.earn("C1", 300, "ORD2")
+    assert ledger.summary("C1", days=25) == {"balance": 800, "expiring": 500}
+    
+    # Redemptions use the lot closest to expiry first
+    assert ledger.redeem("C1", 200)["kind"] == "redeem"
+    assert ledger.redeem("C1", 900) is None
+    assert ledger.summary("C1", days=25) == {"balance": 600, "expiring": 300}
+    
+    # The first lot lapses at day 30 before any expire entry is written
+    now[0] = 31 * DAY_SECONDS
+    assert ledger.balance("C1") == 300 and ledger.expiring_points("C1", 10) == 300
+    assert ledger.compact() == {"accounts": 1, "expired_points": 300, "entries_archived": 4}
+    assert ledger.balance("C1") == 300 and ledger.log == []
+    
+    # Compaction archives the log, so the full audit trail survives it
+    trail = [(entry["kind"], entry["points"], entry["reference"]) for entry in ledger.history("C1")]
+    assert trail == [("earn", 500, "ORD1"), ("earn", 300, "ORD2"), ("redeem", 200, None), ("expire", 300, None)]
+    ledger.redeem("C1", 100, "ORD3")
+    assert [entry["reference"] for entry in ledger.history("C1")][-1] == "ORD3"
+    assert ledger.stats()["archived_entries"] == 4 and ledger.stats()["log_entries"] == 1
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        archived = PointsLedger(validity_days=30, clock=lambda: now[0], archive_path=Path(tmp) / "ledger.jsonl")
+        archived.earn("C2", 50, "ORD4")
+        archived.compact()
+        archived.earn("C2", 25, "ORD5")
+        assert archived.log[0].reference == "ORD5" and archived.archive == []
+        assert [entry["reference"] for entry in archived.history("C2")] == ["ORD4", "ORD5"]
+        archived.earn("C3", 10, "ORD6")
+        archived.stop_compactor()
+        assert archived.log == []
+        
+        # A restarted ledger replays the archive: same balances and history, sequence numbers carry on
+        restarted = PointsLedger(validity_days=30, clock=lambda: now[0], archive_path=Path(tmp) / "ledger.jsonl")
+        assert "C2" in restarted and restarted.balance("C2") == 75 and restarted.stats()["archived_entries"] == 3
+        assert restarted.history("C2") == archived.history("C2")
+        assert restarted.earn("C2", 5, "ORD7")["seq"] == 4
+        assert [entry["seq"] for entry in restarted.history("C2")] == [1, 2, 4]
+        
+        # Restarting the service keeps points earned before the restart instead of reopening the account
+        path = settings.ledger_archive_path
+        settings.ledger_archive_path = str(Path(tmp) / "service.jsonl")
+        try:
+            loyalty = LoyaltyService()
+            loyalty.open_points_account("CUST001", 2500)
+            loyalty.earn_points("CUST001", 120, "ORD8")
+            loyalty.ledger.stop_compactor()
+            loyalty = LoyaltyService()
+            loyalty.open_points_account("CUST001", 2500)
+        finally:
+            settings.ledger_archive_path = path
+        assert loyalty.get_points_summary("CUST001")["balance"] == 2620
+        assert [entry["reference"] for entry in loyalty.ledger.history("CUST001")] == ["opening_balance", "ORD8"]
+    
+    now[0] = 41 * DAY_SECONDS
+    assert ledger.balance("C1") == 0 and ledger.balance("NOBODY") == 0
+    
+    # Order placement earns into the ledger the loyalty agent reads from
+    loyalty = LoyaltyService()
+    loyalty.open_points_account("CUST001", 2500)
+    loyalty.open_points_account("CUST001", 9999)
+    loyalty.earn_points("CUST001", 120, "ORD9")
+    assert loyalty.get_points_summary("CUST001") == {"balance": 2620, "expiring": 0}
+    assert loyalty.get_points_summary("CUST001", days=366)["expiring"] == 2620
+    loyalty.ledger.stop_compactor()
+    print("✓ Points ledger test passed")
+
+
+def test_promotion_schedule():
+    """Test promotions and coupons switch on and off at their validity boundaries"""
+    now = [datetime(2027, 4, 30, 12).timestamp()]
+    loyalty = LoyaltyService(clock=lambda: now[0])
+    
+    def promotion_ids():
+        return {promo["id"] for promo in loyalty.get_applicable_promotions(100000, "Platinum")}
+    
+    # valid_until is inclusive: SAVE500 and PROMO002 end with 2027-04-30
+    assert "PROMO002" in promotion_ids() and loyalty.validate_coupon("SAVE500")
+    index = loyalty.promotion_index
+    now[0] = datetime(2027, 4, 30, 23, 59).timestamp()
+    assert "PROMO002" in promotion_ids() and loyalty.promotion_index is index
+    
+    now[0] = datetime(2027, 5, 1).timestamp()
+    assert "PROMO002" not in promotion_ids() and loyalty.validate_coupon("SAVE500") is None
+    assert "PROMO001" in promotion_ids() and loyalty.promotion_index is not index
+    
+    now[0] = datetime(2028, 1, 1).timestamp()
+    assert promotion_ids() == set() and loyalty.get_best_promotion(100000) is None
+    assert loyalty.get_best_stack([{"category": "Dresses", "price": 5000, "quantity": 1}])["discount"] == 0
+    
+    # Clock moved back (e.g. replaying a day): the schedule replays from the start
+    now[0] = datetime(2027, 3, 15).timestamp()
+    assert "PROMO002" in promotion_ids() and loyalty.validate_coupon("SAVE500")
+    
+    # Imported campaigns get scheduled too
+    template = {"type": "flat_discount", "value": 300, "active": True, "valid_from": "2027-06-01", "valid_until": "2027-06-30"}
+    loyalty.import_coupon_codes(["JUNE300"], template)
+    assert loyalty.validate_coupon("JUNE300") is None
+    now[0] = datetime(2027, 6, 30, 18).timestamp()
+    assert loyalty.validate_coupon("JUNE300")["value"] == 300
+    assert loyalty.coupon_schedule.next_boundary() == datetime(2027, 7, 1).timestamp()
+    
+    # So do codes added straight to the coupon store
+    loyalty.coupon_store.import_codes(["JULY200"], {**template, "value": 200, "valid_from": "2027-07-01", "valid_until": "2027-07-31"})
+    loyalty.coupon_store.add_coupons([{"code": "ANYTIME100", "type": "flat_discount", "value": 100, "active": True}])
+    assert loyalty.validate_coupon("JULY200") is None and loyalty.validate_coupon("ANYTIME100")["value"] == 100
+    assert len(loyalty.coupon_schedule.items) == len(loyalty.coupon_store.templates)
+    now[0] = datetime(2027, 7, 15).timestamp()
+    assert loyalty.validate_coupon("JULY200")["value"] == 200 and loyalty.validate_coupon("JUNE300") is None
+    
+    # Weekend Special only runs on Saturdays and Sundays, in the index and in stacks
+    cart = [{"category": "Footwear", "price": 3000, "quantity": 1}]
+    now[0] = datetime(2027, 3, 19, 12).timestamp()
+    assert "PROMO006" not in promotion_ids()
+    assert all(promo["id"] != "PROMO006" for promo in loyalty.get_best_stack(cart)["promotions"])
+    now[0] = datetime(2027, 3, 20, 12).timestamp()
+    assert "PROMO006" in promotion_ids()
+    stack = loyalty.get_best_stack(cart)
+    assert [promo["id"] for promo in stack["promotions"]] == ["PROMO006"] and stack["discount"] == 600
+    print("✓ Promotion schedule test passed")
+
+
+def test_coupon_store():
+    """Test hashed coupon lookups, streaming imports and single-use redemption under contention"""
+    loyalty = LoyaltyService(clock=lambda: datetime(2027, 3, 15).timestamp())
+    assert loyalty.validate_coupon("SAVE500")["value"] == 500
+    assert loyalty.validate_coupon("PLATINUM20", "Gold") is None
+    assert loyalty.validate_coupon("PLATINUM20", "Platinum")["code"] == "PLATINUM20"
+    assert loyalty.validate_coupon("NOSUCHCODE") is None
+    
+    # Shared codes keep usage_limit per customer: SAVE500 works 3 times for each customer
+    for _ in range(3):
+        assert loyalty.redeem_coupon("SAVE500", customer_id="CUST001")["code"] == "SAVE500"
+    assert loyalty.redeem_coupon("SAVE500", customer_id="CUST001") is None
+    assert loyalty.validate_coupon("SAVE500", customer_id="CUST001") is None
+    assert loyalty.coupon_store.uses_left("SAVE500", "CUST002") == 3
+    assert loyalty.redeem_coupon("SAVE500", customer_id="CUST002")["value"] == 500
+    assert loyalty.redeem_coupon("WELCOME15", customer_id="CUST002") and not loyalty.redeem_coupon("WELCOME15", customer_id="CUST002")
+    assert loyalty.redeem_coupon("WELCOME15", customer_id="CUST003")
+    assert loyalty.coupon_store.uses_left("PLATINUM20", "CUST001") == -1
+    
+    # Released uses (a failed payment) come back to the same customer only
+    assert loyalty.release_coupon("SAVE500", "CUST001") and loyalty.validate_coupon("SAVE500", customer_id="CUST001")
+    assert loyalty.coupon_store.uses_left("SAVE500", "CUST002") == 2
+    assert not loyalty.release_coupon("NOSUCHCODE")
+    
+    # Start tiny so imports have to grow the table and rebuild the Bloom filter
+    store = CouponStore(capacity=4)
+    codes = [f"CAMP{i:07d}" for i in range(5000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "codes.txt"
+        path.write_text("\n".join(codes + codes[:25] + [""]), encoding="utf-8")
+        report = store.import_codes(path, {"type": "flat_discount", "value": 200, "usage_limit": 1}, batch_size=700)
+    
+    assert report == {"added": 5000, "duplicates": 25} and len(store) == 5000
+    assert all(code in store for code in codes)
+    assert not any(f"MISS{i}" in store for i in range(2000))
+    assert sum(store.might_contain(f"MISS{i}") for i in range(2000)) < 100
+    assert store.stats()["templates"] == 1
+    
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.redeem(codes[0]))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(result is not None for result in results) == 1
+    assert store.lookup(codes[0]) is None and store.uses_left(codes[0]) == 0
+    assert store.lookup(codes[1])["value"] == 200
+    print("✓ Coupon store test passed")
+
+
+def test_geo_nearest_stores():
+    """Test k-d tree neighbours match brute force and pickup stores come nearest first"""
+    rng = random.Random(3)
+    coordinates = [(rng.uniform(8, 35), rng.uniform(68, 97)) for _ in range(200)]
+    tree = KDTree([to_unit_vector(lat, lon) for lat, lon in coordinates])
+    for _ in range(50):
+        lat, lon = rng.uniform(8, 35), rng.uniform(68, 97)
+        expected = sorted(range(len(coordinates)), key=lambda i: haversine_km(lat, lon, *coordinates[i]))[:5]
+        assert [i for _, i in tree.nearest(to_unit_vector(lat, lon), 5)] == expected
+    
+    inventory = InventoryService()
+    assert inventory.get_delivery_zone("Andheri, Mumbai") == "same_city"
+    assert inventory.get_delivery_zone("Navi Mumbai") == "same_city"
+    assert inventory.get_delivery_zone("Pune") == "metro_to_metro"
+    assert inventory.get_delivery_zone("Jaipur") == "other"
+    
+    fulfillment = FulfillmentService(inventory)
+    pickup = fulfillment.get_pickup_locations("Delhi", "DRESS-001")
+    assert [store["store_name"] for store in pickup][0] == "Delhi - Select Citywalk"
+    assert {store["store_name"] for store in pickup} == set(inventory.get_available_stores("DRESS-001"))
+    assert [store["distance_km"] for store in pickup] == sorted(store["distance_km"] for store in pickup)
+    
+    options = inventory.get_fulfillment_options("DRESS-001", None, None, "Bangalore")
+    assert options["store_pickup"]["stores"][0] == "Bangalore - UB City"
+    assert all(store["distance_km"] is None for store in fulfillment.get_pickup_locations("Atlantis"))
+    print("✓ Geo nearest stores test passed")
+
+
+def test_delivery_slots():
+    """Test slot capacity holds under concurrent booking, releases and survives the day rolling over"""
+    today = [date(2024, 6, 1)]
+    slots = SlotInventory(capacity=2, horizon_days=7, today=lambda: today[0])
+    assert len(slots.available("same_city")) == 18
+    assert slots.available("same_city")[0]["date"] == "2024-06-02"
+    
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(slots.book("same_city", "2024-06-03", "evening")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    booked = [booking_id for booking_id in results if booking_id]
+    assert len(booked) == 2
+    
+    evening = slots.available("same_city", date(2024, 6, 3), 1)[2]
+    assert evening["time_slot"] == "5:00 PM - 8:00 PM" and not evening["available"]
+    assert slots.available("other", date(2024, 6, 3), 1)[2]["remaining"] == 2
+    assert slots.book("same_city", "2024-06-03", "5:00 PM - 8:00 PM") is None
+    assert slots.book("same_city", "2024-06-30", "morning") is None
+    assert slots.book("same_city", "not-a-date", "morning") is None
+    assert slots.get_booking(booked[0])["window"] == "evening"
+    
+    assert slots.release(booked[0]) and not slots.release(booked[0])
+    assert slots.available("same_city", date(2024, 6, 3), 1)[2]["remaining"] == 1
+    
+    # Rolling forward keeps counts for days still in the horizon and opens new days full
+    today[0] = date(2024, 6, 2)
+    assert slots.available("same_city", date(2024, 6, 3), 1)[2]["remaining"] == 1
+    assert slots.available("same_city", date(2024, 6, 8), 1)[0]["remaining"] == 2
+    
+    # The service reads the slot inventory's clock, so nothing here depends on the real date
+    fulfillment = FulfillmentService(InventoryService(), SlotInventory(capacity=2, today=lambda: date(2024, 6, 1)))
+    week = fulfillment.get_delivery_slots("Mumbai")
+    assert len(week) == 21 and all(slot["available"] for slot in week)
+    assert week[0]["date"] == "2024-06-02" and week[-1]["date"] == "2024-06-08"
+    delivery = fulfillment.schedule_delivery("ORD-1", "Andheri, Mumbai")
+    assert delivery["slot_booking_id"] and delivery["time_slot"] == "9:00 AM - 12:00 PM"
+    assert delivery["scheduled_date"] == datetime(2024, 6, 4)
+    start = delivery["scheduled_date"]
+    assert fulfillment.get_delivery_slots("Mumbai", start, 1)[0]["remaining"] == fulfillment.slots.capacity - 1
+    fulfillment.update_delivery_status(delivery["delivery_id"], "cancelled")
+    assert fulfillment.get_delivery_slots("Mumbai", start, 1)[0]["remaining"] == fulfillment.slots.capacity
+    
+    # Once the morning is booked out, the next delivery moves to the afternoon
+    assert fulfillment.book_delivery_slot("Mumbai", "2024-06-04", "morning")
+    assert fulfillment.book_delivery_slot("Mumbai", "2024-06-04", "morning")
+    assert fulfillment.schedule_delivery("ORD-2", "Mumbai")["time_slot"] == "2:00 PM - 5:00 PM"
+    
+    # With no slot free, the fallback date comes from the same clock
+    full = FulfillmentService(InventoryService(), SlotInventory(capacity=0, today=lambda: date(2024, 6, 1)))
+    delivery = full.schedule_delivery("ORD-3", "Mumbai")
+    assert delivery["slot_booking_id"] is None and delivery["scheduled_date"] == datetime(2024, 6, 4)
+    print("✓ Delivery slots test passed")
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_inverted_index_ranking()
+    test_catalog_search()
+    test_catalog_indexes()
+    test_catalog_recommendations()
+    test_recommendation_pools()
+    test_catalog_facets()
+    test_catalog_hot_reload()
+    test_catalog_fuzzy_search()
+    test_catalog_similar_products()
+    test_similarity_ivf()
+    test_inventory_matrix()
+    test_inventory_availability_bitmaps()
+    test_inventory_reservations()
+    test_checkout_releases_holds()
+    test_inventory_store_fallback()
+    test_redis_inventory_store()
+    test_inventory_delta_ingestion()
+    test_inventory_availability_batch()
+    test_fulfillment_options_cache()
+    test_promotion_index()
+    test_promotion_stacking()
+    test_stacking_time_budget()
+    test_points_batch()
+    test_points_ledger()
+    test_promotion_schedule()
+    test_coupon_store()
+    test_geo_nearest_stores()
+    test_delivery_slots()
+    print("\n✅ All tests passed!")